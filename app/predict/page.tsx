@@ -182,7 +182,8 @@
           year: parseInt(year)
         }, {
           headers: {
-            'Content-Type': 'application/json'
+            'Content-Type': 'application/json',
+            'Authorization': `Bearer ${authToken}`
           }
         });
 
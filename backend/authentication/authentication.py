@@ -0,0 +1,63 @@
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+USER_CACHE_PREFIX = 'statvalue:auth_user:'
+
+
+def user_cache_key(user_id):
+    return f"{USER_CACHE_PREFIX}{user_id}"
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user through the local cache for
+    AUTH_USER_CACHE_TIMEOUT seconds instead of querying CustomUser on every request.
+    Entries are dropped whenever the user is saved or deleted (see signals.py).
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60))
+        return user
+
+
+def jwt_required(view):
+    """
+    Require a valid bearer token on a plain Django view, answering 401 otherwise.
+    DRF's authentication_classes/permission_classes only take effect under @api_view.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        auth = CachedJWTAuthentication()
+        try:
+            result = auth.authenticate(request)
+            error = "Authentication credentials were not provided."
+        except AuthenticationFailed:
+            result, error = None, "Given token is not valid or has expired."
+        if result is None:
+            response = JsonResponse({"error": error}, status=401)
+            response['WWW-Authenticate'] = auth.authenticate_header(request)
+            return response
+        request.user, request.auth = result
+        return view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,35 @@
+import time
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Time PBKDF2 password hashing at several iteration counts to pick PASSWORD_HASH_ITERATIONS"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, nargs='+',
+                            default=[100000, 150000, 200000, 260000, 320000])
+        parser.add_argument('--rounds', type=int, default=5, help="Hashes timed per iteration count")
+        parser.add_argument('--target-ms', type=float, default=100.0,
+                            help="Largest acceptable time for a single hash")
+
+    def handle(self, *args, **options):
+        hasher = PBKDF2PasswordHasher()
+        salt = hasher.salt()
+        recommended = None
+
+        for iterations in sorted(options['iterations']):
+            start = time.perf_counter()
+            for _ in range(options['rounds']):
+                hasher.encode('benchmark-password', salt, iterations=iterations)
+            per_hash_ms = (time.perf_counter() - start) * 1000 / options['rounds']
+            self.stdout.write(f"{iterations:>8} iterations: {per_hash_ms:8.1f} ms/hash")
+            if per_hash_ms <= options['target_ms']:
+                recommended = iterations
+
+        if recommended is None:
+            self.stdout.write(self.style.WARNING(
+                f"No candidate hashes within {options['target_ms']} ms on this machine"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"PASSWORD_HASH_ITERATIONS = {recommended}"))
@@ -2,12 +2,22 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.db.models import Q
 from rest_framework.validators import UniqueValidator
 from .models import CustomUser
 
 
 User = get_user_model()
 
+
+def taken_field(username, email):
+    """'username' or 'email' if either is already registered, checked in one query; None if both are free"""
+    taken = list(User.objects.filter(Q(username=username) | Q(email=email)).values_list('username', flat=True))
+    if username in taken:
+        return 'username'
+    return 'email' if taken else None
+
+
 class UserSerializer(serializers.ModelSerializer):
     username = serializers.CharField(
         max_length=150,
@@ -1,3 +1,71 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .serializers import taken_field
+
+User = get_user_model()
+
+PASSWORD = 'Str0ng-enough-pass'
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class RegisterTests(TestCase):
+    """Signup reports which unique field is taken, in the {"error": ...} shape the frontend reads"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username='taken', email='taken@example.com', password=PASSWORD)
+
+    def register(self, username, email):
+        return self.client.post(reverse('register'), {
+            'username': username, 'email': email, 'password': PASSWORD, 'confirm_password': PASSWORD,
+        }, content_type='application/json')
+
+    def test_registers_new_user(self):
+        response = self.register('fresh', 'fresh@example.com')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('token', response.json())
+
+    def test_duplicate_username(self):
+        response = self.register('taken', 'other@example.com')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Username already exists"})
+
+    def test_duplicate_email(self):
+        response = self.register('other', 'taken@example.com')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Email already exists"})
+
+    def test_insert_race_reports_the_conflicting_field(self):
+        # The pre-check passes, then the unique index rejects the insert
+        calls = []
+
+        def lookup(*args):
+            calls.append(args)
+            return None if len(calls) == 1 else taken_field(*args)
+
+        with mock.patch('authentication.views.taken_field', side_effect=lookup), \
+                mock.patch('authentication.views.RegisterSerializer.save', side_effect=IntegrityError):
+            response = self.register('other', 'taken@example.com')
+        self.assertEqual(response.json(), {"error": "Email already exists"})
+
+
+class HasherTests(SimpleTestCase):
+    """PBKDF2 cost follows PASSWORD_HASH_ITERATIONS and older costs still verify"""
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_iterations_come_from_settings(self):
+        encoded = make_password(PASSWORD)
+        self.assertTrue(encoded.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(check_password(PASSWORD, encoded))
+
+    def test_hash_with_another_cost_still_verifies(self):
+        with override_settings(PASSWORD_HASH_ITERATIONS=1000):
+            encoded = make_password(PASSWORD)
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertTrue(check_password(PASSWORD, encoded))
@@ -4,7 +4,8 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
-from .serializers import UserSerializer, RegisterSerializer, LoginSerializer
+from django.db import IntegrityError
+from .serializers import UserSerializer, RegisterSerializer, LoginSerializer, taken_field
 from django.urls import path
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
@@ -22,20 +23,18 @@ class RegisterView(APIView):
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
-            data = request.data
-            username = data.get('username')
-            email = data.get('email')
-            password = data.get('password')
-            confirm_password = data.get('confirm_password')
-
-            if password != confirm_password:
-                return Response({"error": "Passwords do not match"}, status=status.HTTP_400_BAD_REQUEST)
-            if User.objects.filter(username=username).exists():
-                return Response({"error": "Username already exists"}, status=status.HTTP_400_BAD_REQUEST)
-            if User.objects.filter(email=email).exists():
-                return Response({"error": "Email already exists"}, status=status.HTTP_400_BAD_REQUEST)
-
-            user = serializer.save()
+            username = serializer.validated_data['username']
+            email = serializer.validated_data['email']
+            # One round-trip for both unique fields; the unique indexes still guard the insert
+            taken = taken_field(username, email)
+            if taken is None:
+                try:
+                    user = serializer.save()
+                except IntegrityError:
+                    # Lost a race with a concurrent signup for the same username/email
+                    taken = taken_field(username, email) or 'username'
+            if taken is not None:
+                return Response({"error": f"{taken.capitalize()} already exists"}, status=status.HTTP_400_BAD_REQUEST)
             
             # Generate token
             refresh = RefreshToken.for_user(user)
@@ -0,0 +1,130 @@
+"""
+Generate a large synthetic player universe for scaling tests.
+
+Writes the multi-season prediction table (finaldataset schema) and the per-position
+comparison collections as xlsx, csv or parquet files, and/or seeds the configured
+database (PlayerStats plus Defenders/Forwards/Midfielders/Goalkeepers):
+
+    python -m benchmarks.generate --players 1000000 --format parquet --output-dir /tmp/universe
+    python -m benchmarks.generate --players 50000 --seed-db --settings statvalue_backend.settings
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import django
+
+XLSX_MAX_ROWS = 1048575
+
+
+def _write_frames(frames, path, fmt):
+    """Write an iterable of same-schema frames to one file without holding them all in memory"""
+    rows = 0
+    if fmt == 'csv':
+        for i, frame in enumerate(frames):
+            frame.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+            rows += len(frame)
+    elif fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for frame in frames:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                rows += len(frame)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        import pandas as pd
+
+        frame = pd.concat(list(frames), ignore_index=True)
+        if len(frame) > XLSX_MAX_ROWS:
+            raise SystemExit(f"{len(frame)} rows exceed the xlsx sheet limit; use --format csv or parquet")
+        frame.to_excel(path, index=False)
+        rows = len(frame)
+    return rows
+
+
+def _db_columns(Model, frame):
+    """Rename field-named columns to the document keys stored in Mongo"""
+    return frame.rename(columns={f.name: f.column for f in Model._meta.concrete_fields})
+
+
+def _seed_model(Model, frames, batch_size):
+    rows = 0
+    for frame in frames:
+        Model.objects.bulk_create([Model(**row) for row in frame.to_dict('records')], batch_size=batch_size)
+        rows += len(frame)
+    return rows
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=100000)
+    parser.add_argument('--first-season', type=int, default=2018)
+    parser.add_argument('--last-season', type=int, default=2022)
+    parser.add_argument('--position-rows', type=int, default=None,
+                        help="Rows per position collection (defaults to --players)")
+    parser.add_argument('--chunk-players', type=int, default=50000)
+    parser.add_argument('--format', choices=['xlsx', 'csv', 'parquet'], default='parquet')
+    parser.add_argument('--output-dir', type=Path, default=None, help="Write files here")
+    parser.add_argument('--seed-db', action='store_true', help="Insert into the configured database")
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--settings', default='statvalue_backend.settings_bench')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.output_dir is None and not args.seed_db:
+        parser.error("nothing to do: pass --output-dir and/or --seed-db")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', args.settings)
+    django.setup()
+
+    from benchmarks.synthetic import iter_player_seasons, latest_player_stats, position_frame
+    from comparison.models import Defenders, Forwards, Midfielders, Goalkeepers
+    from pred.models import PlayerStats
+
+    seasons = range(args.first_season, args.last_season + 1)
+    position_rows = args.position_rows or args.players
+    positions = (Defenders, Forwards, Midfielders, Goalkeepers)
+
+    def season_chunks():
+        return iter_player_seasons(args.players, seasons, chunk_players=args.chunk_players, seed=args.seed)
+
+    def position_chunks(Model, rename):
+        for offset in range(0, position_rows, args.chunk_players):
+            frame = position_frame(Model, min(args.chunk_players, position_rows - offset), seed=args.seed + offset,
+                                   first_id=offset)
+            yield _db_columns(Model, frame) if rename else frame
+
+    if args.output_dir is not None:
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+        path = args.output_dir / f"finaldataset.{args.format}"
+        rows = _write_frames(season_chunks(), path, args.format)
+        print(f"{path}: {rows} rows", file=sys.stderr)
+        for Model in positions:
+            path = args.output_dir / f"{Model._meta.db_table}.{args.format}"
+            rows = _write_frames(position_chunks(Model, rename=True), path, args.format)
+            print(f"{path}: {rows} rows", file=sys.stderr)
+
+    if args.seed_db:
+        stats_fields = {f.name for f in PlayerStats._meta.concrete_fields if not f.primary_key and f.name != '_id'}
+        stats_chunks = (latest_player_stats(chunk)[sorted(stats_fields)] for chunk in season_chunks())
+        rows = _seed_model(PlayerStats, stats_chunks, args.batch_size)
+        print(f"{PlayerStats._meta.db_table}: {rows} rows", file=sys.stderr)
+        for Model in positions:
+            rows = _seed_model(Model, position_chunks(Model, rename=False), args.batch_size)
+            print(f"{Model._meta.db_table}: {rows} rows", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
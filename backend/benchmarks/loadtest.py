@@ -0,0 +1,323 @@
+"""
+Load test replaying frontend traffic mixes: login -> search -> history -> predict -> compare.
+
+Virtual users log in once (JWT), then pick flows by weight until the duration
+elapses. Runs in-process against a synthetic SQLite setup (default) or against
+a running server, and reports throughput, latency percentiles and error rates
+per endpoint:
+
+    python -m benchmarks.loadtest --users 20 --duration 60 --mix browse=3,predict=2,compare=2
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --username scout --password ...
+    python -m benchmarks.loadtest --replay recorded.jsonl --users 10
+
+A replay file has one request per line:
+{"method": "GET", "path": "/api/players/", "body": null, "auth": true, "endpoint": "players"}
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from functools import partial
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+from benchmarks.run import DEFAULT_MODELS_DIR, SIMILARITY_POSITIONS, git_revision, summarize
+
+DEFAULT_MIX = {'browse': 3, 'predict': 2, 'compare': 2, 'login': 1}
+POSITION_LISTS = {'defender': 'defenders', 'forward': 'forwards', 'midfielder': 'midfielders',
+                  'goalkeeper': 'goalkeepers'}
+
+
+class InProcessTarget:
+    """Drives the Django app through the test client; one client per virtual user"""
+
+    def __init__(self):
+        from django.test import Client
+
+        self._client = Client()
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'HTTP_AUTHORIZATION': f"Bearer {token}"} if token else {}
+        if method == 'GET':
+            response = self._client.get(path, **headers)
+        else:
+            response = self._client.generic(method, path, json.dumps(body or {}), 'application/json', **headers)
+        return response.status_code, response.content
+
+
+class HttpTarget:
+    """Drives a running server over one keep-alive connection per virtual user"""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self._connect = lambda: connection_class(parts.netloc, timeout=timeout)
+        self._prefix = parts.path.rstrip('/')
+        self._connection = self._connect()
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Accept': 'application/json'}
+        payload = None
+        if token:
+            headers['Authorization'] = f"Bearer {token}"
+        if method != 'GET':
+            payload = json.dumps(body or {})
+            headers['Content-Type'] = 'application/json'
+        try:
+            self._connection.request(method, self._prefix + path, payload, headers)
+            response = self._connection.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            self._connection.close()
+            self._connection = self._connect()
+            raise
+
+
+class Recorder:
+    """Thread-safe latency/status samples per endpoint"""
+
+    def __init__(self):
+        self._samples = defaultdict(list)
+        self._errors = defaultdict(int)
+        self._statuses = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, status):
+        with self._lock:
+            self._samples[endpoint].append(seconds)
+            self._statuses[endpoint][status] += 1
+            if status == 'exception' or status >= 400:
+                self._errors[endpoint] += 1
+
+    def report(self, elapsed):
+        endpoints = {}
+        total = errors = 0
+        with self._lock:
+            for endpoint, samples in sorted(self._samples.items()):
+                total += len(samples)
+                errors += self._errors[endpoint]
+                endpoints[endpoint] = dict(
+                    summarize(samples),
+                    requests_per_second=len(samples) / elapsed if elapsed else None,
+                    errors=self._errors[endpoint],
+                    error_rate=self._errors[endpoint] / len(samples),
+                    statuses={str(k): v for k, v in self._statuses[endpoint].items()},
+                )
+            all_samples = [s for samples in self._samples.values() for s in samples]
+        return {
+            'elapsed_seconds': elapsed,
+            'requests': total,
+            'requests_per_second': total / elapsed if elapsed else None,
+            'errors': errors,
+            'error_rate': errors / total if total else None,
+            'latency': summarize(all_samples),
+            'endpoints': endpoints,
+        }
+
+
+class VirtualUser:
+    def __init__(self, index, target, recorder, args, players):
+        self.target = target
+        self.recorder = recorder
+        self.args = args
+        self.players = players
+        self.rng = random.Random(args.seed + index)
+        self.token = None
+        self.replay_offset = index
+
+    def call(self, endpoint, method, path, body=None, auth=True):
+        start = time.perf_counter()
+        try:
+            status, content = self.target.request(method, path, body, self.token if auth else None)
+        except Exception:
+            self.recorder.record(endpoint, time.perf_counter() - start, 'exception')
+            return None
+        self.recorder.record(endpoint, time.perf_counter() - start, status)
+        if status >= 400:
+            return None
+        try:
+            return json.loads(content)
+        except ValueError:
+            return None
+
+    def login(self):
+        data = self.call('auth/login', 'POST', '/api/auth/login/',
+                         {'username': self.args.username, 'password': self.args.password}, auth=False)
+        self.token = (data or {}).get('token')
+
+    def browse(self):
+        players = self.call('players', 'GET', '/api/players/')
+        names = [p['name'] for p in players or [] if isinstance(p, dict) and p.get('name')] or self.players
+        if names:
+            name = self.rng.choice(names)
+            self.call('player-history', 'GET', f"/api/player-history/{quote(name, safe='')}/")
+
+    def predict(self):
+        if self.players:
+            body = {'playerName': self.rng.choice(self.players), 'year': self.rng.choice(self.args.years)}
+            self.call('predict', 'POST', '/api/predict/', body, auth=False)
+
+    def compare(self):
+        position = self.rng.choice(SIMILARITY_POSITIONS)
+        listing = self.call(POSITION_LISTS[position], 'GET', f"/api/{POSITION_LISTS[position]}/?format=rows")
+        if listing:
+            name = self.rng.choice(listing).get('name')
+            self.call('similar_players', 'POST', '/api/similar_players/',
+                      {'player': {'name': name}, 'position': position}, auth=False)
+
+    def replay(self, entries):
+        entry = entries[self.replay_offset % len(entries)]
+        self.replay_offset += 1
+        self.call(entry.get('endpoint') or entry['path'], entry.get('method', 'GET').upper(), entry['path'],
+                  entry.get('body'), auth=entry.get('auth', True))
+
+    def run(self, deadline, mix, entries):
+        self.login()
+        flows = list(mix)
+        weights = [mix[f] for f in flows]
+        while time.monotonic() < deadline:
+            if entries:
+                self.replay(entries)
+            else:
+                getattr(self, self.rng.choices(flows, weights)[0])()
+            if self.args.think_ms:
+                time.sleep(self.rng.uniform(0, 2 * self.args.think_ms) / 1000)
+
+
+def prepare_in_process(args, tmp):
+    """Synthetic SQLite database, position collections, prediction dataset and a login user"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'statvalue_backend.settings_bench')
+    # A file database: every worker thread opens its own SQLite connection
+    os.environ.setdefault('STATVALUE_BENCH_DB', str(Path(tmp) / 'loadtest.sqlite3'))
+    import django
+
+    django.setup()
+    logging.disable(logging.INFO)
+
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from benchmarks.run import configure_prediction, create_position_tables, seed_position
+    from benchmarks.synthetic import latest_player_stats, player_seasons
+    from comparison.models import Defenders, Forwards, Midfielders, Goalkeepers
+    from pred.models import PlayerStats
+
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    create_position_tables()
+    for Model in (Defenders, Forwards, Midfielders, Goalkeepers):
+        seed_position(Model, args.collection_size, args.seed)
+
+    seasons = player_seasons(args.players, seed=args.seed)
+    dataset_path = Path(tmp) / 'finaldataset.xlsx'
+    seasons.to_excel(dataset_path, index=False)
+    configure_prediction(args.models_dir, dataset_path)
+    try:
+        latest = latest_player_stats(seasons).drop(columns=['player_id'], errors='ignore')
+        fields = {f.name for f in PlayerStats._meta.concrete_fields}
+        PlayerStats.objects.bulk_create([PlayerStats(**{k: v for k, v in row.items() if k in fields})
+                                         for row in latest.to_dict('records')], batch_size=1000)
+    except Exception as e:
+        print(f"PlayerStats not seeded ({type(e).__name__}: {e}); /api/players/ will be empty", file=sys.stderr)
+
+    User = get_user_model()
+    if not User.objects.filter(username=args.username).exists():
+        User.objects.create_user(username=args.username, email=f"{args.username}@example.com",
+                                 password=args.password)
+    return sorted(seasons['name'].unique())
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown flow {name!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=None, help="Base URL of a running server; in-process when omitted")
+    parser.add_argument('--users', type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds of load after ramp-up")
+    parser.add_argument('--ramp', type=float, default=0.0, help="Seconds over which users are started")
+    parser.add_argument('--think-ms', type=float, default=0.0, help="Mean pause between flows")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX, help="e.g. browse=3,predict=2,compare=2")
+    parser.add_argument('--replay', type=Path, default=None, help="JSONL of recorded requests to replay")
+    parser.add_argument('--username', default='loadtest')
+    parser.add_argument('--password', default='loadtest-password')
+    parser.add_argument('--players-file', type=Path, default=None,
+                        help="Player names to predict against a remote server, one per line")
+    parser.add_argument('--years', type=int, nargs='+', default=[2024, 2025, 2026])
+    parser.add_argument('--players', type=int, default=400, help="Synthetic players (in-process)")
+    parser.add_argument('--collection-size', type=int, default=1000, help="Rows per position collection (in-process)")
+    parser.add_argument('--models-dir', type=Path, default=DEFAULT_MODELS_DIR)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='loadtest_output.json')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    entries = []
+    if args.replay:
+        with open(args.replay) as fh:
+            entries = [json.loads(line) for line in fh if line.strip()]
+        entries = [e for e in entries if isinstance(e, dict) and 'path' in e]
+        if not entries:
+            sys.exit(f"{args.replay} has no replayable requests (need objects with a 'path')")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            players = args.players_file.read_text().split('\n') if args.players_file else []
+            players = [p.strip() for p in players if p.strip()]
+            make_target = partial(HttpTarget, args.url)
+        else:
+            players = prepare_in_process(args, tmp)
+            make_target = InProcessTarget
+
+        recorder = Recorder()
+        users = [VirtualUser(i, make_target(), recorder, args, players) for i in range(args.users)]
+        start = time.monotonic()
+        deadline = start + args.ramp + args.duration
+        threads = []
+        for i, user in enumerate(users):
+            thread = threading.Thread(target=user.run, args=(deadline, args.mix, entries), daemon=True)
+            thread.start()
+            threads.append(thread)
+            if args.ramp and i < len(users) - 1:
+                time.sleep(args.ramp / len(users))
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+
+    report = {
+        'meta': {
+            'git_revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'target': args.url or 'in-process',
+            'args': {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        },
+        'results': recorder.report(elapsed),
+    }
+    with open(args.output, 'w') as fh:
+        json.dump(report, fh, indent=2, default=str)
+
+    results = report['results']
+    print(f"{results['requests']} requests in {elapsed:.1f}s = {results['requests_per_second']:.1f} req/s, "
+          f"error rate {results['error_rate'] or 0:.2%}", file=sys.stderr)
+    for endpoint, stats in results['endpoints'].items():
+        print(f"  {endpoint:<20} n={stats['n']:<6} p50={stats['p50_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms "
+              f"p99={stats['p99_ms']:.1f}ms errors={stats['error_rate']:.2%}", file=sys.stderr)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
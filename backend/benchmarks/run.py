@@ -0,0 +1,249 @@
+"""
+Reproducible benchmarks for the prediction, similarity and list endpoints.
+
+Runs against a synthetic dataset on the SQLite settings profile and writes
+machine-readable results so runs from different commits can be compared:
+
+    python -m benchmarks.run --output bench.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'statvalue_backend.settings_bench')
+
+import django  # noqa: E402
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_MODELS_DIR = BACKEND_DIR.parent / 'models'
+SIMILARITY_POSITIONS = ('defender', 'forward', 'midfielder', 'goalkeeper')
+
+
+def percentile(sorted_samples, q):
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, int(round(q / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for a list of durations in seconds"""
+    ordered = sorted(s * 1000 for s in samples)
+    return {
+        'n': len(ordered),
+        'mean_ms': sum(ordered) / len(ordered) if ordered else None,
+        'p50_ms': percentile(ordered, 50),
+        'p95_ms': percentile(ordered, 95),
+        'p99_ms': percentile(ordered, 99),
+        'min_ms': ordered[0] if ordered else None,
+        'max_ms': ordered[-1] if ordered else None,
+    }
+
+
+def timed(func, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return samples, result
+
+
+def configure_prediction(models_dir, dataset_path):
+    """Point the prediction registry at the benchmark artifacts and drop anything already loaded"""
+    from django.conf import settings
+    from pred import views as pred_views
+    from pred.registry import registry
+
+    settings.PREDICTION_MODEL_PATH = models_dir / 'market_value_lstm_model.h5'
+    settings.PREDICTION_FEATURE_SCALER_PATH = models_dir / 'feature_scaler.npy'
+    settings.PREDICTION_TARGET_SCALER_PATH = models_dir / 'target_scaler.npy'
+    settings.PREDICTION_IMPORTANT_FEATURES_PATH = models_dir / 'important_features.npy'
+    settings.PREDICTION_DATASET_PATH = dataset_path
+    settings.MODEL_RELOAD_POLL_SECONDS = 0
+    registry.reset()
+    return pred_views
+
+
+def bench_cold_start(args, dataset_path):
+    samples = []
+    for _ in range(args.cold_repeat):
+        pred_views = configure_prediction(args.models_dir, dataset_path)
+        start = time.perf_counter()
+        loaded = pred_views.load_models_and_data()
+        samples.append(time.perf_counter() - start)
+        if not loaded:
+            return {'error': 'load_models_and_data failed'}
+    return summarize(samples)
+
+
+def bench_predict(args, dataset_path):
+    pred_views = configure_prediction(args.models_dir, dataset_path)
+    if not pred_views.load_models_and_data():
+        return {'error': 'load_models_and_data failed'}
+
+    from pred.registry import registry
+
+    df = registry.current().df
+    names = list(df['name'].drop_duplicates()[:args.predict_players])
+    target_year = int(df['Year'].max()) + 2
+
+    single, _ = timed(lambda: pred_views.predict_market_value(names[0], target_year), args.repeat)
+
+    start = time.perf_counter()
+    errors = sum('error' in pred_views.predict_market_value(name, target_year) for name in names)
+    elapsed = time.perf_counter() - start
+    return {
+        'single': summarize(single),
+        'batch': {
+            'players': len(names),
+            'errors': errors,
+            'seconds': elapsed,
+            'predictions_per_second': len(names) / elapsed if elapsed else None,
+        },
+    }
+
+
+def create_position_tables():
+    from django.db import connection
+    from comparison.models import Defenders, Forwards, Midfielders, Goalkeepers
+
+    with connection.schema_editor() as editor:
+        for Model in (Defenders, Forwards, Midfielders, Goalkeepers):
+            editor.create_model(Model)
+
+
+def seed_position(Model, size, seed):
+    from benchmarks.synthetic import position_rows
+    from statvalue_backend.caching import bump_dataset_version
+
+    Model.objects.all().delete()
+    Model.objects.bulk_create(position_rows(Model, size, seed=seed), batch_size=1000)
+    # Cached responses and columnar snapshots belong to the previous contents
+    bump_dataset_version(scope='collections')
+
+
+def bench_similarity(args):
+    from rest_framework.test import APIRequestFactory
+    from comparison.models import Defenders, Forwards, Midfielders, Goalkeepers
+    from comparison.views import get_similar_players
+
+    models_by_position = dict(zip(SIMILARITY_POSITIONS, (Defenders, Forwards, Midfielders, Goalkeepers)))
+    factory = APIRequestFactory()
+    results = {}
+    for size in args.sizes:
+        Model = models_by_position[args.similarity_position]
+        seed_position(Model, size, args.seed)
+        body = {'player': {'name': 'Synthetic Player 0000000'}, 'position': args.similarity_position}
+
+        def call():
+            request = factory.post('/api/similar_players/', body, format='json')
+            return get_similar_players(request)
+
+        samples, response = timed(call, args.repeat)
+        results[str(size)] = dict(summarize(samples), status=response.status_code)
+    return results
+
+
+def bench_lists(args):
+    from django.test import RequestFactory
+    from comparison import views as comparison_views
+    from comparison.models import Defenders, Forwards, Midfielders, Goalkeepers
+
+    endpoints = {
+        'defenders': (Defenders, comparison_views.get_defenders),
+        'forwards': (Forwards, comparison_views.get_forwards),
+        'midfielders': (Midfielders, comparison_views.get_midfielders),
+        'goalkeepers': (Goalkeepers, comparison_views.get_goalkeepers),
+    }
+    factory = RequestFactory()
+    results = {}
+    for size in args.sizes:
+        for name, (Model, view) in endpoints.items():
+            seed_position(Model, size, args.seed)
+            for fmt in ('rows', 'columns'):
+                samples, response = timed(lambda: view(factory.get(f'/api/{name}/?format={fmt}')), args.repeat)
+                results[f"{name}/{fmt}/{size}"] = dict(summarize(samples), bytes=len(response.content),
+                                                       status=response.status_code)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--only', nargs='+', choices=['cold_start', 'predict', 'similarity', 'lists'],
+                        default=['cold_start', 'predict', 'similarity', 'lists'])
+    parser.add_argument('--models-dir', type=Path, default=DEFAULT_MODELS_DIR)
+    parser.add_argument('--players', type=int, default=400, help="Synthetic players in the prediction dataset")
+    parser.add_argument('--dataset', type=Path, default=None,
+                        help="Use a pre-generated dataset (see benchmarks.generate) instead of --players")
+    parser.add_argument('--predict-players', type=int, default=100, help="Players in the batch prediction run")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000],
+                        help="Collection sizes for the similarity and list benchmarks")
+    parser.add_argument('--similarity-position', choices=SIMILARITY_POSITIONS, default='defender')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--cold-repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    django.setup()
+    logging.disable(logging.INFO)
+
+    from benchmarks.synthetic import player_seasons
+
+    report = {
+        'meta': {
+            'git_revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'args': {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        },
+        'results': {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset_path = args.dataset or Path(tmp) / 'finaldataset.xlsx'
+        if args.dataset is None and {'cold_start', 'predict'} & set(args.only):
+            player_seasons(args.players, seed=args.seed).to_excel(dataset_path, index=False)
+        if {'similarity', 'lists'} & set(args.only):
+            create_position_tables()
+
+        runners = {
+            'cold_start': lambda: bench_cold_start(args, dataset_path),
+            'predict': lambda: bench_predict(args, dataset_path),
+            'similarity': lambda: bench_similarity(args),
+            'lists': lambda: bench_lists(args),
+        }
+        for name in args.only:
+            try:
+                report['results'][name] = runners[name]()
+            except Exception as e:
+                report['results'][name] = {'error': f"{type(e).__name__}: {e}"}
+            print(f"{name}: done", file=sys.stderr)
+
+    with open(args.output, 'w') as fh:
+        json.dump(report, fh, indent=2, default=str)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""Synthetic stand-ins for finaldataset.xlsx, the players collection and the per-position collections."""
+import numpy as np
+import pandas as pd
+
+# Column order of models/finaldataset.xlsx
+DATASET_COLUMNS = [
+    'player_id', 'name', 'MV', 'Nation', 'Pos', 'Club', 'League', 'Age', 'MP', 'Starts', 'Min',
+    'Gls', 'Ast', 'PK_x', 'PKatt_x', 'CrdY', 'CrdR', 'Gls90', 'Ast90', 'GAper90', 'GlsAst',
+    'Sh', 'SoT', 'FK', 'SoTper', 'Sh90', 'SoT90', 'GSh', 'GSoT', 'Tackle', 'TackleW', 'Tackleper',
+    'Press', 'Succ_x', 'PressPer', 'Blocks', 'ShotB', 'PassB', 'Int', 'Clr', 'PassesCompleted',
+    'PassesAttempted', 'CmpPer', 'Touches', 'Succ_y', 'Attempted', 'DribSuccPer', 'Pl', 'NR', 'Year',
+]
+
+# finaldataset.xlsx column -> PlayerStats field where the names differ
+PLAYERSTATS_RENAMES = {'Gls90': 'Gls_90', 'Ast90': 'Ast_90', 'Pl': 'PI'}
+
+LEAGUE_CLUBS = {
+    'Premier Leauge': ['Manchester City', 'Liverpool', 'Arsenal', 'Chelsea', 'Manchester Utd',
+                       'Tottenham', 'Brighton', 'Newcastle Utd', 'Aston Villa', 'West Ham'],
+    'La Liga': ['Real Madrid', 'Barcelona', 'Atlético Madrid', 'Sevilla', 'Valencia',
+                'Athletic Club', 'Real Sociedad', 'Villarreal'],
+    'Bundesliga': ['Bayern Munich', 'Dortmund', 'RB Leipzig', 'Leverkusen', 'Wolfsburg',
+                   'Eint Frankfurt', 'Gladbach'],
+    'Serie A': ['Inter', 'Juventus', 'Milan', 'Napoli', 'Atalanta', 'Roma', 'Lazio'],
+    'Ligue1': ['PSG', 'Monaco', 'Lyon', 'Marseille', 'Lille', 'Rennes'],
+}
+NATIONS = ['ENG', 'ESP', 'GER', 'ITA', 'FRA', 'BRA', 'ARG', 'POR', 'NED', 'BEL']
+POSITIONS = ['FW', 'MF', 'DF', 'WB']
+POSITION_WEIGHTS = [0.35, 0.35, 0.28, 0.02]
+# Pos codes of the per-position collections (by db_table), with the hybrid roles FBref lists
+COLLECTION_POSITIONS = {
+    'forwards': (['FW', 'FW,MF', 'MF,FW'], [0.75, 0.15, 0.10]),
+    'midfielders': (['MF', 'MF,FW', 'MF,DF', 'DF,MF'], [0.70, 0.12, 0.12, 0.06]),
+    'defenders': (['DF', 'DF,MF'], [0.85, 0.15]),
+    'goalkeepers': (['GK'], [1.0]),
+}
+
+ALL_CLUBS = [(league, club) for league, clubs in LEAGUE_CLUBS.items() for club in clubs]
+TRANSFER_RATE = 0.12
+
+
+def _player_name(index):
+    return f"Synthetic Player {index:07d}"
+
+
+def _season_chunk(rng, first_id, n_players, seasons):
+    """Generate every season for players [first_id, first_id + n_players) as one frame"""
+    n_seasons = len(seasons)
+    total = n_players * n_seasons
+
+    # Careers: a club per season with occasional transfers, ages advancing one year per season
+    club_index = np.empty((n_players, n_seasons), dtype=np.int32)
+    club_index[:, 0] = rng.integers(0, len(ALL_CLUBS), n_players)
+    for s in range(1, n_seasons):
+        moves = rng.random(n_players) < TRANSFER_RATE
+        club_index[:, s] = np.where(moves, rng.integers(0, len(ALL_CLUBS), n_players), club_index[:, s - 1])
+    club_index = club_index.ravel()
+    start_age = rng.integers(17, 33, n_players)
+    ages = (start_age[:, None] + np.arange(n_seasons)).ravel()
+
+    # Market value follows an age curve peaking around 27 plus a per-player random walk
+    base_mv = rng.lognormal(3.2, 0.8, n_players)
+    walk = rng.normal(0.0, 0.12, (n_players, n_seasons)).cumsum(axis=1).ravel()
+    age_curve = np.exp(-((ages - 27) / 7.0) ** 2)
+    market_value = np.round(np.repeat(base_mv, n_seasons) * (0.4 + age_curve) * np.exp(walk), 4)
+
+    positions = np.repeat(rng.choice(POSITIONS, n_players, p=POSITION_WEIGHTS), n_seasons)
+    attacking = np.isin(positions, ['FW', 'MF']).astype(float)
+
+    matches = rng.integers(5, 60, total)
+    starts = np.minimum(matches, rng.integers(0, 55, total))
+    minutes = np.maximum(starts * rng.integers(60, 91, total) + (matches - starts) * 20, 90)
+    nineties = minutes / 90
+    shots = rng.poisson(1.2 + 1.8 * attacking, total) * nineties.astype(int) // 4
+    shots_on_target = rng.binomial(shots, 0.4)
+    goals = rng.binomial(shots_on_target, 0.3)
+    assists = rng.poisson(0.1 + 0.15 * attacking * nineties / 10)
+    tackles = rng.poisson(1.0 + 1.2 * (1 - attacking), total) * nineties.astype(int) // 3
+    passes_att = (rng.uniform(25, 70, total) * nineties).astype(int) + 1
+    passes_cmp = (passes_att * rng.uniform(0.6, 0.92, total)).astype(int)
+    dribbles = rng.integers(0, 320, total)
+    dribbles_won = rng.binomial(dribbles, 0.5)
+    presses = rng.integers(50, 900, total)
+    presses_won = rng.binomial(presses, 0.28)
+
+    frame = pd.DataFrame({
+        'player_id': np.repeat(np.arange(first_id + 1, first_id + n_players + 1), n_seasons),
+        'name': np.repeat([_player_name(i) for i in range(first_id, first_id + n_players)], n_seasons),
+        'MV': market_value,
+        'Nation': np.repeat(rng.choice(NATIONS, n_players), n_seasons),
+        'Pos': positions,
+        'Club': [ALL_CLUBS[i][1] for i in club_index],
+        'League': [ALL_CLUBS[i][0] for i in club_index],
+        'Age': ages,
+        'MP': matches,
+        'Starts': starts,
+        'Min': minutes,
+        'Gls': goals,
+        'Ast': assists,
+        'PK_x': rng.integers(0, 8, total),
+        'PKatt_x': rng.integers(0, 10, total),
+        'CrdY': rng.integers(0, 12, total),
+        'CrdR': rng.integers(0, 2, total),
+        'Gls90': np.round(goals / nineties, 2),
+        'Ast90': np.round(assists / nineties, 2),
+        'GAper90': np.round((goals + assists) / nineties, 2),
+        'GlsAst': goals + assists,
+        'Sh': shots,
+        'SoT': shots_on_target,
+        'FK': rng.integers(0, 15, total),
+        'SoTper': np.round(np.divide(shots_on_target * 100, shots, out=np.zeros(total), where=shots > 0), 2),
+        'Sh90': np.round(shots / nineties, 2),
+        'SoT90': np.round(shots_on_target / nineties, 2),
+        'GSh': np.round(np.divide(goals, shots, out=np.zeros(total), where=shots > 0), 2),
+        'GSoT': np.round(np.divide(goals, shots_on_target, out=np.zeros(total), where=shots_on_target > 0), 2),
+        'Tackle': tackles,
+        'TackleW': rng.binomial(tackles, 0.6),
+        'Tackleper': np.round(rng.uniform(30, 80, total), 2),
+        'Press': presses,
+        'Succ_x': presses_won,
+        'PressPer': np.round(presses_won * 100 / presses, 2),
+        'Blocks': rng.integers(0, 80, total),
+        'ShotB': rng.integers(0, 30, total),
+        'PassB': rng.integers(0, 60, total),
+        'Int': rng.integers(0, 70, total),
+        'Clr': rng.integers(0, 200, total),
+        'PassesCompleted': passes_cmp,
+        'PassesAttempted': passes_att,
+        'CmpPer': np.round(passes_cmp / passes_att * 100, 2),
+        'Touches': passes_att + rng.integers(100, 800, total),
+        'Succ_y': dribbles_won,
+        'Attempted': dribbles,
+        'DribSuccPer': np.round(np.divide(dribbles_won * 100, dribbles, out=np.zeros(total), where=dribbles > 0), 2),
+        'Pl': rng.integers(1, 200, total),
+        'NR': rng.integers(1, 5, total),
+        'Year': np.tile(seasons, n_players),
+    })
+    return frame[DATASET_COLUMNS]
+
+
+def iter_player_seasons(n_players, seasons=range(2018, 2023), chunk_players=50000, seed=0):
+    """
+    Yield the finaldataset.xlsx-shaped table in chunks of `chunk_players` players
+    (one row per player per season), so millions of rows never sit in memory at once.
+    """
+    rng = np.random.default_rng(seed)
+    seasons = list(seasons)
+    for first_id in range(0, n_players, chunk_players):
+        yield _season_chunk(rng, first_id, min(chunk_players, n_players - first_id), seasons)
+
+
+def player_seasons(n_players, seasons=range(2018, 2023), seed=0):
+    """The whole synthetic history as a single frame"""
+    return pd.concat(list(iter_player_seasons(n_players, seasons, seed=seed)), ignore_index=True)
+
+
+def latest_player_stats(frame):
+    """Reduce a season table to one PlayerStats-shaped row per player (their latest season)"""
+    latest = frame.sort_values('Year').drop_duplicates('player_id', keep='last')
+    return latest.drop(columns=['Year']).rename(columns=PLAYERSTATS_RENAMES)
+
+
+def position_frame(Model, n_rows, seed=0, first_id=0):
+    """
+    A comparison position collection (Defenders, Forwards, ...) with one column per
+    model field, named by field name. Values are drawn per field type; players are
+    named from `first_id` on, so chunks of one collection never repeat a name.
+    """
+    from django.db import models
+
+    rng = np.random.default_rng(seed)
+    clubs = [ALL_CLUBS[i] for i in rng.integers(0, len(ALL_CLUBS), n_rows)]
+    born = rng.integers(1985, 2007, n_rows)
+    columns = {}
+    for field in Model._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        if field.name == 'player':
+            columns[field.name] = [_player_name(i) for i in range(first_id, first_id + n_rows)]
+        elif field.name == 'squad':
+            columns[field.name] = [club for _, club in clubs]
+        elif field.name == 'comp':
+            columns[field.name] = [league for league, _ in clubs]
+        elif field.name == 'nation':
+            columns[field.name] = rng.choice(NATIONS, n_rows)
+        elif field.name == 'position':
+            codes, weights = COLLECTION_POSITIONS[Model._meta.db_table]
+            columns[field.name] = rng.choice(codes, n_rows, p=weights)
+        elif field.name == 'born':
+            columns[field.name] = born
+        elif field.name == 'age':
+            columns[field.name] = 2023 - born
+        elif field.name.endswith('percentage'):
+            columns[field.name] = np.round(rng.uniform(20, 95, n_rows), 1)
+        elif isinstance(field, models.IntegerField):
+            columns[field.name] = rng.integers(0, 100, n_rows)
+        else:
+            columns[field.name] = np.round(rng.gamma(2.0, 10.0, n_rows), 2)
+    return pd.DataFrame(columns)
+
+
+def position_rows(Model, n_rows, seed=0, first_id=0):
+    """Unsaved instances of a comparison position model"""
+    frame = position_frame(Model, n_rows, seed=seed, first_id=first_id)
+    return [Model(**row) for row in frame.to_dict('records')]
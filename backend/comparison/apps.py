@@ -1,6 +1,27 @@
 from django.apps import AppConfig
 
 
+def collections_version():
+    from pred.models import PlayerStats
+    from statvalue_backend.mongo import collections_version as version_of
+    from .models import Defenders, Forwards, Goalkeepers, Midfielders
+
+    return version_of((Defenders, Forwards, Midfielders, Goalkeepers, PlayerStats))
+
+
 class ComparisonConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'comparison'
+
+    def ready(self):
+        from django.conf import settings
+
+        from statvalue_backend.caching import register_version_source
+
+        # The comparison lists, their columnar snapshots and the player search follow the
+        # collections, which change independently of the prediction artifacts
+        register_version_source('collections', collections_version,
+                                timeout=getattr(settings, 'HTTP_CACHE', {}).get('COLLECTIONS_VERSION_TIMEOUT', 60))
+        if getattr(settings, 'KNN_ARTIFACTS', {}).get('PRELOAD'):
+            from .artifacts import artifacts
+            artifacts.preload_in_background()
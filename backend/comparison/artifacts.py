@@ -0,0 +1,155 @@
+"""
+Per-process cache of the per-position KNN models and scalers (knn_model_<position>.pkl,
+scaler_<position>.pkl, written by modeltrain.py).
+
+Artifacts are read from KNN_ARTIFACTS['DIR'] rather than the working directory,
+with joblib's mmap mode so the fitted arrays are shared through the page cache
+instead of copied into every worker. Each file is checked against the sha256
+recorded in the manifest (`manage.py build_knn_manifest`) before it is
+unpickled. A missing or mismatching artifact is logged once and served as
+unavailable rather than raising in the request. Files are re-checked on disk at
+most every RECHECK_SECONDS, so requests never touch the disk otherwise. All
+positions can be loaded concurrently in the background at startup.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+POSITIONS = ('forward', 'defender', 'midfielder', 'goalkeeper')
+HASH_CHUNK_BYTES = 1 << 20
+
+
+class ArtifactUnavailable(Exception):
+    pass
+
+
+def artifact_setting(name, default=None):
+    return getattr(settings, 'KNN_ARTIFACTS', {}).get(name, default)
+
+
+def artifact_dir():
+    return Path(artifact_setting('DIR') or settings.BASE_DIR.parent)
+
+
+def artifact_files(position):
+    return {'knn': f"knn_model_{position}.pkl", 'scaler': f"scaler_{position}.pkl"}
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest():
+    """{file name: sha256}, or None when no manifest has been written"""
+    path = artifact_setting('MANIFEST') or artifact_dir() / 'knn_manifest.json'
+    try:
+        with open(path) as fh:
+            return json.load(fh)['files']
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError) as e:
+        raise ArtifactUnavailable(f"Unreadable KNN manifest {path}: {str(e)}")
+
+
+def write_manifest(directory=None):
+    directory = Path(directory or artifact_dir())
+    files = {name: file_sha256(directory / name)
+             for position in POSITIONS for name in artifact_files(position).values()
+             if (directory / name).exists()}
+    path = artifact_setting('MANIFEST') or directory / 'knn_manifest.json'
+    with open(path, 'w') as fh:
+        json.dump({'files': files}, fh, indent=2, sort_keys=True)
+    return path, files
+
+
+def _signature(paths):
+    return tuple((os.stat(path).st_size, os.stat(path).st_mtime_ns) for path in paths)
+
+
+def load_position(position):
+    """(knn, scaler, signature) read from disk after checking the manifest"""
+    import joblib
+
+    paths = {kind: artifact_dir() / name for kind, name in artifact_files(position).items()}
+    missing = [str(path) for path in paths.values() if not path.exists()]
+    if missing:
+        raise ArtifactUnavailable(f"Missing KNN artifacts for {position}: {', '.join(missing)}")
+    signature = _signature(paths.values())
+
+    manifest = read_manifest()
+    if manifest is None:
+        if artifact_setting('REQUIRE_MANIFEST', False):
+            raise ArtifactUnavailable("No KNN manifest; run manage.py build_knn_manifest")
+    else:
+        for path in paths.values():
+            expected = manifest.get(path.name)
+            if expected is None or file_sha256(path) != expected:
+                raise ArtifactUnavailable(f"{path.name} does not match the KNN manifest")
+
+    mmap_mode = artifact_setting('MMAP_MODE', 'r')
+    return joblib.load(paths['knn'], mmap_mode=mmap_mode), joblib.load(paths['scaler'], mmap_mode=mmap_mode), signature
+
+
+class ArtifactCache:
+    """Loaded (knn, scaler) per position, or None for positions whose artifacts are unusable"""
+
+    def __init__(self):
+        self._entries = {}
+        self._locks = {position: threading.Lock() for position in POSITIONS}
+
+    def get(self, position):
+        entry = self._entries.get(position)
+        if entry is None or time.monotonic() - entry['checked'] > artifact_setting('RECHECK_SECONDS', 300):
+            entry = self._refresh(position, entry)
+        return entry['artifacts']
+
+    def _refresh(self, position, stale):
+        with self._locks[position]:
+            entry = self._entries.get(position)
+            if entry is not stale:
+                return entry
+            if entry is not None and entry['artifacts'] is not None:
+                try:
+                    paths = [artifact_dir() / name for name in artifact_files(position).values()]
+                    if _signature(paths) == entry['signature']:
+                        entry = dict(entry, checked=time.monotonic())
+                        self._entries[position] = entry
+                        return entry
+                except OSError:
+                    pass
+            try:
+                knn, scaler, signature = load_position(position)
+                entry = {'artifacts': (knn, scaler), 'signature': signature, 'checked': time.monotonic()}
+                logger.info(f"Loaded KNN artifacts for {position}")
+            except Exception as e:
+                # Keep serving what was loaded before, if anything
+                previous = entry['artifacts'] if entry is not None else None
+                entry = {'artifacts': previous, 'signature': entry and entry['signature'], 'checked': time.monotonic()}
+                logger.error(f"KNN artifacts for {position} unavailable: {str(e)}")
+            self._entries[position] = entry
+            return entry
+
+    def preload(self, positions=POSITIONS):
+        """Load every position concurrently; returns {position: loaded?}"""
+        with ThreadPoolExecutor(max_workers=artifact_setting('WORKERS', len(positions)),
+                                thread_name_prefix='knn-artifacts') as pool:
+            return dict(zip(positions, (result is not None for result in pool.map(self.get, positions))))
+
+    def preload_in_background(self):
+        threading.Thread(target=self.preload, name='knn-preload', daemon=True).start()
+
+
+artifacts = ArtifactCache()
@@ -0,0 +1,204 @@
+"""
+Cross-position player embedding over normalized per-90 PlayerStats features.
+
+Every player, whatever their position, is mapped to one float32 vector: counting
+stats are converted to per-90 rates, ratios and existing per-90 columns are kept,
+and each column is z-scored over the whole population. The matrix is built
+offline (`manage.py build_player_embedding`) together with one BallTree per
+position group, so "midfielders who play like this defender" is a single tree
+query over the midfielder group.
+"""
+import logging
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .filters import FilterIndex, nearest_in_mask
+
+logger = logging.getLogger(__name__)
+
+# Already rates per 90 minutes
+RATE_FEATURES = ('Gls_90', 'Ast_90', 'GAper90', 'Sh90', 'SoT90')
+# Season totals, divided by minutes / 90
+COUNT_FEATURES = ('Tackle', 'TackleW', 'Press', 'Succ_x', 'Blocks', 'ShotB', 'PassB', 'Int', 'Clr',
+                  'PassesCompleted', 'PassesAttempted', 'Touches', 'Succ_y', 'Attempted')
+# Percentages, independent of playing time
+RATIO_FEATURES = ('CmpPer', 'Tackleper', 'PressPer', 'DribSuccPer')
+EMBEDDING_FEATURES = RATE_FEATURES + COUNT_FEATURES + RATIO_FEATURES
+
+META_FIELDS = ('name', 'Pos', 'Club', 'League', 'Age', 'MV', 'Min')
+POSITION_GROUPS = ('GK', 'DF', 'MF', 'FW')
+MIN_MINUTES = 90
+
+
+def position_groups(pos):
+    """'DF,MF' -> ['DF', 'MF']"""
+    return [group for group in POSITION_GROUPS if group in (pos or '')]
+
+
+def per90_matrix(rows):
+    """Raw per-90 feature matrix from (META_FIELDS + EMBEDDING_FEATURES) value tuples"""
+    n_meta = len(META_FIELDS)
+    raw = np.array([[value or 0 for value in row[n_meta:]] for row in rows], dtype=np.float64).reshape(
+        len(rows), len(EMBEDDING_FEATURES))
+    minutes = np.array([row[META_FIELDS.index('Min')] or 0 for row in rows], dtype=np.float64)
+    nineties = np.maximum(minutes, MIN_MINUTES) / 90.0
+    start = len(RATE_FEATURES)
+    raw[:, start:start + len(COUNT_FEATURES)] /= nineties[:, np.newaxis]
+    return raw
+
+
+class PlayerEmbedding:
+    """The embedding matrix, player metadata and per-position BallTrees"""
+
+    def __init__(self, names, positions, clubs, leagues, ages, values, matrix, mean, scale, trees=None):
+        self.names = list(names)
+        self.positions = list(positions)
+        self.clubs = list(clubs)
+        self.leagues = list(leagues)
+        self.ages = np.asarray(ages, dtype=np.int16)
+        self.values = np.asarray(values, dtype=np.float32)
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.mean = mean
+        self.scale = scale
+        self.trees = trees if trees is not None else self._build_trees()
+        self._by_name = {name.lower(): i for i, name in enumerate(self.names)}
+        self.filters = self._build_filters()
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from PlayerStats values_list(*META_FIELDS, *EMBEDDING_FEATURES) tuples"""
+        raw = per90_matrix(rows)
+        mean = raw.mean(axis=0) if len(raw) else np.zeros(len(EMBEDDING_FEATURES))
+        scale = raw.std(axis=0) if len(raw) else np.ones(len(EMBEDDING_FEATURES))
+        scale[scale == 0] = 1.0
+        meta = list(zip(*rows)) if rows else [()] * len(META_FIELDS)
+        field = dict(zip(META_FIELDS, meta))
+        return cls(field['name'], field['Pos'], field['Club'], field['League'],
+                   [age or 0 for age in field['Age']], [mv or 0 for mv in field['MV']],
+                   (raw - mean) / scale, mean, scale)
+
+    def _build_trees(self):
+        """(row indexes, BallTree) for every position group and for everyone"""
+        from sklearn.neighbors import BallTree
+
+        trees = {}
+        groups = {group: [] for group in POSITION_GROUPS}
+        for i, pos in enumerate(self.positions):
+            for group in position_groups(pos):
+                groups[group].append(i)
+        groups['ALL'] = list(range(len(self.names)))
+        for group, rows in groups.items():
+            if rows:
+                rows = np.asarray(rows, dtype=np.int64)
+                trees[group] = (rows, BallTree(self.matrix[rows]))
+        return trees
+
+    def _build_filters(self):
+        filters = FilterIndex(len(self.names))
+        for group in POSITION_GROUPS:
+            rows = self.trees[group][0] if group in self.trees else []
+            mask = np.zeros(len(self.names), dtype=bool)
+            mask[rows] = True
+            filters.add_bitmask('position', group, mask)
+        filters.add_categorical('league', self.leagues)
+        filters.add_categorical('club', self.clubs)
+        filters.add_numeric('age', self.ages)
+        filters.add_numeric('value', self.values)
+        return filters
+
+    def __len__(self):
+        return len(self.names)
+
+    def index_of(self, name):
+        return self._by_name.get(name.lower())
+
+    def nearest(self, index, k=5, groups=None):
+        """(row, distance) of the k nearest players to row `index` within the given position groups"""
+        vector = self.matrix[index:index + 1]
+        candidates = {}
+        for group in groups or ['ALL']:
+            if group not in self.trees:
+                continue
+            rows, tree = self.trees[group]
+            distances, positions = tree.query(vector, k=min(k + 1, len(rows)))
+            for distance, position in zip(distances[0], positions[0]):
+                row = int(rows[position])
+                if row != index:
+                    candidates[row] = min(float(distance), candidates.get(row, float('inf')))
+        return sorted(candidates.items(), key=lambda item: item[1])[:k]
+
+    def search(self, index, k=5, groups=None, leagues=None, clubs=None,
+               min_age=None, max_age=None, min_value=None, max_value=None):
+        """
+        Nearest players under optional filters. Position-only queries use the
+        BallTrees; anything else is masked inside one vectorized distance pass.
+        """
+        mask = self.filters.mask(
+            categorical={'league': leagues, 'club': clubs},
+            ranges={'age': (min_age, max_age), 'value': (min_value, max_value)})
+        if mask is None:
+            return self.nearest(index, k=k, groups=groups)
+        if groups:
+            mask &= self.filters.mask(categorical={'position': groups})
+        return nearest_in_mask(self.matrix, self.matrix[index], mask, k, exclude=index)
+
+    def describe(self, row, distance=None):
+        player = {
+            'name': self.names[row],
+            'position': self.positions[row],
+            'club': self.clubs[row],
+            'league': self.leagues[row],
+            'age': int(self.ages[row]),
+            'marketValue': float(self.values[row]),
+        }
+        if distance is not None:
+            player['distance'] = distance
+        return player
+
+    def save(self, path):
+        import joblib
+
+        joblib.dump({
+            'names': self.names, 'positions': self.positions, 'clubs': self.clubs, 'leagues': self.leagues,
+            'ages': self.ages, 'values': self.values, 'matrix': self.matrix,
+            'mean': self.mean, 'scale': self.scale, 'trees': self.trees,
+            'features': EMBEDDING_FEATURES,
+        }, path)
+
+    @classmethod
+    def load(cls, path):
+        import joblib
+
+        data = joblib.load(path)
+        if tuple(data.get('features', ())) != EMBEDDING_FEATURES:
+            raise ValueError(f"Player embedding at {path} was built with other features; "
+                             f"run manage.py build_player_embedding again")
+        return cls(data['names'], data['positions'], data['clubs'], data['leagues'], data['ages'],
+                   data['values'], data['matrix'], data['mean'], data['scale'], data['trees'])
+
+
+_loaded = None
+_lock = threading.Lock()
+
+
+def get_embedding():
+    """The embedding at PLAYER_EMBEDDING_PATH, reloaded when the file changes; None if not built"""
+    global _loaded
+    path = str(settings.PLAYER_EMBEDDING_PATH)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if _loaded is None or _loaded[0] != mtime:
+        with _lock:
+            if _loaded is None or _loaded[0] != mtime:
+                try:
+                    _loaded = (mtime, PlayerEmbedding.load(path))
+                except Exception as e:
+                    logger.error(f"Error loading player embedding: {str(e)}")
+                    return None
+                logger.info(f"Loaded player embedding with {len(_loaded[1])} players")
+    return _loaded[1]
@@ -0,0 +1,98 @@
+"""
+Precomputed column indexes for filtering a fixed set of player rows.
+
+Low-cardinality columns (leagues, position groups) keep one packed bitmask per
+value, so a filter is a handful of bitwise ORs/ANDs over n/8 bytes.
+High-cardinality columns (clubs) keep an int32 code per row, and numeric
+columns (age, market value) a sorted copy plus the sort order, so a range is
+two binary searches. The resulting boolean mask is applied inside the
+vectorized distance computation instead of post-filtering a top-k.
+"""
+import numpy as np
+
+MAX_BITMASK_VALUES = 256
+
+
+class FilterIndex:
+    def __init__(self, n_rows):
+        self.n_rows = n_rows
+        self._bitmasks = {}
+        self._codes = {}
+        self._sorted = {}
+
+    def add_bitmask(self, column, value, mask):
+        self._bitmasks.setdefault(column, {})[str(value).lower()] = np.packbits(np.asarray(mask, dtype=bool))
+
+    def add_categorical(self, column, values):
+        lowered = np.array([str(v).lower() if v is not None else '' for v in values], dtype=object)
+        uniques, codes = np.unique(lowered, return_inverse=True) if len(lowered) else ([], np.array([], int))
+        if len(uniques) <= MAX_BITMASK_VALUES:
+            for code, value in enumerate(uniques):
+                self.add_bitmask(column, value, codes == code)
+        else:
+            self._codes[column] = ({value: code for code, value in enumerate(uniques)}, codes.astype(np.int32))
+
+    def add_numeric(self, column, values):
+        values = np.asarray(values, dtype=np.float64)
+        order = np.argsort(values, kind='stable')
+        self._sorted[column] = (values[order], order)
+
+    def categorical(self, column, wanted):
+        """Packed mask of rows whose `column` is any of `wanted` (case-insensitive)"""
+        wanted = [str(v).lower() for v in wanted]
+        if column in self._bitmasks:
+            masks = self._bitmasks[column]
+            packed = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+            for value in wanted:
+                if value in masks:
+                    packed |= masks[value]
+            return packed
+        if column not in self._codes:
+            return np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        lookup, codes = self._codes[column]
+        wanted_codes = [lookup[value] for value in wanted if value in lookup]
+        return np.packbits(np.isin(codes, wanted_codes))
+
+    def numeric_range(self, column, low=None, high=None):
+        """Packed mask of rows with low <= column <= high"""
+        sorted_values, order = self._sorted[column]
+        start = 0 if low is None else np.searchsorted(sorted_values, low, side='left')
+        stop = len(sorted_values) if high is None else np.searchsorted(sorted_values, high, side='right')
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[order[start:stop]] = True
+        return np.packbits(mask)
+
+    def mask(self, categorical=None, ranges=None):
+        """
+        Boolean row mask for {column: [values]} and {column: (low, high)} filters,
+        ANDed together; None when no filter is given.
+        """
+        packed = None
+        for column, wanted in (categorical or {}).items():
+            if wanted:
+                part = self.categorical(column, wanted)
+                packed = part if packed is None else packed & part
+        for column, (low, high) in (ranges or {}).items():
+            if low is not None or high is not None:
+                part = self.numeric_range(column, low, high)
+                packed = part if packed is None else packed & part
+        if packed is None:
+            return None
+        return np.unpackbits(packed, count=self.n_rows).astype(bool)
+
+
+def nearest_in_mask(matrix, vector, mask, k, exclude=None):
+    """(row, distance) of the k rows of `matrix` nearest to `vector` among rows where `mask` is set"""
+    rows = np.flatnonzero(mask)
+    if exclude is not None:
+        rows = rows[rows != exclude]
+    if not len(rows):
+        return []
+    diff = matrix[rows] - vector
+    squared = np.einsum('ij,ij->i', diff, diff)
+    if len(rows) > k:
+        top = np.argpartition(squared, k)[:k]
+    else:
+        top = np.arange(len(rows))
+    top = top[np.argsort(squared[top], kind='stable')]
+    return [(int(rows[i]), float(np.sqrt(squared[i]))) for i in top]
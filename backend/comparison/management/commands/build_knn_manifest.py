@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from comparison.artifacts import write_manifest
+
+
+class Command(BaseCommand):
+    help = "Record the sha256 of every KNN model and scaler pickle so workers can verify them before loading"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help="Defaults to KNN_ARTIFACTS['DIR']")
+
+    def handle(self, *args, **options):
+        path, files = write_manifest(options['dir'])
+        for name, digest in sorted(files.items()):
+            self.stdout.write(f"{name}  {digest}")
+        self.stdout.write(f"Wrote {len(files)} entries to {path}")
@@ -0,0 +1,30 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from statvalue_backend import mongo
+from comparison.embedding import EMBEDDING_FEATURES, META_FIELDS, PlayerEmbedding
+from pred.models import PlayerStats
+
+
+class Command(BaseCommand):
+    help = ("Build the cross-position player embedding (normalized per-90 PlayerStats features) "
+            "and its per-position BallTree index")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=Path, default=None,
+                            help="Defaults to PLAYER_EMBEDDING_PATH")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        rows = mongo.values_list(PlayerStats, *META_FIELDS, *EMBEDDING_FEATURES)
+        if not rows:
+            raise CommandError("No PlayerStats rows to embed")
+
+        embedding = PlayerEmbedding.from_rows(rows)
+        output = options['output'] or Path(settings.PLAYER_EMBEDDING_PATH)
+        embedding.save(output)
+        self.stdout.write(f"Embedded {len(embedding)} players x {embedding.matrix.shape[1]} features "
+                          f"in {time.perf_counter() - start:.2f}s -> {output}")
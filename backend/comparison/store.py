@@ -0,0 +1,176 @@
+"""
+Read-only columnar snapshots of the position collections.
+
+Each collection is read with one projected query (statvalue_backend.mongo) into
+NumPy arrays (one per numeric column, with a null mask where the column has
+missing values), interned categorical codes for Nation/Squad/Comp/Pos and an
+object array of names. The comparison views read columns, matrices and tuples
+from it instead of instantiating a model object per player; code that wants
+objects gets `PlayerRow` views that hold only (store, index).
+
+Snapshots are rebuilt when the dataset version changes or after
+COMPARISON_STORE_TTL seconds, whichever comes first.
+"""
+import logging
+import sys
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import models
+
+from statvalue_backend import mongo
+from statvalue_backend.caching import dataset_version
+from .filters import FilterIndex
+
+logger = logging.getLogger(__name__)
+
+CATEGORICAL_FIELDS = ('nation', 'position', 'squad', 'comp')
+
+
+class PlayerRow:
+    """Attribute view of one row of a PositionStore"""
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    def __getattr__(self, attr):
+        return self._store.value(attr, self._index)
+
+    def __repr__(self):
+        return f"<PlayerRow {self._store.model_name}[{self._index}] {self.player!r}>"
+
+
+class PositionStore:
+    """Columnar snapshot of one position collection"""
+
+    def __init__(self, Model, version=None):
+        self.model_name = Model.__name__
+        self.version = version
+        self.built_at = time.monotonic()
+        fields = [f for f in Model._meta.concrete_fields if not f.primary_key]
+        attrs = [f.name for f in fields]
+        rows = mongo.values_list(Model, *attrs)
+        raw = dict(zip(attrs, zip(*rows))) if rows else {attr: () for attr in attrs}
+
+        self.size = len(rows)
+        self._numeric = {}
+        self._nulls = {}
+        self._categorical = {}
+        self._strings = {}
+        for field in fields:
+            values = raw[field.name]
+            if isinstance(field, (models.IntegerField, models.FloatField)):
+                self._add_numeric(field, values)
+            elif field.name in CATEGORICAL_FIELDS:
+                self._add_categorical(field.name, values)
+            else:
+                self._strings[field.name] = np.array(values, dtype=object)
+
+        self._by_name = {}
+        for i, name in enumerate(self._strings.get('player', ())):
+            self._by_name.setdefault((name or '').lower(), []).append(i)
+        self._matrices = {}
+        self.filters = self._build_filters()
+
+    def _add_numeric(self, field, values):
+        nulls = np.array([v is None for v in values], dtype=bool)
+        dtype = np.int64 if isinstance(field, models.IntegerField) else np.float64
+        if nulls.any():
+            self._nulls[field.name] = nulls
+            dtype = np.float64
+            values = [np.nan if v is None else v for v in values]
+        self._numeric[field.name] = np.array(values, dtype=dtype)
+
+    def _add_categorical(self, attr, values):
+        categories, codes = [], []
+        lookup = {}
+        for value in values:
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(categories)
+                categories.append(sys.intern(value) if isinstance(value, str) else value)
+            codes.append(code)
+        self._categorical[attr] = (categories, np.array(codes, dtype=np.int32))
+
+    def _build_filters(self):
+        filters = FilterIndex(self.size)
+        for attr in ('comp', 'squad'):
+            if attr in self._categorical:
+                categories, codes = self._categorical[attr]
+                filters.add_categorical(attr, [categories[c] for c in codes])
+        if 'age' in self._numeric:
+            filters.add_numeric('age', self._numeric['age'])
+        return filters
+
+    def __len__(self):
+        return self.size
+
+    def value(self, attr, index):
+        if attr in self._numeric:
+            if attr in self._nulls and self._nulls[attr][index]:
+                return None
+            return self._numeric[attr][index].item()
+        if attr in self._categorical:
+            categories, codes = self._categorical[attr]
+            return categories[codes[index]]
+        if attr in self._strings:
+            return self._strings[attr][index]
+        raise AttributeError(f"{self.model_name} has no field {attr!r}")
+
+    def column(self, attr):
+        """Python values of a column, None where missing"""
+        if attr in self._numeric:
+            values = self._numeric[attr].tolist()
+            if attr in self._nulls:
+                values = [None if null else v for v, null in zip(values, self._nulls[attr])]
+            return values
+        if attr in self._categorical:
+            categories, codes = self._categorical[attr]
+            return [categories[c] for c in codes.tolist()]
+        return self._strings[attr].tolist()
+
+    def values_list(self, attrs):
+        """Row tuples, like QuerySet.values_list(*attrs)"""
+        return list(zip(*[self.column(attr) for attr in attrs]))
+
+    def matrix(self, attrs):
+        """float64 (rows, attrs) matrix with missing values as 0, cached per attribute tuple"""
+        attrs = tuple(attrs)
+        matrix = self._matrices.get(attrs)
+        if matrix is None:
+            matrix = np.zeros((self.size, len(attrs)), dtype=np.float64)
+            for j, attr in enumerate(attrs):
+                if attr in self._numeric:
+                    matrix[:, j] = np.nan_to_num(self._numeric[attr].astype(np.float64), nan=0.0)
+            self._matrices[attrs] = matrix
+        return matrix
+
+    def find(self, name):
+        """Row indexes whose player name matches case-insensitively"""
+        return self._by_name.get((name or '').lower(), [])
+
+    def row(self, index):
+        return PlayerRow(self, index)
+
+
+_stores = {}
+_lock = threading.Lock()
+
+
+def position_store(Model):
+    """The current snapshot of Model's collection, rebuilding it when stale"""
+    version = dataset_version('collections')['version']
+    ttl = getattr(settings, 'COMPARISON_STORE_TTL', 300)
+    store = _stores.get(Model)
+    if store is None or store.version != version or time.monotonic() - store.built_at > ttl:
+        with _lock:
+            store = _stores.get(Model)
+            if store is None or store.version != version or time.monotonic() - store.built_at > ttl:
+                store = PositionStore(Model, version)
+                _stores[Model] = store
+                logger.info(f"Loaded {len(store)} {Model.__name__} into the columnar store")
+    return store
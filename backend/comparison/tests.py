@@ -1,3 +1,296 @@
-from django.test import TestCase
+import os
+from unittest import skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from benchmarks.synthetic import position_rows
+from statvalue_backend.mongo import ModelRepository, uses_mongo
+from .models import Defenders, Forwards, Midfielders, Goalkeepers
+from .store import PositionStore
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+POSITION_MODELS = (Defenders, Forwards, Midfielders, Goalkeepers)
+
+
+def model_fields(Model):
+    return [f for f in Model._meta.concrete_fields if not f.primary_key]
+
+
+def as_document(instance):
+    """The document djongo stores for `instance`, keyed by db_column"""
+    return {f.column: f.to_python(getattr(instance, f.attname)) for f in model_fields(type(instance))}
+
+
+def as_row(instance, fields):
+    return tuple(f.to_python(getattr(instance, f.attname)) for f in fields)
+
+
+class SyntheticPositionTests(SimpleTestCase):
+    """The synthetic collections use the Pos codes the similarity position filter understands"""
+
+    def test_positions_use_real_codes(self):
+        from benchmarks.synthetic import position_frame
+        from .embedding import POSITION_GROUPS, position_groups
+
+        primary = {Defenders: 'DF', Forwards: 'FW', Midfielders: 'MF', Goalkeepers: 'GK'}
+        for Model in POSITION_MODELS:
+            with self.subTest(model=Model.__name__):
+                positions = position_frame(Model, 200, seed=4)['position']
+                self.assertTrue(all(set(code.split(',')) <= set(POSITION_GROUPS) for code in positions))
+                self.assertTrue(all(primary[Model] in position_groups(code) for code in positions))
+                self.assertIn(primary[Model], set(positions))
+
+
+@skipUnless(mongomock, "mongomock is not installed")
+class MongomockRepositoryTests(SimpleTestCase):
+    """ModelRepository on an in-memory Mongo stand-in, against the values the ORM would return"""
+
+    def setUp(self):
+        self.database = mongomock.MongoClient()['statvalue_test']
+
+    def seed(self, Model, n_rows=25):
+        instances = position_rows(Model, n_rows, seed=1)
+        self.database[Model._meta.db_table].insert_many([as_document(i) for i in instances])
+        return instances
+
+    def test_values_list_matches_model_values(self):
+        for Model in POSITION_MODELS:
+            with self.subTest(model=Model.__name__):
+                instances = self.seed(Model)
+                fields = model_fields(Model)
+                repository = ModelRepository(Model, database=self.database)
+                self.assertEqual(repository.values_list(*[f.name for f in fields]),
+                                 [as_row(i, fields) for i in instances])
+
+    def test_projection_keeps_requested_order(self):
+        instances = self.seed(Defenders)
+        repository = ModelRepository(Defenders, database=self.database)
+        self.assertEqual(repository.values_list('age', 'player'), [(i.age, i.player) for i in instances])
+
+    def test_missing_columns_read_as_none(self):
+        self.database[Goalkeepers._meta.db_table].insert_one({'Player': 'No Stats'})
+        repository = ModelRepository(Goalkeepers, database=self.database)
+        self.assertEqual(repository.values_list('player', 'age', 'err'), [('No Stats', None, None)])
+
+    def test_unknown_field_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ModelRepository(Defenders, database=self.database).values_list('goals')
+
+
+@skipUnless(uses_mongo() and os.environ.get('STATVALUE_TEST_MONGO') == '1',
+            "needs a local mongod; set STATVALUE_TEST_MONGO=1")
+class OrmEquivalenceTests(TestCase):
+    """The pymongo fast path and the columnar store return exactly what the djongo ORM returns"""
+
+    def setUp(self):
+        for Model in POSITION_MODELS:
+            Model.objects.bulk_create(position_rows(Model, 40, seed=2))
+
+    def test_values_list_matches_orm(self):
+        for Model in POSITION_MODELS:
+            with self.subTest(model=Model.__name__):
+                names = [f.name for f in model_fields(Model)]
+                self.assertEqual(ModelRepository(Model).values_list(*names),
+                                 list(Model.objects.values_list(*names)))
+
+    def test_name_lookup_matches_orm(self):
+        for Model in POSITION_MODELS:
+            with self.subTest(model=Model.__name__):
+                name = Model.objects.values_list('player', flat=True)[5]
+                store = PositionStore(Model)
+                self.assertEqual([(store.row(i).player, store.row(i).age) for i in store.find(name.swapcase())],
+                                 list(Model.objects.filter(player__iexact=name).values_list('player', 'age')))
+
+    def test_store_matches_orm(self):
+        for Model in POSITION_MODELS:
+            with self.subTest(model=Model.__name__):
+                names = [f.name for f in model_fields(Model)]
+                self.assertEqual(PositionStore(Model).values_list(names),
+                                 list(Model.objects.values_list(*names)))
+
+
+class FilterIndexTests(SimpleTestCase):
+    """Bitmask, code and sorted-range filters against the equivalent boolean expressions"""
+
+    def setUp(self):
+        from .filters import FilterIndex
+
+        rng = np.random.default_rng(5)
+        self.n = 1003
+        self.leagues = rng.choice(['La Liga', 'Serie A', 'Bundesliga'], self.n)
+        self.clubs = np.array([f"Club {i}" for i in rng.integers(0, 400, self.n)])
+        self.ages = rng.integers(17, 38, self.n)
+        self.index = FilterIndex(self.n)
+        self.index.add_categorical('league', self.leagues)
+        self.index.add_categorical('club', self.clubs)
+        self.index.add_numeric('age', self.ages)
+
+    def test_no_filter_gives_no_mask(self):
+        self.assertIsNone(self.index.mask())
+        self.assertIsNone(self.index.mask(categorical={'league': None}, ranges={'age': (None, None)}))
+
+    def test_filters_are_anded_case_insensitively(self):
+        # 400 clubs exceed MAX_BITMASK_VALUES, so clubs use the int32 code path
+        mask = self.index.mask(categorical={'league': ['serie a', 'LA LIGA'], 'club': ['club 7', 'Club 9']},
+                               ranges={'age': (21, 30)})
+        expected = (np.isin(self.leagues, ['Serie A', 'La Liga']) & np.isin(self.clubs, ['Club 7', 'Club 9'])
+                    & (self.ages >= 21) & (self.ages <= 30))
+        np.testing.assert_array_equal(mask, expected)
+        self.assertEqual(mask.shape, (self.n,))
+
+    def test_open_ranges_and_unknown_values(self):
+        np.testing.assert_array_equal(self.index.mask(ranges={'age': (None, 20)}), self.ages <= 20)
+        np.testing.assert_array_equal(self.index.mask(ranges={'age': (35, None)}), self.ages >= 35)
+        self.assertFalse(self.index.mask(categorical={'league': ['Ligue1']}).any())
+        self.assertFalse(self.index.mask(categorical={'nation': ['ENG']}).any())
+
+    def test_nearest_in_mask_respects_mask_and_exclusion(self):
+        from .filters import nearest_in_mask
+
+        rng = np.random.default_rng(6)
+        matrix = rng.normal(size=(self.n, 4))
+        mask = self.ages >= 30
+        neighbours = nearest_in_mask(matrix, matrix[0], mask, 5, exclude=0)
+        allowed = np.flatnonzero(mask)
+        allowed = allowed[allowed != 0]
+        distances = np.linalg.norm(matrix[allowed] - matrix[0], axis=1)
+        self.assertEqual([row for row, _ in neighbours], list(allowed[np.argsort(distances, kind='stable')[:5]]))
+        np.testing.assert_allclose([d for _, d in neighbours], np.sort(distances)[:5])
+        self.assertEqual(nearest_in_mask(matrix, matrix[0], np.zeros(self.n, dtype=bool), 5), [])
+
+
+class PlayerEmbeddingTests(SimpleTestCase):
+    """Tree and masked searches over the cross-position embedding agree with brute force"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from benchmarks.synthetic import latest_player_stats, player_seasons
+        from .embedding import EMBEDDING_FEATURES, META_FIELDS, PlayerEmbedding
+
+        stats = latest_player_stats(player_seasons(300, seed=8))
+        rows = list(stats[list(META_FIELDS + EMBEDDING_FEATURES)].itertuples(index=False, name=None))
+        cls.embedding = PlayerEmbedding.from_rows(rows)
+
+    def brute_force(self, index, allowed, k):
+        allowed = allowed[allowed != index]
+        distances = np.linalg.norm(self.embedding.matrix[allowed] - self.embedding.matrix[index], axis=1)
+        return list(allowed[np.argsort(distances, kind='stable')[:k]])
+
+    def test_matrix_is_standardized(self):
+        np.testing.assert_allclose(self.embedding.matrix.mean(axis=0), 0, atol=1e-4)
+        name = self.embedding.names[3]
+        self.assertEqual(self.embedding.index_of(name.upper()), 3)
+
+    def test_unfiltered_search_uses_the_trees(self):
+        neighbours = self.embedding.search(0, k=5)
+        self.assertEqual([row for row, _ in neighbours], self.brute_force(0, np.arange(len(self.embedding)), 5))
+        self.assertNotIn(0, [row for row, _ in neighbours])
+
+        midfield = self.embedding.search(0, k=5, groups=['MF'])
+        self.assertTrue(all('MF' in self.embedding.positions[row] for row, _ in midfield))
+        self.assertEqual([row for row, _ in midfield], self.brute_force(0, self.embedding.trees['MF'][0], 5))
+
+    def test_filtered_search_matches_brute_force(self):
+        embedding = self.embedding
+        league = embedding.leagues[0]
+        neighbours = embedding.search(0, k=10, groups=['DF', 'FW'], leagues=[league.upper()], min_age=20, max_age=32)
+        ages = embedding.ages
+        allowed = np.flatnonzero(
+            np.array([league == value for value in embedding.leagues])
+            & np.array([any(group in pos for group in ('DF', 'FW')) for pos in embedding.positions])
+            & (ages >= 20) & (ages <= 32))
+        self.assertEqual([row for row, _ in neighbours], self.brute_force(0, allowed, 10))
+        distances = [distance for _, distance in neighbours]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_save_load_round_trip_checks_features(self):
+        import tempfile
+
+        import joblib
+
+        from .embedding import PlayerEmbedding
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'embedding.joblib')
+            self.embedding.save(path)
+            loaded = PlayerEmbedding.load(path)
+            self.assertEqual(loaded.search(5, k=3, min_value=10), self.embedding.search(5, k=3, min_value=10))
+
+            data = joblib.load(path)
+            data['features'] = data['features'][:-1]
+            joblib.dump(data, path)
+            with self.assertRaises(ValueError):
+                PlayerEmbedding.load(path)
+
+
+class ArtifactCacheTests(SimpleTestCase):
+    """KNN artifacts are only unpickled when they match the manifest"""
+
+    def setUp(self):
+        import tempfile
+
+        import joblib
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for position in ('forward', 'defender'):
+            joblib.dump(np.arange(8.0), os.path.join(self.tmp.name, f"knn_model_{position}.pkl"))
+            joblib.dump(np.ones(3), os.path.join(self.tmp.name, f"scaler_{position}.pkl"))
+        overrides = override_settings(KNN_ARTIFACTS={'DIR': self.tmp.name, 'RECHECK_SECONDS': 0})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def tamper(self, name='knn_model_forward.pkl'):
+        import joblib
+
+        joblib.dump(np.arange(9.0), os.path.join(self.tmp.name, name))
+
+    def test_matching_manifest_loads_memory_mapped_arrays(self):
+        from .artifacts import ArtifactCache, write_manifest
+
+        _, files = write_manifest()
+        self.assertEqual(set(files), {'knn_model_forward.pkl', 'scaler_forward.pkl',
+                                      'knn_model_defender.pkl', 'scaler_defender.pkl'})
+        knn, scaler = ArtifactCache().get('forward')
+        np.testing.assert_array_equal(knn, np.arange(8.0))
+        self.assertIsInstance(knn, np.memmap)
+
+    def test_mismatch_is_unavailable(self):
+        from .artifacts import ArtifactCache, write_manifest
+
+        write_manifest()
+        self.tamper()
+        cache = ArtifactCache()
+        self.assertIsNone(cache.get('forward'))
+        self.assertIsNotNone(cache.get('defender'))
+        self.assertIsNone(cache.get('goalkeeper'))
+        self.assertEqual(cache.preload(), {'forward': False, 'defender': True, 'midfielder': False,
+                                           'goalkeeper': False})
+
+    def test_changed_file_keeps_serving_the_verified_artifacts(self):
+        from .artifacts import ArtifactCache, write_manifest
+
+        write_manifest()
+        cache = ArtifactCache()
+        loaded = cache.get('forward')
+        self.tamper()
+        self.assertIs(cache.get('forward'), loaded)
+
+        write_manifest()
+        np.testing.assert_array_equal(cache.get('forward')[0], np.arange(9.0))
+
+    def test_missing_or_unreadable_manifest(self):
+        from .artifacts import ArtifactCache
+
+        self.assertIsNotNone(ArtifactCache().get('forward'))
+        with override_settings(KNN_ARTIFACTS={'DIR': self.tmp.name, 'REQUIRE_MANIFEST': True}):
+            self.assertIsNone(ArtifactCache().get('forward'))
+        with open(os.path.join(self.tmp.name, 'knn_manifest.json'), 'w') as fh:
+            fh.write('{"files": ')
+        self.assertIsNone(ArtifactCache().get('forward'))
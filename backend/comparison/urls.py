@@ -8,4 +8,5 @@ urlpatterns = [
     path('forwards/', views.get_forwards, name='get_forwards'),
     path('goalkeepers/', views.get_goalkeepers, name='get_goalkeepers'),
     path('similar_players/', views.get_similar_players, name='get_similar_players'),        
+    path('similar_players/unified/', views.get_similar_players_unified, name='get_similar_players_unified'),
 ]
\ No newline at end of file
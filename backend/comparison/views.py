@@ -1,116 +1,135 @@
 from django.http import JsonResponse
 from .models import Defenders, Forwards, Midfielders, Goalkeepers
 from django.views.decorators.csrf import csrf_exempt
+from statvalue_backend.caching import dataset_cached
+from statvalue_backend.metrics import stage_timer
+from statvalue_backend.renderers import tabular_response
+from .store import position_store
 import json
 
+# (response key, model attribute) shared by every position listing
+COMMON_FIELDS = (
+    ('name', 'player'),
+    ('Nation', 'nation'),
+    ('Pos', 'position'),
+    ('Squad', 'squad'),
+    ('Comp', 'comp'),
+    ('Age', 'age'),
+    ('Born', 'born'),
+    ('MP', 'mp'),
+    ('Starts', 'starts'),
+    ('Min', 'min'),
+    ('NinetyS', 'ninety_s'),
+)
+
+DEFENDER_FIELDS = COMMON_FIELDS + (
+    ('AerWonPerc', 'aerwon_percentage'),
+    ('TklWon', 'tklwon'),
+    ('Clr', 'clr'),
+    ('BlkSh', 'blksh'),
+    ('Int', 'int'),
+    ('PasMedCmp', 'pasmedcmp'),
+    ('PasMedCmpPerc', 'pasmedcmp_percentage'),
+)
+
+FORWARD_FIELDS = COMMON_FIELDS + (
+    ('Goals', 'goals'),
+    ('SoT', 'sot'),
+    ('SoTPerc', 'sot_percentage'),
+    ('ScaSh', 'scash'),
+    ('TouAttPen', 'touattpen'),
+    ('Assists', 'assists'),
+    ('Sca', 'sca'),
+)
+
+MIDFIELDER_FIELDS = COMMON_FIELDS + (
+    ('Recovery', 'recov'),
+    ('PasTotCmp', 'pastotcmp'),
+    ('PasTotCmp_percentage', 'pastotcmp_percentage'),
+    ('PasProg', 'pasprog'),
+    ('TklMid3rd', 'tklmid3rd'),
+    ('CarProg', 'carprog'),
+    ('Int', 'int'),
+)
+
+GOALKEEPER_FIELDS = COMMON_FIELDS + (
+    ('PasTotCmpPerc', 'pastotcmp_percentage'),
+    ('PasTotCmp', 'pastotcmp'),
+    ('Err', 'err'),
+    ('SavePerc', 'save_percentage'),
+    ('SweeperActions', 'sweeper_actions'),
+    ('Pas3rd', 'pas3rd'),
+)
+
+
+def list_players(request, Model, fields):
+    """Serialize a position collection in the format the client negotiated"""
+    keys = [key for key, _ in fields]
+    rows = position_store(Model).values_list([attr for _, attr in fields])
+    return tabular_response(request, keys, rows)
+
+@dataset_cached(scope='collections')
 def get_defenders(request):
-    defenders = Defenders.objects.all()
-    data = [{'name': d.player,
-             'Nation': d.nation,
-             'Pos': d.position,
-             'Squad': d.squad,
-             'Comp': d.comp,
-             'Age': d.age,	
-             'Born': d.born,
-             'MP': d.mp,
-             'Starts': d.starts,
-             'Min': d.min,
-             'NinetyS': d.ninety_s,  
-             'AerWonPerc': d.aerwon_percentage,
-             'TklWon': d.tklwon,
-             'Clr': d.clr,
-             'BlkSh': d.blksh,
-             'Int': d.int,
-             'PasMedCmp': d.pasmedcmp,
-            'PasMedCmpPerc': d.pasmedcmp_percentage
-             } for d in defenders]   
-    return JsonResponse(data, safe=False)
+    return list_players(request, Defenders, DEFENDER_FIELDS)
 
+@dataset_cached(scope='collections')
 def get_forwards(request):
-    forwards = Forwards.objects.all()
-    data = [{'name': f.player,
-             'Nation': f.nation,
-             'Pos': f.position,
-             'Squad': f.squad,
-             'Comp': f.comp,
-             'Age': f.age,
-             'Born': f.born,
-             'MP': f.mp,
-             'Starts': f.starts,
-             'Min': f.min,
-             'NinetyS': f.ninety_s,
-             'Goals': f.goals,
-             'SoT': f.sot,
-             'SoTPerc': f.sot_percentage,
-             'ScaSh': f.scash,
-             'TouAttPen': f.touattpen,
-             'Assists': f.assists,
-             'Sca': f.sca
-                } for f in forwards]
-    return JsonResponse(data, safe=False)
+    return list_players(request, Forwards, FORWARD_FIELDS)
 
+@dataset_cached(scope='collections')
 def get_midfielders(request):
-    midfielders = Midfielders.objects.all()
-    data = [{'name': m.player,
-             'Nation': m.nation,
-             'Pos': m.position,
-             'Squad': m.squad,
-             'Comp': m.comp,
-             'Age': m.age,
-             'Born': m.born,
-             'MP': m.mp,
-             'Starts': m.starts,
-             'Min': m.min,
-             'NinetyS': m.ninety_s,
-             'Recovery':m.recov,
-             'PasTotCmp':m.pastotcmp,
-             'PasTotCmp_percentage':m.pastotcmp_percentage,
-             'PasProg':m.pasprog,
-             'TklMid3rd':m.tklmid3rd,
-             'CarProg':m.carprog,
-             'Int':m.int
-             } for m in midfielders]
-    
-    return JsonResponse(data, safe=False)
+    return list_players(request, Midfielders, MIDFIELDER_FIELDS)
 
+@dataset_cached(scope='collections')
 def get_goalkeepers(request):
-    goalkeepers = Goalkeepers.objects.all()
-    data = [{'name': g.player,
-             'Nation': g.nation,
-             'Pos': g.position,
-             'Squad': g.squad,
-             'Comp': g.comp,
-             'Age': g.age,
-             'Born': g.born,
-             'MP': g.mp,
-             'Starts': g.starts,
-             'Min': g.min,
-             'NinetyS': g.ninety_s,
-             'PasTotCmpPerc': g.pastotcmp_percentage, 
-             'PasTotCmp': g.pastotcmp,   
-             'Err': g.err,
-             'SavePerc': g.save_percentage,
-             'SweeperActions': g.sweeper_actions,
-             'Pas3rd': g.pas3rd,
-             } for g in goalkeepers]  
-
-    return JsonResponse(data, safe=False)
+    return list_players(request, Goalkeepers, GOALKEEPER_FIELDS)
 
 
 
 from django.http import JsonResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
-from sklearn.neighbors import NearestNeighbors
-import joblib
-import pandas as pd
-from sklearn.preprocessing import StandardScaler
+import numpy as np
 from .models import Defenders, Forwards, Midfielders, Goalkeepers
+from statvalue_backend import inference
+from .artifacts import artifacts as knn_artifacts
+from .embedding import POSITION_GROUPS
+from .filters import nearest_in_mask
 
 def load_knn_model(position):
-    knn = joblib.load(f"knn_model_{position}.pkl")
-    scaler = joblib.load(f"scaler_{position}.pkl")
-    return knn, scaler
+    """(knn, scaler) for the position from the per-process cache; (None, None) if unavailable"""
+    return knn_artifacts.get(position) or (None, None)
+
+POSITION_FEATURES = {
+    'forward': (Forwards, ['goals', 'sot', 'sot_percentage', 'scash', 'touattpen', 'assists', 'sca']),
+    'defender': (Defenders, ['aerwon_percentage', 'tklwon', 'clr', 'blksh', 'int', 'pasmedcmp', 'pasmedcmp_percentage']),
+    'midfielder': (Midfielders, ['recov', 'pastotcmp', 'pastotcmp_percentage', 'pasprog', 'tklmid3rd', 'carprog', 'int']),
+    'goalkeeper': (Goalkeepers, ['pastotcmp_percentage', 'pastotcmp', 'err', 'save_percentage', 'sweeper_actions', 'pas3rd'])
+}
+
+def position_neighbours(position, player_name, filters):
+    """The 5 nearest players of the same position (inference 'similarity' lane)"""
+    Model, features = POSITION_FEATURES[position]
+    with stage_timer('get_similar_players', 'db_fetch'):
+        store = position_store(Model)
+    matches = store.find(player_name)
+    if not matches:
+        raise inference.InferenceError(f"Player {player_name} not found in {position}s database", 404)
+    with stage_timer('get_similar_players', 'distance_compute'):
+        stats = store.matrix(features)
+        candidates = store.filters.mask(
+            categorical={'comp': filters.get('comp') or filters.get('leagues'),
+                         'squad': filters.get('squad') or filters.get('clubs')},
+            ranges={'age': (_optional_float(filters, 'minAge'), _optional_float(filters, 'maxAge'))})
+        if candidates is None:
+            candidates = np.ones(len(store), dtype=bool)
+        candidates[matches] = False
+        nearest = nearest_in_mask(stats, stats[matches[0]], candidates, 5)
+        return {'similar_players': [{
+            'name': store.row(row).player,
+            'stats': dict(zip(features, stats[row].tolist())),
+            'distance': distance,
+        } for row, distance in nearest]}
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -122,63 +141,53 @@ def get_similar_players(request):
         if not player_data or not position:
             return JsonResponse({'error': 'Player data and position are required'}, status=400)
         print(f"Received request for similar players to {player_data.get('name')} who is a {position}")
-        position_model_map = {
-            'forward': (Forwards, ['goals', 'sot', 'sot_percentage', 'scash', 'touattpen', 'assists', 'sca']),
-            'defender': (Defenders, ['aerwon_percentage', 'tklwon', 'clr', 'blksh', 'int', 'pasmedcmp', 'pasmedcmp_percentage']),
-            'midfielder': (Midfielders, ['recov', 'pastotcmp', 'pastotcmp_percentage', 'pasprog', 'tklmid3rd', 'carprog', 'int']),
-            'goalkeeper': (Goalkeepers, ['pastotcmp_percentage', 'pastotcmp', 'err', 'save_percentage', 'sweeper_actions', 'pas3rd'])
-        }
-        if position not in position_model_map:
+        if position not in POSITION_FEATURES:
             return JsonResponse({'error': f"Invalid position: {position}"}, status=400)   
-        Model, features = position_model_map[position]
-        all_players = list(Model.objects.all())
-        player_name = player_data.get('name')
-        reference_player = None
-        for player in all_players:
-            if player.player.lower() == player_name.lower():
-                reference_player = player
-                break
-        if not reference_player:
-            return JsonResponse(
-                {'error': f"Player {player_name} not found in {position}s database"}, 
-                status=404
-            )
-        reference_stats = []
-        for feature in features:
-            db_field = feature.lower()            
-            if feature.endswith('Perc'):
-                db_field = feature.lower().replace('perc', '_percentage')
-            value = getattr(reference_player, db_field, 0)
-            if value is None:
-                value = 0
-            reference_stats.append(float(value))        
-        similar_players_data = []
-        for player in all_players:
-            if player.player.lower() == player_name.lower():
-                continue
-            player_stats = []
-            for feature in features:
-                db_field = feature.lower()
-                if feature.endswith('Perc'):
-                    db_field = feature.lower().replace('perc', '_percentage')
-                value = getattr(player, db_field, 0)
-                if value is None:
-                    value = 0
-                player_stats.append(float(value))
-            squared_diff_sum = sum((a - b) ** 2 for a, b in zip(reference_stats, player_stats))
-            distance = squared_diff_sum ** 0.5
-            player_data = {
-                'name': player.player,
-                'stats': {},
-                'distance': distance
-            }
-            for i, feature in enumerate(features):
-                player_data['stats'][feature] = player_stats[i]   
-            similar_players_data.append(player_data)
-        similar_players_data.sort(key=lambda x: x['distance'])
-        return JsonResponse({'similar_players': similar_players_data[:5]}, status=200)
+        filters = data.get('filters') or {}
+        if filters.get('minValue') is not None or filters.get('maxValue') is not None:
+            return JsonResponse({'error': "Market value filters need the unified search (similar_players/unified/)"},
+                                status=400)
+        # Runs on the inference service when INFERENCE['URL'] is set
+        result = inference.call('position_similar_players', position=position,
+                                player_name=player_data.get('name'), filters=filters)
+        return JsonResponse(result, status=200)
+    except inference.InferenceError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
     except Exception as e:
         import traceback
         print(traceback.format_exc())
         return JsonResponse({'error': str(e)}, status=400)
-    
\ No newline at end of file
+    
+
+def _optional_float(data, key):
+    return None if data.get(key) is None else float(data[key])
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def get_similar_players_unified(request):
+    """Similar players across positions from the unified per-90 embedding"""
+    try:
+        data = request.data
+        player_name = (data.get('player') or {}).get('name') or data.get('name')
+        if not player_name:
+            return JsonResponse({'error': 'Player name is required'}, status=400)
+        groups = [group.upper() for group in data.get('positions') or []]
+        invalid = [group for group in groups if group not in POSITION_GROUPS]
+        if invalid:
+            return JsonResponse({'error': f"Invalid positions: {', '.join(invalid)}. "
+                                          f"Use {', '.join(POSITION_GROUPS)}"}, status=400)
+        k = max(1, min(int(data.get('k', 5)), 100))
+        filters = data.get('filters') or {}
+
+        # Runs on the inference service when INFERENCE['URL'] is set
+        result = inference.call(
+            'similar_players', player_name=player_name, k=k, groups=groups,
+            leagues=filters.get('leagues') or filters.get('comp'), clubs=filters.get('clubs') or filters.get('squad'),
+            min_age=_optional_float(filters, 'minAge'), max_age=_optional_float(filters, 'maxAge'),
+            min_value=_optional_float(filters, 'minValue'), max_value=_optional_float(filters, 'maxValue'))
+        return JsonResponse(result, status=200)
+    except inference.InferenceError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    except (TypeError, ValueError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
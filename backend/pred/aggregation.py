@@ -0,0 +1,137 @@
+"""
+Squad and league valuations aggregated from batched forecasts.
+
+Players are selected through a per-bundle index of each player's latest club
+and league. Forecasts are cached as partial aggregates per club and year, so a
+league report reuses every club report computed before it (and vice versa);
+only missing (club, year) cells are forecast, all in one batched forward pass.
+"""
+import hashlib
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .forecast import ForecastError, age_factor, player_base, predict_values, project_window
+
+OPERATION = 'squad_valuation'
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def aggregation_setting(name, default=None):
+    return getattr(settings, 'PREDICTION_AGGREGATION', {}).get(name, default)
+
+
+def squad_index(bundle):
+    """{'club': {club: [names]}, 'league': {league: [clubs]}} from each player's latest season"""
+    index = bundle.derived_cache.get('squad_index')
+    if index is None:
+        latest = bundle.df.sort_values('Year').groupby('name').tail(1)
+        index = {
+            'club': {club: sorted(names) for club, names in latest.groupby('Club', observed=True)['name']},
+            'league': {league: sorted(clubs.unique())
+                       for league, clubs in latest.groupby('League', observed=True)['Club']},
+        }
+        bundle.derived_cache['squad_index'] = index
+    return index
+
+
+def resolve(index, kind, value):
+    """The indexed key matching `value` case-insensitively, or None"""
+    keys = index[kind]
+    if value in keys:
+        return value
+    lowered = value.strip().lower()
+    return next((key for key in keys if key.lower() == lowered), None)
+
+
+def _partial_key(bundle, club, year):
+    digest = hashlib.md5(club.encode()).hexdigest()
+    return f"statvalue:squad:{bundle.version}:{digest}:{year}"
+
+
+def club_partials(bundle, clubs, years):
+    """{(club, year): partial} for every cell, forecasting only the ones not cached"""
+    index = squad_index(bundle)
+    keys = {(club, year): _partial_key(bundle, club, year) for club in clubs for year in years}
+    cached = cache.get_many(list(keys.values()))
+    partials = {cell: cached[key] for cell, key in keys.items() if key in cached}
+
+    missing = [cell for cell in keys if cell not in partials]
+    pending = []
+    for club, year in missing:
+        partial = {"club": club, "year": year, "players": [], "skipped": 0}
+        partials[(club, year)] = partial
+        for name in index['club'].get(club, ()):
+            try:
+                base = player_base(bundle, name, OPERATION)
+            except ForecastError:
+                partial["skipped"] += 1
+                continue
+            if base.last_known_year >= year:
+                year_data = base.rows[base.rows['Year'] == year]
+                if year_data.empty:
+                    partial["skipped"] += 1
+                else:
+                    partial["players"].append((name, float(year_data['MV'].iloc[0]), base.last_known_mv))
+                continue
+            pending.append((partial, base, project_window(bundle, base, year, operation=OPERATION)))
+
+    if pending:
+        X_scaled = np.stack([window.X_scaled for _, _, window in pending])
+        values = predict_values(bundle, X_scaled, OPERATION, batch_size=aggregation_setting('BATCH_SIZE', 1024))
+        for (partial, base, window), value in zip(pending, values):
+            partial["players"].append(
+                (base.player_name, float(value) * age_factor(window.projected_age), base.last_known_mv))
+
+    if missing:
+        cache.set_many({keys[cell]: partials[cell] for cell in missing},
+                       aggregation_setting('CACHE_TIMEOUT', 3600))
+    return partials
+
+
+def _mover(player):
+    name, value, current = player
+    return {"playerName": name, "predictedValue": round(value, 2),
+            "currentValue": round(current, 2), "change": round(value - current, 2)}
+
+
+def _movers(players, top):
+    ranked = sorted(players, key=lambda p: p[1] - p[2])
+    return {
+        "risers": [_mover(p) for p in reversed(ranked[max(0, len(ranked) - top):]) if p[1] > p[2]],
+        "fallers": [_mover(p) for p in ranked[:top] if p[1] < p[2]],
+    }
+
+
+def _distribution(values):
+    if not len(values):
+        return {}
+    distribution = {"mean": round(float(values.mean()), 2)}
+    for q, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        distribution[f"p{q}"] = round(float(v), 2)
+    return distribution
+
+
+def summarize(partials, clubs, years, top=5):
+    """Totals, distribution and top movers per year over the selected clubs"""
+    summary = []
+    for year in years:
+        cells = [partials[(club, year)] for club in clubs]
+        players = [p for cell in cells for p in cell["players"]]
+        values = np.array([p[1] for p in players])
+        current = sum(p[2] for p in players)
+        total = float(values.sum())
+        summary.append({
+            "year": year,
+            "players": len(players),
+            "skipped": sum(cell["skipped"] for cell in cells),
+            "totalValue": round(total, 2),
+            "currentTotalValue": round(current, 2),
+            "change": round(total - current, 2),
+            "distribution": _distribution(values),
+            "clubs": [{"club": cell["club"], "players": len(cell["players"]),
+                       "totalValue": round(sum(p[1] for p in cell["players"]), 2)} for cell in cells],
+            **_movers(players, top),
+        })
+    return summary
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
 
 
+def prediction_version():
+    from .registry import registry
+
+    return registry.version_state()
+
+
 class PredConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pred'
+
+    def ready(self):
+        from statvalue_backend.caching import register_version_source
+
+        register_version_source('prediction', prediction_version)
@@ -0,0 +1,203 @@
+"""
+Bulk export of the derived prediction dataset and its forecasts.
+
+Year and league filters are applied to the bundle's frame before any column is
+copied, then the selected columns are serialized in CHUNK_ROWS slices (CSV, an
+Arrow IPC stream or Parquet row groups), so an export streams in bounded memory
+instead of being built as one response body. Forecasts for a target year are
+computed once per bundle for every player in one batched pass and reused by
+later exports.
+"""
+import io
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+
+from .forecast import ForecastError, age_factor, player_base, predict_values, project_window
+
+
+
+@lru_cache(maxsize=None)
+def pyarrow_modules():
+    """(pyarrow, pyarrow.parquet), or (None, None); imported on the first export rather than at startup"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:  # optional dependency
+        return None, None
+    return pyarrow, pyarrow.parquet
+
+OPERATION = 'dataset_export'
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+FORECAST_COLUMNS = ('name', 'Year', 'Club', 'League', 'Age', 'MV')
+
+
+class ExportError(ValueError):
+    """An export request that cannot be served; the message is user-facing"""
+
+
+def export_setting(name, default=None):
+    return getattr(settings, 'PREDICTION_EXPORT', {}).get(name, default)
+
+
+def available_formats():
+    return [fmt for fmt in FORMATS if fmt == 'csv' or pyarrow_modules()[0] is not None]
+
+
+def forecast_records(bundle, year):
+    """Every player's forecast for `year` as FORECAST_COLUMNS tuples, in one batched pass"""
+    pending = []
+    for name in bundle.df['name'].unique():
+        try:
+            base = player_base(bundle, name, OPERATION)
+        except ForecastError:
+            continue
+        if base.last_known_year < year:
+            pending.append(project_window(bundle, base, year, operation=OPERATION))
+
+    records = []
+    if pending:
+        values = predict_values(bundle, np.stack([window.X_scaled for window in pending]), OPERATION,
+                                batch_size=export_setting('BATCH_SIZE', 1024))
+        for window, value in zip(pending, values):
+            latest = window.base.rows.iloc[-1]
+            records.append((window.base.player_name, year, latest.get('Club'), latest.get('League'),
+                            window.projected_age, round(float(value) * age_factor(window.projected_age), 2)))
+    return records
+
+
+def forecast_frame(bundle, year):
+    """
+    Every player's forecast for `year` (FORECAST_COLUMNS), cached on the bundle.
+    A dataset-only bundle (web node) gets them from the inference service.
+    """
+    import pandas as pd
+
+    key = ('export_forecasts', year)
+    frame = bundle.derived_cache.get(key)
+    if frame is not None:
+        return frame
+
+    if bundle.model is None:
+        from statvalue_backend import inference
+
+        records = inference.call('export_forecasts', year=year)
+    else:
+        records = forecast_records(bundle, year)
+    frame = pd.DataFrame.from_records(records, columns=FORECAST_COLUMNS)
+    bundle.derived_cache[key] = frame
+    return frame
+
+
+def _league_mask(frame, leagues):
+    wanted = {league.strip().lower() for league in leagues}
+    return frame['League'].astype(str).str.lower().isin(wanted)
+
+
+def select_frame(bundle, columns=None, years=None, leagues=None, forecast_years=None):
+    """
+    The rows and columns to export. Historical rows are filtered by `years` and
+    `leagues` before projection; forecast rows for `forecast_years` (filtered by
+    the player's latest league) are appended with Source='forecast'.
+    """
+    import pandas as pd
+
+    df = bundle.df
+    if columns:
+        unknown = [column for column in columns if column not in df.columns]
+        if unknown:
+            raise ExportError(f"Unknown columns: {', '.join(unknown)}")
+    columns = list(dict.fromkeys(columns or df.columns))
+
+    mask = np.ones(len(df), dtype=bool)
+    if years:
+        mask &= df['Year'].isin(years).to_numpy()
+    if leagues:
+        mask &= _league_mask(df, leagues).to_numpy()
+    frame = df.loc[mask, columns]
+
+    if not forecast_years:
+        return frame.reset_index(drop=True)
+    frames = [frame.assign(Source='actual')]
+    for year in forecast_years:
+        forecasts = forecast_frame(bundle, year)
+        if leagues:
+            forecasts = forecasts[_league_mask(forecasts, leagues)]
+        frames.append(forecasts[[c for c in FORECAST_COLUMNS if c in columns]].assign(Source='forecast'))
+    return pd.concat(frames, ignore_index=True)[columns + ['Source']]
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back what was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _slices(frame, chunk_rows):
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def arrow_schema(frame, sample_rows):
+    """
+    The Arrow schema for every chunk of `frame`, inferred from its first rows. An
+    object column with no values there (e.g. forecast-only text, or an empty frame)
+    would infer as null and reject every later chunk, so it is typed as string.
+    """
+    pa, _ = pyarrow_modules()
+    schema = pa.Schema.from_pandas(frame.head(sample_rows), preserve_index=False)
+    for i, column in enumerate(schema):
+        if pa.types.is_null(column.type):
+            schema = schema.set(i, column.with_type(pa.string()))
+    return schema
+
+
+def iter_export(frame, fmt, chunk_rows=None):
+    """Serialized chunks of `frame` in `fmt`"""
+    chunk_rows = chunk_rows or export_setting('CHUNK_ROWS', 50000)
+    if fmt == 'csv':
+        yield frame.iloc[:0].to_csv(index=False).encode()
+        for chunk in _slices(frame, chunk_rows):
+            yield chunk.to_csv(index=False, header=False).encode()
+        return
+    pa, pq = pyarrow_modules()
+    if fmt not in FORMATS or pa is None:
+        raise ExportError(f"Unsupported export format: {fmt}")
+
+    schema = arrow_schema(frame, chunk_rows)
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, schema) if fmt == 'arrow' else pq.ParquetWriter(sink, schema)
+    try:
+        for chunk in _slices(frame, chunk_rows):
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            if fmt == 'arrow':
+                writer.write_table(table)
+            else:
+                writer.write_table(table, row_group_size=chunk_rows)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,243 @@
+"""Derived features for the prediction dataset, computed in full at load time or incrementally on append."""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Object columns with at most this share of distinct values are stored as categoricals
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+# Enhanced Club Reputation - use both preset tiers and market values
+TOP_CLUBS_1 = ['PSG', 'Manchester Utd', 'Liverpool', 'Real Madrid', 'Barcelona',
+               'Bayern Munich', 'Arsenal', 'Atlético Madrid', 'Inter', 'Chelsea', 'Manchester City']
+TOP_CLUBS_2 = ['Juventus', 'Tottenham', 'Napoli', 'Dortmund', 'Atalanta', 'Milan', 'Athletic Club',
+               'RB Leipzig', 'Monaco', 'Brighton', 'Valencia', 'Sevilla']
+
+
+class ClubReputation:
+    """
+    Running market-value sums and row counts per club. Club averages (and so the
+    CR_value quintiles) can be refreshed after an append without regrouping the
+    whole history.
+    """
+
+    def __init__(self, sums, counts):
+        self.sums = sums
+        self.counts = counts
+
+    @staticmethod
+    def _grouped(frame):
+        # float64 sums and plain club labels, whatever dtypes the frame was compacted to
+        return frame['MV'].astype('float64').groupby(frame['Club'].astype(object))
+
+    @classmethod
+    def from_frame(cls, frame):
+        grouped = cls._grouped(frame)
+        return cls(grouped.sum(), grouped.count())
+
+    def copy(self):
+        return ClubReputation(self.sums.copy(), self.counts.copy())
+
+    def add(self, frame):
+        grouped = self._grouped(frame)
+        self.sums = self.sums.add(grouped.sum(), fill_value=0)
+        self.counts = self.counts.add(grouped.count(), fill_value=0)
+
+    def remove(self, frame):
+        grouped = self._grouped(frame)
+        self.sums = self.sums.sub(grouped.sum(), fill_value=0)
+        self.counts = self.counts.sub(grouped.count(), fill_value=0)
+        empty = self.counts <= 0
+        self.sums, self.counts = self.sums[~empty], self.counts[~empty]
+
+    def cr_values(self):
+        """Club -> CR_value, the quintile (1-5) of the club's average market value"""
+        import pandas as pd
+
+        averages = self.sums / self.counts
+        return pd.qcut(averages, q=5, labels=[1, 2, 3, 4, 5]).astype(int)
+
+
+def club_tier(club):
+    return 1 if club in TOP_CLUBS_1 else 2 if club in TOP_CLUBS_2 else 3
+
+
+def club_base_tier(clubs):
+    return clubs.apply(club_tier).astype(int)
+
+
+def apply_reputation(frame, cr_values):
+    """Set CR_value, CR and ReputationIndex from the current club quintiles"""
+    frame['CR_value'] = frame['Club'].map(cr_values).astype(int)
+
+    # Combined club reputation (weighting preset tiers and market value data)
+    frame['CR'] = (frame['CR_base'] * 0.6 + frame['CR_value'] * 0.4).round().astype(int)
+
+    # Combined reputation metric
+    if 'NR' in frame.columns and 'PR' in frame.columns:
+        frame['ReputationIndex'] = (frame['CR'] + frame['NR'] + frame['PR']) / 3
+    else:
+        # Fallback if we only have CR
+        frame['ReputationIndex'] = frame['CR']
+    return frame
+
+
+REPUTATION_COLUMNS = ('CR_value', 'CR', 'ReputationIndex')
+
+
+def assign_rows(df, mask, updated, columns):
+    """
+    Write `columns` of `updated` into the rows of df selected by `mask`. A column
+    compacted by optimize_dtypes keeps its dtype when every new value fits it
+    exactly and is widened otherwise, instead of receiving values pandas would
+    have to upcast silently.
+    """
+    import pandas as pd
+
+    for column in columns:
+        values = updated[column]
+        target = df[column].dtype
+        if values.dtype != target:
+            numeric = pd.api.types.is_numeric_dtype(target) and pd.api.types.is_numeric_dtype(values)
+            if numeric and _fits(values, target):
+                values = values.astype(target)
+            else:
+                df[column] = df[column].astype(np.result_type(target, values.dtype) if numeric else object)
+        df.loc[mask, column] = values
+    return df
+
+
+def _fits(values, dtype):
+    try:
+        narrowed = values.astype(dtype)
+    except (TypeError, ValueError):  # e.g. NaN into an integer column
+        return False
+    return np.array_equal(narrowed.to_numpy(np.float64), values.to_numpy(np.float64), equal_nan=True)
+
+
+def reputation_at_club(club, cr_values, nr=None, pr=None):
+    """CR_base, CR_value, CR and ReputationIndex a row would get at `club`; apply_reputation for one row"""
+    cr_base = club_tier(club)
+    cr_value = int(cr_values[club])
+    cr = int(round(cr_base * 0.6 + cr_value * 0.4))
+    if nr is not None and pr is not None:
+        reputation_index = (cr + nr + pr) / 3
+    else:
+        reputation_index = cr
+    return {'CR_base': cr_base, 'CR_value': cr_value, 'CR': cr, 'ReputationIndex': reputation_index}
+
+
+def apply_lag_features(frame):
+    """PrevYearMV, MV_Trend and MV_GrowthRate for a frame sorted by player and year"""
+    mv = frame['MV'].astype('float64')
+    prev_mv = mv.groupby(frame['name'], observed=True).shift(1)
+    frame['PrevYearMV'] = prev_mv
+    frame['MV_Trend'] = mv - prev_mv  # Year-to-year change
+
+    # Market value growth rate
+    frame['MV_GrowthRate'] = (mv / prev_mv.replace(0, 0.1)) - 1
+
+    # Handling NaN values for first year entries
+    frame['PrevYearMV'] = frame['PrevYearMV'].fillna(mv)
+    frame['MV_Trend'] = frame['MV_Trend'].fillna(0)
+    frame['MV_GrowthRate'] = frame['MV_GrowthRate'].fillna(0)
+    return frame
+
+
+def add_missing_features(frame, important_features):
+    missing_features = set(important_features) - set(frame.columns)
+    if missing_features:
+        logger.warning(f"Still missing features after derivation: {missing_features}")
+        for feature in missing_features:
+            logger.info(f"Creating placeholder for missing feature: {feature}")
+            frame[feature] = 0.0
+    return frame
+
+
+def _prepare_rows(frame):
+    frame['CR_base'] = club_base_tier(frame['Club'])
+    return frame
+
+
+def derive_features(df, important_features):
+    """Full derivation over the whole history; returns the frame and its club aggregates"""
+    df = _prepare_rows(df)
+    reputation = ClubReputation.from_frame(df)
+    df = apply_reputation(df, reputation.cr_values())
+    df = df.sort_values(['name', 'Year'])
+    df = apply_lag_features(df)
+    df = add_missing_features(df, important_features)
+    return df, reputation
+
+
+def append_rows(df, new_rows, reputation, important_features):
+    """
+    Fold new season rows into an already derived frame.
+
+    Club aggregates are updated through the running sums, CR is rewritten only for
+    clubs whose quintile moved, and lag features are recomputed only over the
+    histories of players that appear in `new_rows`. Rows restating an existing
+    (player, Year) replace it. Returns the new frame and the affected player names.
+    """
+    import pandas as pd
+
+    new_rows = _prepare_rows(new_rows.copy())
+
+    restated = pd.MultiIndex.from_arrays([df['name'].astype(object), df['Year']]).isin(
+        pd.MultiIndex.from_arrays([new_rows['name'].astype(object), new_rows['Year']]))
+    if restated.any():
+        reputation.remove(df[restated])
+        df = df[~restated]
+
+    old_cr = reputation.cr_values()
+    reputation.add(new_rows)
+    new_cr = reputation.cr_values()
+
+    moved = new_cr.index[new_cr.ne(old_cr.reindex(new_cr.index))]
+    if len(moved):
+        df = df.copy()
+        in_moved = df['Club'].isin(moved)
+        df = assign_rows(df, in_moved, apply_reputation(df.loc[in_moved].copy(), new_cr), REPUTATION_COLUMNS)
+        logger.info(f"Club reputation changed for {len(moved)} clubs")
+
+    new_rows = apply_reputation(new_rows, new_cr)
+
+    affected = new_rows['name'].unique()
+    in_affected = df['name'].isin(affected)
+    histories = pd.concat([df[in_affected], new_rows], ignore_index=True)
+    histories = apply_lag_features(histories.sort_values(['name', 'Year']))
+    histories = add_missing_features(histories, important_features)
+
+    df = pd.concat([df[~in_affected], histories], ignore_index=True)
+    return df, affected
+
+
+def frame_memory(frame):
+    """Bytes held by the frame, including the strings behind object columns"""
+    return int(frame.memory_usage(deep=True).sum())
+
+
+def optimize_dtypes(frame):
+    """
+    Store repeated strings as categoricals and numerics in the smallest dtype that
+    holds every value exactly (integers downcast, floats to float32 only where no
+    value changes), so feature values and predictions stay identical. Converts
+    the frame's columns in place and returns it.
+    """
+    import pandas as pd
+
+    for column in frame.columns:
+        values = frame[column]
+        if values.dtype == object:
+            non_null = values.dropna()
+            if (len(non_null) and non_null.map(type).eq(str).all()
+                    and non_null.nunique() <= CATEGORY_MAX_UNIQUE_RATIO * len(non_null)):
+                frame[column] = values.astype('category')
+        elif pd.api.types.is_integer_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            frame[column] = pd.to_numeric(values, downcast='integer')
+        elif pd.api.types.is_float_dtype(values) and values.dtype != np.float32:
+            narrowed = values.astype(np.float32)
+            if np.array_equal(narrowed.to_numpy(np.float64), values.to_numpy(np.float64), equal_nan=True):
+                frame[column] = narrowed
+    return frame
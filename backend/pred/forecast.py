@@ -0,0 +1,187 @@
+"""
+Forecast building blocks shared by single, batched, interval and scenario predictions.
+
+A player's scaled lookback window only depends on their history, so it is built
+once per bundle (PlayerBase) and cached. Projecting to a target year only rewrites
+and re-scales the last timestep, and many windows can then go through the model
+in a single forward pass.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from statvalue_backend.metrics import stage_timer
+
+LOOKBACK = 4
+PEAK_AGE = 27
+
+
+class ForecastError(Exception):
+    """A prediction that cannot be made for this player/year; the message is user-facing"""
+
+
+@dataclass(frozen=True)
+class PlayerBase:
+    """A player's history and their scaled lookback window, before any projection"""
+    player_name: str
+    rows: object
+    last_known_year: int
+    last_known_mv: float
+    last_known_age: object
+    X_raw: np.ndarray
+    X_scaled: np.ndarray
+
+
+@dataclass(frozen=True)
+class Window:
+    """A lookback window projected to a target year, ready for the model"""
+    base: PlayerBase
+    target_year: int
+    years_forward: int
+    projected_age: object
+    X_scaled: np.ndarray
+
+
+def feature_index(bundle):
+    return {feature: i for i, feature in enumerate(bundle.important_features)}
+
+
+def player_base(bundle, player_name, operation='predict_market_value'):
+    """The player's cached PlayerBase; raises ForecastError when there is too little history"""
+    base = bundle.window_cache.get(player_name)
+    if base is not None:
+        return base
+
+    rows = bundle.player_rows(player_name)
+    if len(rows) == 0:
+        raise ForecastError(f"Player '{player_name}' not found in the dataset")
+    if len(rows) < LOOKBACK:
+        raise ForecastError(f"Not enough historical data for player '{player_name}'. "
+                            f"Need at least {LOOKBACK} years of data.")
+
+    latest_data = rows.tail(LOOKBACK)
+    X_raw = latest_data[list(bundle.important_features)].values.astype(float)
+    with stage_timer(operation, 'scaling'):
+        X_scaled = bundle.feature_scaler.transform(X_raw)
+    base = PlayerBase(
+        player_name=player_name,
+        rows=rows,
+        last_known_year=int(latest_data['Year'].iloc[-1]),
+        last_known_mv=float(latest_data['MV'].iloc[-1]),
+        last_known_age=int(latest_data['Age'].iloc[-1]) if 'Age' in latest_data.columns else None,
+        X_raw=X_raw,
+        X_scaled=X_scaled,
+    )
+    bundle.window_cache[player_name] = base
+    return base
+
+
+def career_phase_value(age):
+    if age <= 21:
+        return 1  # Rising
+    if age <= 25:
+        return 2  # Development
+    if age <= 29:
+        return 3  # Peak
+    if age <= 33:
+        return 2  # Experienced
+    return 1  # Veteran
+
+
+def projection_overrides(target_year, projected_age, columns):
+    """Feature values that change when a player's last season is projected to target_year"""
+    overrides = {'Year': target_year}
+    if projected_age is not None:
+        overrides['Age'] = projected_age
+        overrides['Age_squared'] = projected_age ** 2
+        overrides['Years_from_peak'] = abs(projected_age - PEAK_AGE)
+        overrides['PeakAgeFactor'] = 1 - abs(projected_age - PEAK_AGE) / 15
+        if 'CareerPhase' in columns:
+            overrides['CareerPhaseValue'] = career_phase_value(projected_age)
+    return overrides
+
+
+def project_window(bundle, base, target_year, overrides=None, operation='predict_market_value'):
+    """
+    Project `base` to target_year, optionally applying extra feature overrides to
+    the last timestep. Only that timestep is rewritten and re-scaled.
+    """
+    years_forward = target_year - base.last_known_year
+    projected_age = base.last_known_age + years_forward if base.last_known_age is not None else None
+
+    with stage_timer(operation, 'feature_projection'):
+        values = projection_overrides(target_year, projected_age, bundle.df.columns)
+        if overrides:
+            values.update(overrides)
+        index = feature_index(bundle)
+        last_row = base.X_raw[-1].copy()
+        for feature, value in values.items():
+            if feature in index:
+                last_row[index[feature]] = value
+
+    with stage_timer(operation, 'scaling'):
+        X_scaled = base.X_scaled.copy()
+        X_scaled[-1] = bundle.feature_scaler.transform(last_row.reshape(1, -1))[0]
+    return Window(base, target_year, years_forward, projected_age, X_scaled)
+
+
+def predict_values(bundle, X_scaled, operation='predict_market_value', batch_size=None):
+    """Market values for a (n, lookback, features) batch in one forward pass, before age adjustment"""
+    with stage_timer(operation, 'model_predict'):
+        pred_scaled = bundle.model.predict(X_scaled, verbose=0, batch_size=batch_size)
+    with stage_timer(operation, 'inverse_transform'):
+        return bundle.target_scaler.inverse_transform(np.asarray(pred_scaled).reshape(-1, 1)).ravel()
+
+
+def age_factor(projected_age):
+    """Decline applied to forecasts past 30"""
+    if projected_age is not None and projected_age > 30:
+        return max(0.5, 1.0 - 0.05 * (projected_age - 30))
+    return 1.0
+
+
+def confidence_text(years_forward):
+    base_confidence = 0.9
+    confidence_penalty = min(0.4, 0.05 * years_forward)
+    confidence_level = base_confidence - confidence_penalty
+    if confidence_level > 0.8:
+        confidence_desc = "High"
+    elif confidence_level > 0.6:
+        confidence_desc = "Medium"
+    else:
+        confidence_desc = "Low"
+    return f"{confidence_desc} ({int(confidence_level * 100)}%)"
+
+
+def build_training_windows(df, important_features, feature_scaler, target_scaler, lookback=LOOKBACK):
+    """
+    Flattened, scaled lookback windows and the scaled market value that followed
+    them, i.e. the LSTM's input/output space over the whole history. Each window's
+    last season is projected to the target season exactly as project_window does
+    at serving time, so shadow candidates and residuals see what the model sees.
+    """
+    features = list(important_features)
+    index = {feature: i for i, feature in enumerate(features)}
+    windows, targets = [], []
+    for _, player_df in df.sort_values('Year').groupby('name', observed=True):
+        if len(player_df) <= lookback:
+            continue
+        values = player_df[features].values.astype(float)
+        years = player_df['Year'].values
+        ages = player_df['Age'].values if 'Age' in player_df.columns else None
+        mv = player_df['MV'].values
+        for end in range(lookback, len(player_df)):
+            window = values[end - lookback:end].copy()
+            target_year = int(years[end])
+            projected_age = int(ages[end - 1]) + target_year - int(years[end - 1]) if ages is not None else None
+            for feature, value in projection_overrides(target_year, projected_age, df.columns).items():
+                if feature in index:
+                    window[-1, index[feature]] = value
+            windows.append(window)
+            targets.append(mv[end])
+    if not windows:
+        return np.empty((0, lookback * len(features)), dtype=np.float32), np.empty(0)
+    stacked = np.asarray(windows)
+    X = feature_scaler.transform(stacked.reshape(-1, len(features))).reshape(len(stacked), -1).astype(np.float32)
+    y = target_scaler.transform(np.asarray(targets).reshape(-1, 1)).ravel()
+    return X, y
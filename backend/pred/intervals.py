@@ -0,0 +1,168 @@
+"""
+Prediction intervals computed for many players in one batch.
+
+When the LSTM has dropout, intervals come from Monte Carlo dropout: every window
+is repeated `samples` times and the whole stack goes through the model with
+dropout active, in chunks of PREDICTION_INTERVALS['BATCH_ROWS']. Otherwise they
+come from the empirical distribution of relative residuals over the historical
+windows, projected like serving windows and computed when the bundle loads,
+widened with the square root of the horizon.
+
+Results are cached per bundle version, player, year and interval parameters.
+"""
+import hashlib
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from statvalue_backend.metrics import stage_timer
+from .forecast import (LOOKBACK, ForecastError, age_factor, build_training_windows, player_base,
+                       predict_values, project_window)
+
+logger = logging.getLogger(__name__)
+
+OPERATION = 'prediction_intervals'
+
+
+def interval_setting(name, default=None):
+    return getattr(settings, 'PREDICTION_INTERVALS', {}).get(name, default)
+
+
+def has_dropout(model):
+    """Whether the model has any dropout that MC sampling can exploit"""
+    for layer in getattr(model, 'layers', ()):
+        if 'dropout' in type(layer).__name__.lower():
+            return True
+        if getattr(layer, 'dropout', 0) or getattr(layer, 'recurrent_dropout', 0):
+            return True
+    return False
+
+
+def _cache_key(bundle, method, samples, level, player_name, target_year):
+    player = hashlib.md5(player_name.encode()).hexdigest()
+    return f"statvalue:interval:{bundle.version}:{method}:{samples}:{level}:{player}:{target_year}"
+
+
+def mc_dropout_values(bundle, X_scaled, samples):
+    """(n, samples) market values with dropout active, run in bounded chunks"""
+    stacked = np.repeat(X_scaled.astype(np.float32), samples, axis=0)
+    chunk = max(1, interval_setting('BATCH_ROWS', 8192))
+    outputs = []
+    with stage_timer(OPERATION, 'model_predict'):
+        for start in range(0, len(stacked), chunk):
+            outputs.append(np.asarray(bundle.model(stacked[start:start + chunk], training=True)).reshape(-1))
+    with stage_timer(OPERATION, 'inverse_transform'):
+        values = bundle.target_scaler.inverse_transform(np.concatenate(outputs).reshape(-1, 1))
+    return values.reshape(len(X_scaled), samples)
+
+
+def relative_residuals(bundle):
+    """
+    (actual - predicted) / predicted over every historical window. Computed when the
+    bundle loads (see pred.registry.load_bundle) and kept across season appends, so
+    requests normally never pay for this full-history pass.
+    """
+    residuals = bundle.derived_cache.get('residuals')
+    if residuals is None:
+        with stage_timer(OPERATION, 'residuals'):
+            X, y = build_training_windows(bundle.df, bundle.important_features, bundle.feature_scaler,
+                                          bundle.target_scaler, LOOKBACK)
+            if len(X) == 0:
+                residuals = np.zeros(1)
+            else:
+                predicted = predict_values(bundle, X.reshape(len(X), LOOKBACK, -1), OPERATION,
+                                           batch_size=interval_setting('BATCH_ROWS', 8192))
+                actual = bundle.target_scaler.inverse_transform(y.reshape(-1, 1)).ravel()
+                residuals = (actual - predicted) / np.maximum(np.abs(predicted), 1e-6)
+        bundle.derived_cache['residuals'] = residuals
+        logger.info(f"Computed {len(residuals)} residuals for bundle {bundle.version}")
+    return residuals
+
+
+def precompute_residuals(bundle):
+    """Residuals for models without dropout, which take their intervals from them"""
+    if bundle.model is not None and interval_setting('PRECOMPUTE_RESIDUALS', True) and not has_dropout(bundle.model):
+        relative_residuals(bundle)
+
+
+def residual_quantiles(bundle, level):
+    """Relative residual quantiles of the model over its training windows"""
+    key = ('residual_quantiles', level)
+    quantiles = bundle.derived_cache.get(key)
+    if quantiles is None:
+        tail = (1 - level) / 2
+        quantiles = tuple(float(q) for q in np.quantile(relative_residuals(bundle), [tail, 1 - tail]))
+        bundle.derived_cache[key] = quantiles
+        logger.info(f"Residual quantiles for bundle {bundle.version} at level {level}: {quantiles}")
+    return quantiles
+
+
+def predict_intervals(bundle, player_names, target_year, samples=None, level=None):
+    """
+    Point forecasts with lower/upper bounds for every player in `player_names`.
+    Returns one dict per player, in order; players that cannot be forecast get an "error".
+    """
+    samples = int(samples or interval_setting('SAMPLES', 50))
+    level = float(level or interval_setting('LEVEL', 0.9))
+    method = 'mc_dropout' if has_dropout(bundle.model) else 'residual'
+
+    results = {}
+    pending = []
+    for name in dict.fromkeys(player_names):
+        key = _cache_key(bundle, method, samples, level, name, target_year)
+        cached = cache.get(key)
+        if cached is not None:
+            results[name] = cached
+            continue
+        try:
+            base = player_base(bundle, name, OPERATION)
+        except ForecastError as e:
+            results[name] = {"playerName": name, "error": str(e)}
+            continue
+
+        if base.last_known_year >= target_year:
+            year_data = base.rows[base.rows['Year'] == target_year]
+            if year_data.empty:
+                results[name] = {"playerName": name,
+                                 "error": f"No data available for {name} in {target_year}, but we have more recent data"}
+            else:
+                actual = float(year_data['MV'].iloc[0])
+                results[name] = {"playerName": name, "year": int(target_year), "predictedValue": actual,
+                                 "lower": actual, "upper": actual, "method": "actual", "level": level,
+                                 "modelVersion": bundle.version}
+            continue
+        pending.append((key, project_window(bundle, base, target_year, operation=OPERATION)))
+
+    if pending:
+        X_scaled = np.stack([window.X_scaled for _, window in pending])
+        point = predict_values(bundle, X_scaled, OPERATION, batch_size=interval_setting('BATCH_ROWS', 8192))
+        if method == 'mc_dropout':
+            draws = mc_dropout_values(bundle, X_scaled, samples)
+            tail = (1 - level) / 2
+            lower, upper = np.quantile(draws, [tail, 1 - tail], axis=1)
+        else:
+            q_low, q_high = residual_quantiles(bundle, level)
+            horizon = np.sqrt([window.years_forward for _, window in pending])
+            lower = point * (1 + q_low * horizon)
+            upper = point * (1 + q_high * horizon)
+
+        for i, (key, window) in enumerate(pending):
+            factor = age_factor(window.projected_age)
+            result = {
+                "playerName": window.base.player_name,
+                "year": int(target_year),
+                "predictedValue": round(float(point[i]) * factor, 2),
+                "lower": round(max(0.0, float(lower[i]) * factor), 2),
+                "upper": round(float(upper[i]) * factor, 2),
+                "method": method,
+                "level": level,
+                "yearsForward": int(window.years_forward),
+                "projectedAge": window.projected_age,
+                "modelVersion": bundle.version,
+            }
+            cache.set(key, result, interval_setting('CACHE_TIMEOUT', 3600))
+            results[window.base.player_name] = result
+
+    return [results[name] for name in player_names]
@@ -0,0 +1,45 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pred.export import ExportError, available_formats, iter_export, select_frame
+from pred.registry import registry
+
+
+def csv_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class Command(BaseCommand):
+    help = ("Write the derived prediction dataset, optionally with forecasts, as CSV, an Arrow stream "
+            "or Parquet (same filters and columns as /api/predict/export/)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', type=Path)
+        parser.add_argument('--format', default=None, choices=('csv', 'arrow', 'parquet'),
+                            help="Defaults to the output file extension")
+        parser.add_argument('--columns', type=csv_list, default=None)
+        parser.add_argument('--years', type=csv_list, default=None)
+        parser.add_argument('--leagues', type=csv_list, default=None)
+        parser.add_argument('--forecast-years', type=csv_list, default=None)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        fmt = options['format'] or {'.arrows': 'arrow', '.arrow': 'arrow'}.get(output.suffix, output.suffix[1:])
+        if fmt not in available_formats():
+            raise CommandError(f"Unsupported export format {fmt!r}; available: {', '.join(available_formats())}")
+        bundle = registry.current()
+        if bundle is None:
+            raise CommandError("Prediction artifacts could not be loaded")
+
+        try:
+            frame = select_frame(bundle, columns=options['columns'],
+                                 years=[int(year) for year in options['years'] or ()],
+                                 leagues=options['leagues'],
+                                 forecast_years=sorted({int(year) for year in options['forecast_years'] or ()}))
+            with open(output, 'wb') as fh:
+                for chunk in iter_export(frame, fmt):
+                    fh.write(chunk)
+        except (ExportError, ValueError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Wrote {len(frame)} rows ({len(frame.columns)} columns) to {output}")
@@ -0,0 +1,115 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from statvalue_backend.inference import (
+    OPERATIONS, InferenceError, inference_setting, init_worker, json_default, logger, run_operation,
+)
+
+
+class LanePools:
+    """One process pool per lane, rebuilt if a worker dies"""
+
+    def __init__(self, workers, warm):
+        self.workers = workers
+        self.warm = warm
+        self.settings_module = os.environ.get('DJANGO_SETTINGS_MODULE', 'statvalue_backend.settings')
+        self.pools = {lane: self._pool(lane) for lane in workers}
+
+    def _pool(self, lane):
+        # spawn: TensorFlow is not fork-safe once initialised
+        return ProcessPoolExecutor(max_workers=self.workers[lane], mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=init_worker, initargs=(self.settings_module, lane, self.warm))
+
+    def run(self, name, kwargs, timeout):
+        lane = OPERATIONS[name][0]
+        try:
+            return self.pools[lane].submit(run_operation, name, kwargs).result(timeout=timeout)
+        except BrokenProcessPool:
+            logger.error(f"Inference {lane} pool broke, restarting it")
+            self.pools[lane] = self._pool(lane)
+            raise InferenceError("Inference worker crashed; please retry", 503)
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown(cancel_futures=True)
+
+
+def handler_for(pools, timeout):
+    class InferenceHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, body):
+            payload = json.dumps(body, default=json_default).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/health':
+                self._send(200, {"status": "ok", "workers": pools.workers})
+            else:
+                self._send(404, {"error": "Not found"})
+
+        def do_POST(self):
+            name = self.path.strip('/')
+            try:
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if name not in OPERATIONS:
+                    raise InferenceError(f"Unknown inference operation: {name}", 404)
+                kwargs = json.loads(body or b'{}')
+                self._send(200, {"result": pools.run(name, kwargs, timeout)})
+            except InferenceError as e:
+                self._send(e.status, {"error": str(e)})
+            except FutureTimeout:
+                self._send(504, {"error": f"Inference {name} timed out after {timeout}s"})
+            except (TypeError, ValueError) as e:
+                self._send(400, {"error": f"Invalid request: {str(e)}"})
+            except Exception as e:
+                logger.error(f"Error in inference operation {name}: {str(e)}")
+                self._send(500, {"error": f"Inference failed: {str(e)}"})
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return InferenceHandler
+
+
+class Command(BaseCommand):
+    help = ("Serve forecasts and similarity search to web nodes (INFERENCE['URL']) "
+            "from per-lane process pools")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8100)
+        parser.add_argument('--predict-workers', type=int, default=None,
+                            help="Defaults to INFERENCE['WORKERS']['predict']")
+        parser.add_argument('--similarity-workers', type=int, default=None,
+                            help="Defaults to INFERENCE['WORKERS']['similarity']")
+        parser.add_argument('--no-warm-up', action='store_true',
+                            help="Load models and the embedding on first request instead of at startup")
+
+    def handle(self, *args, **options):
+        workers = dict(inference_setting('WORKERS', {'predict': 2, 'similarity': 1}))
+        for lane in ('predict', 'similarity'):
+            if options[f'{lane}_workers']:
+                workers[lane] = options[f'{lane}_workers']
+        pools = LanePools(workers, warm=not options['no_warm_up'])
+        timeout = inference_setting('TIMEOUT', 30.0)
+        server = ThreadingHTTPServer((options['host'], options['port']), handler_for(pools, timeout))
+        self.stdout.write(f"Inference service on http://{options['host']}:{options['port']}/ "
+                          f"with workers {workers}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            pools.shutdown()
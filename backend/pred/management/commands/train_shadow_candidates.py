@@ -0,0 +1,65 @@
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.model_selection import train_test_split
+from sklearn.neighbors import KNeighborsRegressor
+
+from pred.forecast import LOOKBACK as lookback, build_training_windows
+from pred.registry import registry
+from statvalue_backend import inference
+
+CANDIDATE_FACTORIES = {
+    'gbt': lambda: GradientBoostingRegressor(n_estimators=200, max_depth=3, learning_rate=0.05),
+    'knn': lambda: KNeighborsRegressor(n_neighbors=10, weights='distance'),
+}
+
+
+class Command(BaseCommand):
+    help = ("Fit cheap candidate models on the LSTM's scaled lookback windows for shadow evaluation "
+            "and report their holdout error and latency")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', nargs='+', choices=sorted(CANDIDATE_FACTORIES),
+                            default=sorted(CANDIDATE_FACTORIES))
+        parser.add_argument('--output-dir', type=Path, default=None,
+                            help="Defaults to PREDICTION_MODELS_DIR")
+        parser.add_argument('--test-size', type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        # The candidates are compared against the LSTM, so load it here even on a web node
+        inference.use_local_models()
+        bundle = registry.current()
+        if bundle is None:
+            raise CommandError("Prediction artifacts could not be loaded")
+
+        X, y = build_training_windows(bundle.df, bundle.important_features, bundle.feature_scaler,
+                                      bundle.target_scaler, lookback)
+        if len(X) < 10:
+            raise CommandError(f"Only {len(X)} training windows; need more seasons per player")
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=options['test_size'], random_state=0)
+
+        def to_mv(scaled):
+            return bundle.target_scaler.inverse_transform(np.asarray(scaled).reshape(-1, 1)).ravel()
+
+        start = time.perf_counter()
+        lstm_pred = bundle.model.predict(X_test.reshape(len(X_test), lookback, -1), verbose=0)
+        lstm_ms = (time.perf_counter() - start) * 1000 / len(X_test)
+        lstm_mae = float(np.mean(np.abs(to_mv(lstm_pred) - to_mv(y_test))))
+        self.stdout.write(f"lstm: holdout MAE {lstm_mae:.2f}, {lstm_ms:.3f} ms/row (batched)")
+
+        output_dir = options['output_dir'] or Path(settings.PREDICTION_MODELS_DIR)
+        for name in options['candidates']:
+            candidate = CANDIDATE_FACTORIES[name]().fit(X_train, y_train)
+            start = time.perf_counter()
+            pred = candidate.predict(X_test)
+            per_row_ms = (time.perf_counter() - start) * 1000 / len(X_test)
+            mae = float(np.mean(np.abs(to_mv(pred) - to_mv(y_test))))
+
+            path = output_dir / f"shadow_{name}.joblib"
+            joblib.dump(candidate, path)
+            self.stdout.write(f"{name}: holdout MAE {mae:.2f}, {per_row_ms:.3f} ms/row -> {path}")
@@ -0,0 +1,344 @@
+"""
+Versioned registry of the prediction artifacts (LSTM model, scalers, feature list
+and derived dataset).
+
+Everything a prediction needs lives in one immutable ModelBundle. Requests take
+the current bundle once and use it throughout, so a reload that swaps in a new
+bundle never mixes a new model with old data. The registry polls the artifact
+files, loads changed ones on a background thread while the old bundle keeps
+serving, and then swaps atomically.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+from django.conf import settings
+
+from statvalue_backend import inference
+from statvalue_backend.caching import bump_dataset_version, files_version
+from .features import append_rows, derive_features, frame_memory, optimize_dtypes
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_SETTINGS = {
+    'model': 'PREDICTION_MODEL_PATH',
+    'dataset': 'PREDICTION_DATASET_PATH',
+    'feature_scaler': 'PREDICTION_FEATURE_SCALER_PATH',
+    'target_scaler': 'PREDICTION_TARGET_SCALER_PATH',
+    'important_features': 'PREDICTION_IMPORTANT_FEATURES_PATH',
+}
+UPDATE_SUFFIXES = ('.xlsx', '.csv', '.parquet')
+
+
+class ArtifactMissing(Exception):
+    pass
+
+
+def artifact_paths():
+    return {name: str(getattr(settings, setting)) for name, setting in ARTIFACT_SETTINGS.items()}
+
+
+def artifact_fingerprint(paths):
+    """Short hash over the size and mtime of every artifact"""
+    return files_version([paths[name] for name in sorted(paths)])[0]
+
+
+def read_dataset(path):
+    """Read the player-season table; csv and parquet are accepted for large generated sets"""
+    import pandas as pd
+
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == '.parquet':
+        return pd.read_parquet(path)
+    if suffix == '.csv':
+        return pd.read_csv(path)
+    return pd.read_excel(path)
+
+
+def pending_update_files(applied):
+    """Season files in SEASON_UPDATES_DIR not yet folded into a bundle"""
+    updates_dir = getattr(settings, 'SEASON_UPDATES_DIR', None)
+    if not updates_dir:
+        return []
+    try:
+        return sorted(entry.path for entry in os.scandir(updates_dir)
+                      if entry.is_file() and entry.path not in applied
+                      and os.path.splitext(entry.name)[1].lower() in UPDATE_SUFFIXES)
+    except OSError as e:
+        logger.error(f"Cannot read season updates from {updates_dir}: {str(e)}")
+        return []
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts the least recently used entry beyond `maxsize`"""
+
+    def __init__(self, maxsize, items=()):
+        self.maxsize = maxsize
+        self._data = OrderedDict(items)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def without(self, keys):
+        """A new cache with the same entries and order, minus `keys`"""
+        with self._lock:
+            return LRUCache(self.maxsize, ((key, value) for key, value in self._data.items() if key not in keys))
+
+
+def player_cache():
+    # Each entry holds one player's rows or lookback window; popular players stay, the long tail is evicted
+    return LRUCache(getattr(settings, 'PREDICTION_PLAYER_CACHE_SIZE', 4096))
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """One consistent version of everything predict_market_value reads"""
+    artifact_version: str
+    model: object
+    df: object
+    feature_scaler: object
+    target_scaler: object
+    important_features: object
+    club_reputation: object
+    revision: int = 0
+    applied_updates: frozenset = frozenset()
+    loaded_at: float = field(default_factory=time.time)
+    # Per-player history slices; belongs to this bundle, so a swap invalidates it wholesale
+    player_rows_cache: LRUCache = field(default_factory=player_cache, compare=False)
+    # Per-player scaled lookback windows (pred.forecast.PlayerBase), same lifetime
+    window_cache: LRUCache = field(default_factory=player_cache, compare=False)
+    # Per-bundle derived state such as residual quantiles for prediction intervals
+    derived_cache: dict = field(default_factory=dict, compare=False)
+
+    # derived_cache entries over the whole history that a season append barely moves
+    KEPT_ON_APPEND = ('residuals',)
+
+    @property
+    def version(self):
+        if self.revision:
+            return f"{self.artifact_version}.{self.revision}"
+        return self.artifact_version
+
+    @property
+    def last_modified(self):
+        """Newest mtime of the artifacts and applied season files, the same in every worker"""
+        return files_version(list(artifact_paths().values()) + sorted(self.applied_updates))[1]
+
+    def player_rows(self, player_name):
+        """A player's seasons sorted by year"""
+        rows = self.player_rows_cache.get(player_name)
+        if rows is None:
+            rows = self.df[self.df['name'] == player_name].sort_values('Year')
+            self.player_rows_cache[player_name] = rows
+        return rows
+
+    def appended(self, new_rows, source=None):
+        """A new bundle with `new_rows` folded in; untouched players keep their cached slices"""
+        reputation = self.club_reputation.copy()
+        df, affected = append_rows(self.df, new_rows, reputation, self.important_features)
+        if getattr(settings, 'PREDICTION_OPTIMIZE_DTYPES', True):
+            # Concatenating new rows turns categoricals back into object columns
+            df = optimize_dtypes(df)
+        affected = set(affected)
+        cache = self.player_rows_cache.without(affected)
+        windows = self.window_cache.without(affected)
+        applied = self.applied_updates | {source} if source else self.applied_updates
+        logger.info(f"Appended {len(new_rows)} rows affecting {len(affected)} players")
+        return replace(self, df=df, club_reputation=reputation, revision=self.revision + 1,
+                       applied_updates=applied, player_rows_cache=cache, window_cache=windows,
+                       derived_cache={key: self.derived_cache[key] for key in self.KEPT_ON_APPEND
+                                      if key in self.derived_cache})
+
+
+def load_bundle(paths, artifact_version):
+    """
+    Load every artifact from disk and derive the dataset features. Web nodes of a
+    split deployment (see statvalue_backend.inference) load everything but the
+    model, which only the inference service needs.
+    """
+    with_model = inference.serves_models()
+    for name, path in paths.items():
+        if (with_model or name != 'model') and not os.path.exists(path):
+            raise ArtifactMissing(f"{name} not found at {path}")
+
+    if with_model:
+        # TensorFlow takes seconds to import; only processes that actually serve predictions pay for it
+        import tensorflow as tf
+
+        logger.info(f"Loading prediction model and data (version {artifact_version})...")
+        model = tf.keras.models.load_model(paths['model'])
+        logger.info("Model loaded successfully")
+    else:
+        logger.info(f"Loading prediction data without the model (version {artifact_version}); "
+                    f"forecasts run on the inference service")
+        model = None
+
+    feature_scaler = np.load(paths['feature_scaler'], allow_pickle=True)[0]
+    target_scaler = np.load(paths['target_scaler'], allow_pickle=True)[0]
+    logger.info("Scalers loaded successfully")
+
+    important_features = np.load(paths['important_features'], allow_pickle=True)
+    logger.info(f"Loaded {len(important_features)} important features")
+
+    df = read_dataset(paths['dataset'])
+    logger.info(f"Dataset loaded with {len(df)} records")
+
+    logger.info("Creating derived features...")
+    df, club_reputation = derive_features(df, important_features)
+    logger.info("Successfully prepared all required features")
+    if getattr(settings, 'PREDICTION_OPTIMIZE_DTYPES', True):
+        before = frame_memory(df)
+        df = optimize_dtypes(df)
+        logger.info(f"Dataset memory reduced from {before / 2**20:.1f} MiB to {frame_memory(df) / 2**20:.1f} MiB")
+
+    bundle = ModelBundle(artifact_version, model, df, feature_scaler, target_scaler,
+                         important_features, club_reputation)
+    for path in pending_update_files(bundle.applied_updates):
+        bundle = bundle.appended(read_dataset(path), source=path)
+
+    from .intervals import precompute_residuals
+    try:
+        precompute_residuals(bundle)
+    except Exception as e:
+        logger.error(f"Could not precompute interval residuals, computing on first use: {str(e)}")
+    return bundle
+
+
+class ModelRegistry:
+    """Holds the serving ModelBundle and replaces it when artifacts change on disk"""
+
+    def __init__(self):
+        self._bundle = None
+        self._lock = threading.Lock()
+        # Token of the background reload in progress, so only that reload clears it
+        self._reloading = None
+        self._last_reload_check = 0.0
+        self._last_update_poll = 0.0
+        self._failed_updates = set()
+
+    def current(self):
+        """The serving bundle, loading synchronously on first use; None if artifacts are unavailable"""
+        if self._bundle is None:
+            with self._lock:
+                if self._bundle is None:
+                    paths = artifact_paths()
+                    try:
+                        self._swap(load_bundle(paths, artifact_fingerprint(paths)))
+                    except Exception as e:
+                        logger.error(f"Error loading models and data: {str(e)}")
+                        return None
+            return self._bundle
+
+        self._check_for_new_artifacts()
+        self._apply_pending_updates()
+        return self._bundle
+
+    def append(self, new_rows, source=None):
+        """Fold new season rows into the serving bundle"""
+        with self._lock:
+            if self._bundle is None:
+                return None
+            self._swap(self._bundle.appended(new_rows, source=source))
+            return self._bundle
+
+    def reload(self, background=True):
+        """Load the artifacts again and swap them in, by default without blocking the caller"""
+        paths = artifact_paths()
+        version = artifact_fingerprint(paths)
+        if not background:
+            self._reload(paths, version)
+            return
+        token = object()
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = token
+        threading.Thread(target=self._reload, args=(paths, version, token), name='model-reload', daemon=True).start()
+
+    def version_state(self):
+        """
+        (version, last_modified) of the serving bundle, or of the bundle the next
+        load would produce, so HTTP caching never sees a different version for the
+        same data before and after the first load.
+        """
+        bundle = self._bundle
+        if bundle is not None:
+            return bundle.version, bundle.last_modified
+        paths = artifact_paths()
+        pending = pending_update_files(frozenset())
+        version = artifact_fingerprint(paths)
+        if pending:
+            version = f"{version}.{len(pending)}"
+        return version, files_version(list(paths.values()) + pending)[1]
+
+    def reset(self):
+        """Forget the serving bundle; the next request loads from scratch"""
+        with self._lock:
+            self._bundle = None
+
+    def _swap(self, bundle):
+        previous = self._bundle
+        self._bundle = bundle
+        # Cached HTTP responses and ETags were computed from the previous version
+        bump_dataset_version(version=bundle.version, last_modified=bundle.last_modified)
+        if previous is not None and previous.version != bundle.version:
+            logger.info(f"Prediction bundle {previous.version} replaced by {bundle.version}")
+
+    def _reload(self, paths, version, token=None):
+        try:
+            bundle = load_bundle(paths, version)
+            with self._lock:
+                self._swap(bundle)
+        except Exception as e:
+            logger.error(f"Background reload of version {version} failed, keeping current bundle: {str(e)}")
+        finally:
+            # A synchronous reload must not clear the flag of a background one still running
+            if token is not None:
+                with self._lock:
+                    if self._reloading is token:
+                        self._reloading = None
+
+    def _check_for_new_artifacts(self):
+        interval = getattr(settings, 'MODEL_RELOAD_POLL_SECONDS', 30)
+        now = time.monotonic()
+        if not interval or self._reloading or now - self._last_reload_check < interval:
+            return
+        self._last_reload_check = now
+        if artifact_fingerprint(artifact_paths()) != self._bundle.artifact_version:
+            logger.info("Prediction artifacts changed on disk, reloading in the background")
+            self.reload()
+
+    def _apply_pending_updates(self):
+        now = time.monotonic()
+        if self._reloading or now - self._last_update_poll < getattr(settings, 'SEASON_UPDATES_POLL_SECONDS', 30):
+            return
+        self._last_update_poll = now
+        for path in pending_update_files(self._bundle.applied_updates | self._failed_updates):
+            try:
+                self.append(read_dataset(path), source=path)
+            except Exception as e:
+                self._failed_updates.add(path)
+                logger.error(f"Failed to apply season update {path}: {str(e)}")
+
+
+registry = ModelRegistry()
@@ -0,0 +1,153 @@
+"""
+What-if scenarios: forecasts under feature overrides such as a move to another
+club or a different workload.
+
+Each player's scaled lookback window is taken from the bundle's cache; a
+scenario only rewrites and re-scales the last timestep, and every
+(player, year, scenario) combination goes through the model in one batched
+forward pass, so a clubs x minutes grid costs a single call.
+"""
+import itertools
+import math
+
+import numpy as np
+from django.conf import settings
+
+from .features import reputation_at_club
+from .forecast import ForecastError, age_factor, player_base, predict_values, project_window
+
+OPERATION = 'prediction_scenarios'
+BASELINE = 'baseline'
+
+
+class ScenarioError(ValueError):
+    """An invalid scenario specification; the message is user-facing"""
+
+
+def scenario_setting(name, default=None):
+    return getattr(settings, 'PREDICTION_SCENARIOS', {}).get(name, default)
+
+
+def _numeric_overrides(overrides):
+    if not isinstance(overrides, dict):
+        raise ScenarioError("overrides must be an object of feature -> number")
+    try:
+        return {str(feature): float(value) for feature, value in overrides.items()}
+    except (TypeError, ValueError):
+        raise ScenarioError("override values must be numbers")
+
+
+def parse_scenarios(data, forecasts_per_scenario=1):
+    """
+    Scenarios from a request body: an explicit "scenarios" list of
+    {"name", "club", "overrides"} and/or a "grid" of {"club" | feature: [values]}
+    expanded to its cartesian product. The baseline always comes first.
+    The total (scenarios x forecasts_per_scenario) is checked against MAX_ROWS
+    before the grid is expanded.
+    """
+    scenarios = [{'name': BASELINE, 'club': None, 'overrides': {}}]
+    explicit = data.get('scenarios') or []
+    if not isinstance(explicit, list):
+        raise ScenarioError("scenarios must be a list")
+
+    grid = data.get('grid') or {}
+    if not isinstance(grid, dict) or not all(isinstance(v, list) and v for v in grid.values()):
+        raise ScenarioError("grid must map each feature (or 'club') to a non-empty list of values")
+    max_rows = scenario_setting('MAX_ROWS', 20000)
+    grid_size = math.prod(len(values) for values in grid.values()) if grid else 0
+    requested = (1 + len(explicit) + grid_size) * forecasts_per_scenario
+    if requested > max_rows:
+        raise ScenarioError(f"Scenario grid too large: {requested} forecasts (at most {max_rows})")
+
+    for i, spec in enumerate(explicit):
+        if not isinstance(spec, dict):
+            raise ScenarioError("each scenario must be an object")
+        scenarios.append({
+            'name': str(spec.get('name') or f"scenario_{i + 1}"),
+            'club': spec.get('club'),
+            'overrides': _numeric_overrides(spec.get('overrides') or {}),
+        })
+
+    keys = list(grid)
+    for combination in itertools.product(*(grid[k] for k in keys)):
+        point = dict(zip(keys, combination))
+        club = point.pop('club', None)
+        scenarios.append({
+            'name': ', '.join(f"{k}={v}" for k, v in zip(keys, combination)),
+            'club': club,
+            'overrides': _numeric_overrides(point),
+        })
+    return scenarios
+
+
+def _scenario_overrides(base, scenario, cr_values):
+    """Feature overrides for one player under one scenario"""
+    overrides = {}
+    club = scenario['club']
+    if club is not None:
+        if club not in cr_values.index:
+            raise ScenarioError(f"Unknown club '{club}'")
+        last = base.rows.iloc[-1]
+        overrides.update(reputation_at_club(club, cr_values, nr=last.get('NR'), pr=last.get('PR')))
+    overrides.update(scenario['overrides'])
+    return overrides
+
+
+def evaluate_scenarios(bundle, player_names, years, scenarios):
+    """
+    Forecasts for every player x year x scenario, with the delta against the
+    baseline. Returns (rows, errors, ignored) where `ignored` lists overridden
+    features the model does not use.
+    """
+    max_rows = scenario_setting('MAX_ROWS', 20000)
+    requested = len(set(player_names)) * len(years) * len(scenarios)
+    if requested > max_rows:
+        raise ScenarioError(f"Scenario grid too large: {requested} forecasts (at most {max_rows})")
+
+    cr_values = bundle.derived_cache.get('cr_values')
+    if cr_values is None:
+        cr_values = bundle.club_reputation.cr_values()
+        bundle.derived_cache['cr_values'] = cr_values
+
+    model_features = set(bundle.important_features)
+    ignored = sorted({feature for scenario in scenarios for feature in scenario['overrides']
+                      if feature not in model_features})
+
+    errors, cells = [], []
+    for name in dict.fromkeys(player_names):
+        try:
+            base = player_base(bundle, name, OPERATION)
+        except ForecastError as e:
+            errors.append({"playerName": name, "error": str(e)})
+            continue
+        per_scenario = [_scenario_overrides(base, scenario, cr_values) for scenario in scenarios]
+        for year in years:
+            if year <= base.last_known_year:
+                errors.append({"playerName": name, "year": year,
+                               "error": f"{year} is not after the last known season {base.last_known_year}"})
+                continue
+            for scenario, overrides in zip(scenarios, per_scenario):
+                cells.append((base, year, scenario['name'],
+                              project_window(bundle, base, year, overrides, operation=OPERATION)))
+
+    if not cells:
+        return [], errors, ignored
+
+    X_scaled = np.stack([window.X_scaled for _, _, _, window in cells])
+    values = predict_values(bundle, X_scaled, OPERATION, batch_size=scenario_setting('BATCH_SIZE', 1024))
+
+    rows, baseline = [], {}
+    for (base, year, scenario_name, window), value in zip(cells, values):
+        value = round(float(value) * age_factor(window.projected_age), 2)
+        if scenario_name == BASELINE:
+            baseline[(base.player_name, year)] = value
+        rows.append({
+            "playerName": base.player_name,
+            "year": int(year),
+            "scenario": scenario_name,
+            "predictedValue": value,
+            "currentValue": round(base.last_known_mv, 2),
+        })
+    for row in rows:
+        row["deltaVsBaseline"] = round(row["predictedValue"] - baseline[(row["playerName"], row["year"])], 2)
+    return rows, errors, ignored
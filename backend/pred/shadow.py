@@ -0,0 +1,105 @@
+"""
+Shadow evaluation of candidate models against the serving LSTM.
+
+A sampled fraction of predictions is replayed through cheaper candidate models
+(e.g. gradient-boosted trees or a KNN regressor over the same scaled lookback
+window) on a separate, bounded thread pool. The response never waits for them;
+latency and value deltas versus the primary model are logged and exported as
+metrics so the fastest accurate-enough model can be picked.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from statvalue_backend.metrics import SHADOW_DELTA, SHADOW_DROPPED, SHADOW_ERRORS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def shadow_setting(name, default=None):
+    return getattr(settings, 'PREDICTION_SHADOW', {}).get(name, default)
+
+
+class ShadowEvaluator:
+    """Runs candidate models on sampled prediction inputs without blocking the request"""
+
+    def __init__(self):
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._candidates = {}
+        self._candidates_lock = threading.Lock()
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=shadow_setting('WORKERS', 1),
+                                                        thread_name_prefix='shadow')
+        return self._executor
+
+    def _candidate(self, name, path):
+        """Load (and cache) a candidate, picking up a new file when it changes on disk"""
+        mtime = os.path.getmtime(path)
+        cached = self._candidates.get(name)
+        if cached is None or cached[0] != mtime:
+            with self._candidates_lock:
+                cached = self._candidates.get(name)
+                if cached is None or cached[0] != mtime:
+                    import joblib
+
+                    cached = (mtime, joblib.load(path))
+                    self._candidates[name] = cached
+        return cached[1]
+
+    def maybe_submit(self, bundle, X_scaled, primary_value, primary_seconds, player_name, target_year):
+        """Queue a shadow run for a sampled fraction of predictions; never raises"""
+        candidates = shadow_setting('CANDIDATES', {})
+        if not candidates or random.random() >= shadow_setting('SAMPLE_RATE', 0.0):
+            return
+        with self._lock:
+            if self._pending >= shadow_setting('MAX_PENDING', 32):
+                SHADOW_DROPPED.inc()
+                return
+            self._pending += 1
+        try:
+            self._pool().submit(self._evaluate, bundle, X_scaled.copy(), primary_value,
+                                primary_seconds, player_name, target_year, dict(candidates))
+        except RuntimeError:
+            with self._lock:
+                self._pending -= 1
+
+    def _evaluate(self, bundle, X_scaled, primary_value, primary_seconds, player_name, target_year, candidates):
+        try:
+            flat = X_scaled.reshape(1, -1)
+            for name, path in candidates.items():
+                try:
+                    candidate = self._candidate(name, str(path))
+                    start = time.perf_counter()
+                    pred_scaled = candidate.predict(flat).reshape(-1, 1)
+                    seconds = time.perf_counter() - start
+                    value = float(bundle.target_scaler.inverse_transform(pred_scaled)[0][0])
+                except Exception as e:
+                    SHADOW_ERRORS.inc(candidate=name)
+                    logger.warning(f"Shadow candidate {name} failed for {player_name}: {str(e)}")
+                    continue
+
+                delta = value - primary_value
+                STAGE_SECONDS.observe(seconds, operation='shadow', stage=name)
+                SHADOW_DELTA.observe(abs(delta), candidate=name)
+                logger.info(
+                    f"shadow candidate={name} model={bundle.version} player={player_name!r} year={target_year} "
+                    f"primary={primary_value:.2f} candidate={value:.2f} delta={delta:+.2f} "
+                    f"latency_ms={seconds * 1000:.2f} primary_latency_ms={primary_seconds * 1000:.2f} "
+                    f"latency_delta_ms={(seconds - primary_seconds) * 1000:+.2f}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+shadow = ShadowEvaluator()
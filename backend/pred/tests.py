@@ -1,3 +1,1018 @@
-from django.test import TestCase
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from .forecast import LOOKBACK, player_base, predict_values, project_window
+
+# Libraries that must only load when a prediction, similarity index, artifact or encoder is first used
+HEAVY_MODULES = ('tensorflow', 'keras', 'pandas', 'sklearn', 'joblib', 'pyarrow', 'msgpack', 'brotli')
+
+# Setting up Django and resolving every URL imports all apps, models and views
+STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({
+    'seconds': time.perf_counter() - start,
+    'heavy': sorted(m for m in sys.modules if m.split('.')[0] in %r),
+}))
+""" % (HEAVY_MODULES,)
+
+
+class StartupImportTests(SimpleTestCase):
+    """Startup (manage.py, auth-only workers, tests) must not pay for the ML stack"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE',
+                                                                      'statvalue_backend.settings'))
+        result = subprocess.run([sys.executable, '-c', STARTUP_PROBE], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, check=True, timeout=120)
+        cls.startup = json.loads(result.stdout.strip().splitlines()[-1])
+
+    def test_heavy_libraries_load_lazily(self):
+        self.assertEqual(self.startup['heavy'], [])
+
+    def test_startup_within_budget(self):
+        budget = float(os.environ.get('STATVALUE_STARTUP_BUDGET_SECONDS', 3.0))
+        self.assertLess(self.startup['seconds'], budget,
+                        f"Django startup took {self.startup['seconds']:.2f}s (budget {budget}s)")
+
+
+IMPORTANT_FEATURES = np.array(['PrevYearMV', 'MV_Trend', 'Age', 'CR', 'NR', 'ReputationIndex'])
+
+
+class LinearModel:
+    """Deterministic stand-in for the LSTM: a fixed linear map of the scaled window"""
+
+    def __init__(self, n_features):
+        self.weights = np.linspace(-1.0, 1.0, LOOKBACK * n_features)
+
+    def predict(self, X, verbose=0, batch_size=None):
+        return X.reshape(len(X), -1) @ self.weights
+
+
+class SyntheticBundleTestCase(SimpleTestCase):
+    """A derived synthetic history and fitted scalers, shared by the bundle-level tests"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from sklearn.preprocessing import StandardScaler
+
+        from benchmarks.synthetic import player_seasons
+        from .features import derive_features
+
+        history = player_seasons(120, seasons=range(2016, 2024), seed=3)
+        cls.new_season = history[history['Year'] == 2023].head(40).reset_index(drop=True)
+        cls.df, cls.reputation = derive_features(history[history['Year'] < 2023].reset_index(drop=True),
+                                                 IMPORTANT_FEATURES)
+        cls.feature_scaler = StandardScaler().fit(cls.df[list(IMPORTANT_FEATURES)].values.astype(float))
+        cls.target_scaler = StandardScaler().fit(cls.df[['MV']].values)
+        cls.names = list(cls.df['name'].unique()[:25])
+
+    def bundle(self, df):
+        from .registry import ModelBundle
+
+        return ModelBundle('test', LinearModel(len(IMPORTANT_FEATURES)), df, self.feature_scaler,
+                           self.target_scaler, IMPORTANT_FEATURES, self.reputation.copy())
+
+
+class DtypeOptimizationTests(SyntheticBundleTestCase):
+    """Compacting the derived frame at load must not change any value or prediction"""
+
+    def compact(self):
+        from .features import optimize_dtypes
+
+        return optimize_dtypes(self.df.copy())
+
+    def predictions(self, bundle, years=(2023, 2025)):
+        windows = [project_window(bundle, player_base(bundle, name), year) for name in self.names for year in years]
+        return predict_values(bundle, np.stack([window.X_scaled for window in windows]))
+
+    def test_memory_shrinks_without_duplicate_name_column(self):
+        from .features import frame_memory
+
+        compact = self.compact()
+        self.assertNotIn('player_name', compact.columns)
+        self.assertEqual(compact['name'].dtype, 'category')
+        self.assertEqual(compact['Club'].dtype, 'category')
+        self.assertLess(frame_memory(compact), frame_memory(self.df))
+
+    def test_values_are_unchanged(self):
+        compact = self.compact()
+        for column in self.df.columns:
+            with self.subTest(column=column):
+                self.assertTrue(compact[column].astype(self.df[column].dtype).equals(self.df[column]))
+
+    def test_predictions_are_unchanged(self):
+        np.testing.assert_array_equal(self.predictions(self.bundle(self.compact())),
+                                      self.predictions(self.bundle(self.df.copy())))
+
+    def test_predictions_are_unchanged_after_append(self):
+        compact = self.bundle(self.compact()).appended(self.new_season.copy())
+        with override_settings(PREDICTION_OPTIMIZE_DTYPES=False):
+            plain = self.bundle(self.df.copy()).appended(self.new_season.copy())
+        self.assertEqual(compact.df['name'].dtype, 'category')
+        np.testing.assert_array_equal(self.predictions(compact, years=(2024, 2026)),
+                                      self.predictions(plain, years=(2024, 2026)))
+
+    def test_append_keeps_compacted_dtypes_without_upcast_warnings(self):
+        import warnings
+
+        from .features import append_rows
+
+        # A club whose values jump moves between quintiles, rewriting CR on existing rows
+        new_rows = self.new_season.copy()
+        new_rows.loc[new_rows['Club'] == new_rows['Club'].iloc[0], 'MV'] *= 100
+        compact = self.compact()
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', FutureWarning)
+            df, _ = append_rows(compact, new_rows, self.reputation.copy(), IMPORTANT_FEATURES)
+        plain, _ = append_rows(self.df.copy(), new_rows, self.reputation.copy(), IMPORTANT_FEATURES)
+        for column in ('CR_value', 'CR', 'ReputationIndex'):
+            with self.subTest(column=column):
+                np.testing.assert_array_equal(df.sort_values(['name', 'Year'])[column].to_numpy(np.float64),
+                                              plain.sort_values(['name', 'Year'])[column].to_numpy(np.float64))
+
+
+class ExportTests(SyntheticBundleTestCase):
+    """Bulk exports round-trip the selected frame, forecasts included, in every format"""
+
+    def export(self, fmt, chunk_rows=97):
+        from .export import iter_export, select_frame
+        from .features import optimize_dtypes
+
+        frame = select_frame(self.bundle(optimize_dtypes(self.df.copy())), columns=['name', 'Year', 'Club', 'MV'],
+                             years=[2021, 2022], forecast_years=[2024, 2025])
+        return frame, b''.join(iter_export(frame, fmt, chunk_rows=chunk_rows))
+
+    def assertRoundTrip(self, frame, table):
+        import pandas as pd
+
+        self.assertEqual(table.num_rows, len(frame))
+        pd.testing.assert_frame_equal(table.to_pandas().astype(object), frame.astype(object))
+
+    def test_anonymous_export_is_rejected(self):
+        response = self.client.get(reverse('export_dataset'), {'format': 'csv'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_csv_round_trip(self):
+        import io
+
+        import pandas as pd
+
+        frame, body = self.export('csv')
+        self.assertEqual(len(pd.read_csv(io.BytesIO(body))), len(frame))
+
+    def test_arrow_round_trip_with_forecasts(self):
+        from .export import pyarrow_modules
+        pa, _ = pyarrow_modules()
+        if pa is None:
+            self.skipTest('pyarrow is not installed')
+
+        frame, body = self.export('arrow')
+        self.assertEqual(set(frame['Source']), {'actual', 'forecast'})
+        self.assertRoundTrip(frame, pa.ipc.open_stream(body).read_all())
+
+    def test_parquet_round_trip_with_forecasts(self):
+        import io
+
+        from .export import pyarrow_modules
+        pa, pq = pyarrow_modules()
+        if pa is None:
+            self.skipTest('pyarrow is not installed')
+
+        frame, body = self.export('parquet')
+        self.assertRoundTrip(frame, pq.read_table(io.BytesIO(body)))
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Concurrent identical calls share one execution, its result and its exception"""
+
+    def run_concurrently(self, flight, func, followers=4):
+        """Start a leader blocked in `func`, then followers for the same key; returns their outcomes"""
+        outcomes = []
+
+        def call():
+            try:
+                outcomes.append(('result', flight.do('key', func)))
+            except Exception as e:
+                outcomes.append(('error', e))
+
+        threads = [threading.Thread(target=call)]
+        threads[0].start()
+        while 'key' not in flight._calls:
+            time.sleep(0.001)
+        threads += [threading.Thread(target=call) for _ in range(followers)]
+        for thread in threads[1:]:
+            thread.start()
+        return threads, outcomes
+
+    def test_followers_share_the_leaders_result(self):
+        from statvalue_backend.throttling import SingleFlight
+
+        release, calls = threading.Event(), []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return {'value': 42}
+
+        threads, outcomes = self.run_concurrently(SingleFlight('test'), compute)
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(outcomes, [('result', {'value': 42})] * 5)
+
+    def test_followers_get_the_leaders_exception(self):
+        from statvalue_backend.throttling import SingleFlight
+
+        release = threading.Event()
+
+        def compute():
+            release.wait(5)
+            raise ValueError('model failed')
+
+        threads, outcomes = self.run_concurrently(SingleFlight('test'), compute)
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual([kind for kind, _ in outcomes], ['error'] * 5)
+        self.assertEqual(len({id(error) for _, error in outcomes}), 1)
+        self.assertEqual(str(outcomes[0][1]), 'model failed')
+
+    @override_settings(SINGLE_FLIGHT_WAIT_SECONDS=0.05)
+    def test_followers_stop_waiting_for_a_stuck_leader(self):
+        from statvalue_backend.throttling import SingleFlight
+
+        release, calls = threading.Event(), []
+
+        def compute():
+            calls.append(1)
+            if len(calls) == 1:
+                release.wait(5)
+            return len(calls)
+
+        threads, outcomes = self.run_concurrently(SingleFlight('test'), compute, followers=1)
+        threads[1].join(5)
+        self.assertEqual(outcomes, [('result', 2)])
+        release.set()
+        threads[0].join(5)
+
+
+def throttled_view(request):
+    return JsonResponse({'ok': True})
+
+
+@override_settings(RATE_LIMITS={'test': {'RATE': 0.5, 'BURST': 2}})
+class RateLimitTests(SimpleTestCase):
+    """Each client gets BURST requests, then 429 with the wait until its next token"""
+
+    def setUp(self):
+        from statvalue_backend.throttling import rate_limited
+
+        cache.clear()
+        self.view = rate_limited('test')(throttled_view)
+        self.factory = RequestFactory()
+
+    def get(self, address='10.0.0.1'):
+        return self.view(self.factory.get('/', REMOTE_ADDR=address))
+
+    def test_burst_then_429_with_retry_after(self):
+        self.assertEqual([self.get().status_code for _ in range(2)], [200, 200])
+        response = self.get()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '2')
+
+    def test_clients_have_separate_buckets(self):
+        for _ in range(3):
+            self.get()
+        self.assertEqual(self.get('10.0.0.2').status_code, 200)
+
+    @override_settings(RATE_LIMITS={'test': {'RATE': 0, 'BURST': 5}})
+    def test_zero_rate_blocks_the_scope(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '3600')
+
+    @override_settings(RATE_LIMITS={})
+    def test_unconfigured_scope_is_not_limited(self):
+        self.assertEqual({self.get().status_code for _ in range(10)}, {200})
+
+
+class PredictionAuthTests(SimpleTestCase):
+    """Prediction endpoints authenticate the bearer token, resolving its user from the cache"""
+
+    def setUp(self):
+        cache.clear()
+
+    def token_for(self, user_id):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        from authentication.authentication import user_cache_key
+        from authentication.models import CustomUser
+
+        # Cached, so authentication needs no database (SimpleTestCase would refuse the query)
+        cache.set(user_cache_key(user_id), CustomUser(id=user_id, username=f"user{user_id}", is_active=True))
+        token = AccessToken()
+        token['user_id'] = user_id
+        return str(token)
+
+    def predict(self, **extra):
+        return self.client.post(reverse('generate_prediction'), {'playerName': 'Player 1', 'year': 2025},
+                                content_type='application/json', **extra)
+
+    def test_anonymous_prediction_is_rejected(self):
+        from unittest import mock
+
+        with mock.patch('pred.views.inference.call') as call:
+            response = self.predict()
+        self.assertEqual(response.status_code, 401)
+        call.assert_not_called()
+
+    def test_invalid_token_is_rejected(self):
+        self.assertEqual(self.predict(HTTP_AUTHORIZATION='Bearer not-a-token').status_code, 401)
+
+    def test_authenticated_prediction_resolves_the_cached_user(self):
+        from unittest import mock
+
+        from authentication.authentication import CachedJWTAuthentication
+
+        users = []
+        get_user = CachedJWTAuthentication.get_user
+
+        def record(auth, validated_token):
+            users.append(get_user(auth, validated_token))
+            return users[-1]
+
+        with mock.patch.object(CachedJWTAuthentication, 'get_user', record), \
+                mock.patch('pred.views.inference.call', return_value={'playerName': 'Player 1', 'year': 2025}):
+            response = self.predict(HTTP_AUTHORIZATION=f"Bearer {self.token_for(7)}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user.username for user in users], ['user7'])
+
+
+class SquadAggregationTests(SyntheticBundleTestCase):
+    """Squad index, per-club partials and the per-year summary behind squad_valuation"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_index_uses_each_players_latest_club(self):
+        from .aggregation import squad_index
+
+        index = squad_index(self.bundle(self.df.copy()))
+        latest = self.df.sort_values('Year').groupby('name').tail(1)
+        self.assertEqual(sum(len(names) for names in index['club'].values()), len(latest))
+        for _, row in latest.head(20).iterrows():
+            self.assertIn(row['name'], index['club'][row['Club']])
+            self.assertIn(row['Club'], index['league'][row['League']])
+
+    def test_partials_cover_every_player_of_the_club(self):
+        from .aggregation import club_partials, squad_index
+
+        bundle = self.bundle(self.df.copy())
+        club = max(squad_index(bundle)['club'].items(), key=lambda item: len(item[1]))[0]
+        partial = club_partials(bundle, [club], [2024])[(club, 2024)]
+        self.assertEqual(len(partial['players']) + partial['skipped'], len(squad_index(bundle)['club'][club]))
+        self.assertEqual(club_partials(bundle, [club], [2024])[(club, 2024)], partial)
+
+    def test_summary_totals_and_movers(self):
+        from .aggregation import summarize
+
+        partials = {
+            ('A', 2025): {'club': 'A', 'year': 2025, 'players': [('a', 10.0, 5.0), ('b', 3.0, 4.0)], 'skipped': 1},
+            ('B', 2025): {'club': 'B', 'year': 2025, 'players': [('c', 7.0, 7.0)], 'skipped': 0},
+        }
+        # top larger than the number of players must not drop anyone
+        [summary] = summarize(partials, ['A', 'B'], [2025], top=5)
+        self.assertEqual((summary['players'], summary['skipped']), (3, 1))
+        self.assertEqual((summary['totalValue'], summary['currentTotalValue'], summary['change']), (20.0, 16.0, 4.0))
+        self.assertEqual([club['totalValue'] for club in summary['clubs']], [13.0, 7.0])
+        self.assertEqual([mover['playerName'] for mover in summary['risers']], ['a'])
+        self.assertEqual([mover['playerName'] for mover in summary['fallers']], ['b'])
+        self.assertEqual(summary['distribution']['p50'], 7.0)
+
+
+def sample_value(metric, name, **labels):
+    """Current value of one exported sample, 0 when the label set was never recorded"""
+    wanted = [f'{key}="{value}"' for key, value in labels.items()]
+    for sample, rendered, value in metric.samples():
+        if sample == name and all(label in rendered for label in wanted):
+            return value
+    return 0
+
+
+class ShadowEvaluationTests(SyntheticBundleTestCase):
+    """Sampling, candidate loading and the metrics recorded by shadow runs"""
+
+    def setUp(self):
+        import tempfile
+
+        import joblib
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'linear.joblib')
+        joblib.dump(LinearModel(len(IMPORTANT_FEATURES)), self.path)
+        self.X = np.random.default_rng(0).normal(size=(LOOKBACK, len(IMPORTANT_FEATURES)))
+
+    def run_shadow(self, candidates, sample_rate=1.0):
+        from .shadow import ShadowEvaluator
+
+        evaluator = ShadowEvaluator()
+        with override_settings(PREDICTION_SHADOW={'SAMPLE_RATE': sample_rate, 'CANDIDATES': candidates}):
+            evaluator.maybe_submit(self.bundle(self.df), self.X, 10.0, 0.01, 'Test Player', 2024)
+        if evaluator._executor is not None:
+            evaluator._executor.shutdown(wait=True)
+        return evaluator
+
+    def test_sampled_run_records_latency_and_delta(self):
+        from statvalue_backend.metrics import SHADOW_DELTA, STAGE_SECONDS
+
+        before = (sample_value(SHADOW_DELTA, SHADOW_DELTA.name + '_count', candidate='linear'),
+                  sample_value(STAGE_SECONDS, STAGE_SECONDS.name + '_count',
+                               operation='shadow', stage='linear'))
+        evaluator = self.run_shadow({'linear': self.path})
+        after = (sample_value(SHADOW_DELTA, SHADOW_DELTA.name + '_count', candidate='linear'),
+                 sample_value(STAGE_SECONDS, STAGE_SECONDS.name + '_count',
+                              operation='shadow', stage='linear'))
+        self.assertEqual((after[0] - before[0], after[1] - before[1]), (1, 1))
+        self.assertEqual(evaluator._pending, 0)
+        self.assertIn('linear', evaluator._candidates)
+
+    def test_unsampled_prediction_submits_nothing(self):
+        evaluator = self.run_shadow({'linear': self.path}, sample_rate=0.0)
+        self.assertIsNone(evaluator._executor)
+        self.assertEqual(evaluator._candidates, {})
+
+    def test_failing_candidate_counts_an_error(self):
+        from statvalue_backend.metrics import SHADOW_ERRORS
+
+        before = sample_value(SHADOW_ERRORS, SHADOW_ERRORS.name, candidate='missing')
+        evaluator = self.run_shadow({'missing': os.path.join(self.tmp.name, 'missing.joblib')})
+        self.assertEqual(sample_value(SHADOW_ERRORS, SHADOW_ERRORS.name, candidate='missing') - before, 1)
+        self.assertEqual(evaluator._pending, 0)
+
+    def test_concurrent_loads_share_one_candidate(self):
+        from .shadow import ShadowEvaluator
+
+        evaluator = ShadowEvaluator()
+        loaded = []
+        barrier = threading.Barrier(4)
+
+        def load():
+            barrier.wait()
+            loaded.append(evaluator._candidate('linear', self.path))
+
+        threads = [threading.Thread(target=load) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(model) for model in loaded}), 1)
+
+
+class InferenceDispatchTests(SimpleTestCase):
+    """`inference.call` runs in-process without a URL and over the pooled client with one"""
+
+    def echo_operations(self):
+        from unittest import mock
+
+        from statvalue_backend import inference
+
+        return mock.patch.dict(inference.OPERATIONS, {'echo': ('predict', lambda **kwargs: kwargs)})
+
+    def response(self, status, body):
+        from unittest import mock
+
+        response = mock.Mock(status_code=status)
+        if isinstance(body, Exception):
+            response.json.side_effect = body
+        else:
+            response.json.return_value = body
+        return response
+
+    @override_settings(INFERENCE={'URL': None})
+    def test_in_process_without_url(self):
+        from unittest import mock
+
+        from statvalue_backend import inference
+
+        with self.echo_operations(), mock.patch.object(inference, 'get_client') as get_client:
+            self.assertEqual(inference.call('echo', player_name='Player 1'), {'player_name': 'Player 1'})
+            with self.assertRaises(inference.InferenceError) as raised:
+                inference.call('missing')
+        get_client.assert_not_called()
+        self.assertEqual(raised.exception.status, 404)
+
+    @override_settings(INFERENCE={'URL': 'http://inference:8100'})
+    def test_remote_with_url(self):
+        from unittest import mock
+
+        from statvalue_backend import inference
+
+        with self.echo_operations(), mock.patch.object(inference, 'run_operation') as run_operation, \
+                mock.patch.object(inference, 'get_client') as get_client:
+            get_client.return_value.call.return_value = {'value': 1.0}
+            self.assertEqual(inference.call('echo', player_name='Player 1'), {'value': 1.0})
+        get_client.return_value.call.assert_called_once_with('echo', {'player_name': 'Player 1'})
+        run_operation.assert_not_called()
+
+    def test_client_maps_service_responses(self):
+        from unittest import mock
+
+        from statvalue_backend.inference import InferenceClient, InferenceError
+
+        client = InferenceClient('http://inference:8100/')
+        cases = [
+            (self.response(404, {'error': 'Player not found'}), 'Player not found', 404),
+            (self.response(500, ['not', 'a', 'dict']), None, 502),
+            (self.response(502, ValueError('no json')), None, 502),
+            (self.response(200, {'unexpected': True}), None, 502),
+        ]
+        for response, message, status in cases:
+            with mock.patch.object(client.session, 'post', return_value=response), \
+                    self.assertRaises(InferenceError) as raised:
+                client.call('predict', {'player_name': 'Player 1'})
+            self.assertEqual(raised.exception.status, status)
+            if message:
+                self.assertEqual(str(raised.exception), message)
+        with mock.patch.object(client.session, 'post', return_value=self.response(200, {'result': [1, 2]})) as post:
+            self.assertEqual(client.call('predict', {'target_year': np.int64(2025)}), [1, 2])
+        self.assertEqual(post.call_args.args[0], 'http://inference:8100/predict')
+        self.assertEqual(json.loads(post.call_args.kwargs['data']), {'target_year': 2025})
+
+    def test_error_status_survives_pickling(self):
+        import pickle
+
+        from statvalue_backend.inference import InferenceError
+
+        self.assertEqual(pickle.loads(pickle.dumps(InferenceError('busy', 503))).status, 503)
+
+
+class DatasetCachingTests(SimpleTestCase):
+    """ETags keyed on the dataset version, 304 answers and the server-side response store"""
+
+    scope = 'test-scope'
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.factory = RequestFactory()
+
+    def view(self, **options):
+        from statvalue_backend.caching import dataset_cached
+
+        @dataset_cached(scope=self.scope, **options)
+        def view(request):
+            self.calls += 1
+            return JsonResponse({'calls': self.calls})
+        return view
+
+    def get(self, view, **headers):
+        return view(self.factory.get('/api/test/', **headers))
+
+    def test_matching_etag_answers_304_until_the_version_changes(self):
+        from statvalue_backend.caching import bump_dataset_version
+
+        view = self.view(max_age=60)
+        first = self.get(view)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('public', first['Cache-Control'])
+        self.assertIn('max-age=60', first['Cache-Control'])
+
+        repeat = self.get(view, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat['ETag'], first['ETag'])
+
+        bump_dataset_version('v2', scope=self.scope)
+        fresh = self.get(view, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], first['ETag'])
+        self.assertEqual(self.calls, 2)
+
+    def test_etag_varies_with_accept_and_scope_version_only(self):
+        from statvalue_backend.caching import bump_dataset_version
+
+        view = self.view()
+        json_tag = self.get(view, HTTP_ACCEPT='application/json')['ETag']
+        self.assertNotEqual(self.get(view, HTTP_ACCEPT='application/x-msgpack')['ETag'], json_tag)
+        bump_dataset_version('other', scope='another-scope')
+        self.assertEqual(self.get(view, HTTP_ACCEPT='application/json')['ETag'], json_tag)
+
+    def test_private_responses_vary_on_authorization(self):
+        response = self.get(self.view(private=True))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('Authorization', response['Vary'])
+        self.assertIn('Accept', response['Vary'])
+
+    def test_registered_source_sets_version_and_last_modified(self):
+        from statvalue_backend import caching
+
+        sources = []
+
+        def source():
+            sources.append(1)
+            return 'from-source', 1_700_000_000.0
+
+        caching.register_version_source(self.scope, source)
+        self.addCleanup(caching._sources.pop, self.scope, None)
+        with override_settings(HTTP_CACHE={'DATASET_VERSION': 'deploy-7'}):
+            state = caching.dataset_version(self.scope)
+            self.assertEqual(caching.dataset_version(self.scope), state)
+        self.assertEqual(state['version'], 'deploy-7-from-source')
+        self.assertEqual(len(sources), 1)
+        self.assertIn('Last-Modified', self.get(self.view()))
+
+    @override_settings(HTTP_CACHE={'RESPONSE_CACHE': True})
+    def test_response_store_serves_bodies_until_the_version_changes(self):
+        from statvalue_backend.caching import bump_dataset_version
+
+        view = self.view()
+        first = self.get(view)
+        self.assertEqual(self.get(view).content, first.content)
+        self.assertEqual(self.calls, 1)
+        bump_dataset_version(scope=self.scope)
+        self.assertNotEqual(self.get(view).content, first.content)
+        self.assertEqual(self.calls, 2)
+
+
+class MetricsTests(SimpleTestCase):
+    """Prometheus exposition layout and who may scrape /metrics/"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        from statvalue_backend.metrics import Histogram
+
+        histogram = Histogram('test_seconds', 'Test latency', ('endpoint',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 3.0):
+            histogram.observe(value, endpoint='a')
+        samples = {name + labels: value for name, labels, value in histogram.samples()}
+        self.assertEqual(samples['test_seconds_bucket{endpoint="a",le="0.1"}'], 1)
+        self.assertEqual(samples['test_seconds_bucket{endpoint="a",le="1.0"}'], 3)
+        self.assertEqual(samples['test_seconds_bucket{endpoint="a",le="+Inf"}'], 4)
+        self.assertEqual(samples['test_seconds_count{endpoint="a"}'], 4)
+        self.assertAlmostEqual(samples['test_seconds_sum{endpoint="a"}'], 4.05)
+
+    def test_exposition_lists_every_metric_with_escaped_labels(self):
+        from unittest import mock
+
+        from statvalue_backend import metrics
+
+        counter = metrics.Counter('test_total', 'Test counter', ('name',))
+        counter.inc(name='say "hi"\n')
+        with mock.patch.object(metrics, 'REGISTRY', metrics.REGISTRY + [counter]):
+            text = metrics.render_metrics()
+        for metric in metrics.REGISTRY:
+            self.assertIn(f"# TYPE {metric.name} {metric.kind}\n", text)
+        self.assertIn('test_total{name="say \\"hi\\"\\n"} 1\n', text)
+
+    @override_settings(METRICS={'TOKEN': 'scrape-secret'})
+    def test_scrape_requires_the_token_or_staff(self):
+        from types import SimpleNamespace
+
+        from statvalue_backend.metrics import metrics_view
+
+        factory = RequestFactory()
+        self.assertEqual(metrics_view(factory.get('/metrics/')).status_code, 403)
+        self.assertEqual(metrics_view(factory.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong')).status_code, 403)
+
+        response = metrics_view(factory.get('/metrics/', HTTP_AUTHORIZATION='Bearer scrape-secret'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+        request = factory.get('/metrics/')
+        request.user = SimpleNamespace(is_authenticated=True, is_staff=False)
+        self.assertEqual(metrics_view(request).status_code, 403)
+        request.user = SimpleNamespace(is_authenticated=True, is_staff=True)
+        self.assertEqual(metrics_view(request).status_code, 200)
+
+    @override_settings(METRICS={})
+    def test_no_token_configured_means_staff_only(self):
+        from statvalue_backend.metrics import metrics_view
+
+        request = RequestFactory().get('/metrics/', HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(metrics_view(request).status_code, 403)
+
+
+class ProfilingAccessTests(SimpleTestCase):
+    """Profile capture, listing and download are limited to staff users"""
+
+    def setUp(self):
+        import tempfile
+
+        cache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        overrides = override_settings(PROFILING={'ENABLED': True, 'SAMPLE_RATE': 0.0, 'DIR': self.tmp.name,
+                                                 'MAX_FILES': 2})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.factory = RequestFactory()
+
+    def request(self, staff=None, method='get', path='/profiles/', **kwargs):
+        from types import SimpleNamespace
+
+        request = getattr(self.factory, method)(path, **kwargs)
+        if staff is not None:
+            request.user = SimpleNamespace(is_authenticated=True, is_staff=staff)
+        return request
+
+    def test_endpoints_reject_anonymous_and_non_staff_users(self):
+        from statvalue_backend import profiling
+
+        profile_id = profiling.store(b'report', 'cprofile', 'player_list', 0.1)
+        for staff in (None, False):
+            with self.subTest(staff=staff):
+                self.assertEqual(profiling.profile_list(self.request(staff)).status_code, 403)
+                self.assertEqual(profiling.profile_download(self.request(staff), profile_id).status_code, 403)
+                self.assertEqual(profiling.profile_settings(self.request(staff)).status_code, 403)
+
+    def test_staff_list_and_download_captures_without_caching(self):
+        from django.http import Http404
+
+        from statvalue_backend import profiling
+
+        profile_id = profiling.store(b'report', 'tracemalloc', 'player_list', 0.1)
+        listing = profiling.profile_list(self.request(True))
+        self.assertEqual([p['id'] for p in json.loads(listing.content)['profiles']], [profile_id])
+        self.assertIn('no-store', listing['Cache-Control'])
+
+        download = profiling.profile_download(self.request(True), profile_id)
+        self.assertEqual(b''.join(download.streaming_content), b'report')
+        self.assertIn('no-store', download['Cache-Control'])
+        self.assertIn('attachment', download['Content-Disposition'])
+        for bad_id in ('../settings.prof', 'missing.prof', 'notes.md'):
+            with self.subTest(profile_id=bad_id), self.assertRaises(Http404):
+                profiling.profile_download(self.request(True), bad_id)
+
+    def test_profile_header_is_honoured_for_staff_only(self):
+        from statvalue_backend.profiling import requested_mode
+
+        self.assertIsNone(requested_mode(self.request(None, HTTP_X_PROFILE='tracemalloc')))
+        self.assertIsNone(requested_mode(self.request(False, HTTP_X_PROFILE='tracemalloc')))
+        self.assertEqual(requested_mode(self.request(True, HTTP_X_PROFILE='tracemalloc')), 'tracemalloc')
+        with override_settings(PROFILING={'ENABLED': False}):
+            self.assertIsNone(requested_mode(self.request(True, HTTP_X_PROFILE='tracemalloc')))
+
+    def test_staff_set_the_shared_sample_rate(self):
+        from statvalue_backend.profiling import profile_settings, sample_rate
+
+        def post(body):
+            return profile_settings(self.request(True, 'post', '/profiles/settings/', data=json.dumps(body),
+                                                 content_type='application/json'))
+
+        self.assertEqual(post({'sampleRate': 1.5}).status_code, 400)
+        self.assertEqual(post({'rate': 0.5}).status_code, 400)
+        self.assertEqual(json.loads(post({'sampleRate': 0.25}).content)['sampleRate'], 0.25)
+        self.assertEqual(sample_rate(), 0.25)
+
+    def test_captures_rotate_to_max_files(self):
+        from statvalue_backend import profiling
+
+        for i in range(4):
+            profiling.store(b'x' * 10, 'cprofile', f'endpoint{i}', 0.01)
+            time.sleep(0.01)
+        self.assertEqual(len(profiling._entries(self.tmp.name)), 2)
+
+
+class RegistryTests(SyntheticBundleTestCase):
+    """Per-bundle LRU caches and the atomic bundle swap of ModelRegistry"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_lru_evicts_least_recently_used(self):
+        from .registry import LRUCache
+
+        lru = LRUCache(2)
+        lru['a'], lru['b'] = 1, 2
+        self.assertEqual(lru.get('a'), 1)
+        lru['c'] = 3
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+        trimmed = lru.without({'a'})
+        self.assertEqual((len(trimmed), trimmed.get('a'), trimmed.get('c')), (1, None, 3))
+        self.assertEqual(lru.get('a'), 1)
+
+    @override_settings(PREDICTION_PLAYER_CACHE_SIZE=3)
+    def test_player_rows_are_cached_up_to_the_limit(self):
+        bundle = self.bundle(self.df)
+        rows = bundle.player_rows(self.names[0])
+        self.assertIs(bundle.player_rows(self.names[0]), rows)
+        self.assertTrue(rows['Year'].is_monotonic_increasing)
+        for name in self.names[1:6]:
+            bundle.player_rows(name)
+        self.assertEqual(len(bundle.player_rows_cache), 3)
+        self.assertIsNone(bundle.player_rows_cache.get(self.names[0]))
+
+    def test_append_keeps_caches_of_untouched_players_only(self):
+        bundle = self.bundle(self.df.copy())
+        names = list(self.df['name'].unique())
+        for name in names:
+            bundle.player_rows(name)
+        bundle.derived_cache.update(residuals='kept', squad_index='dropped')
+
+        appended = bundle.appended(self.new_season.copy(), source='season-2023.csv')
+        self.assertEqual((appended.version, bundle.version), ('test.1', 'test'))
+        self.assertEqual(appended.applied_updates, frozenset({'season-2023.csv'}))
+        self.assertEqual(appended.derived_cache, {'residuals': 'kept'})
+        self.assertEqual(len(appended.df), len(self.df) + len(self.new_season))
+        self.assertEqual(len(bundle.df), len(self.df))
+
+        kept = [name for name in names if appended.player_rows_cache.get(name) is not None]
+        self.assertTrue(kept)
+        self.assertFalse(set(kept) & set(self.new_season['name']))
+        self.assertEqual(appended.player_rows(self.new_season['name'][0])['Year'].max(), 2023)
+
+    @override_settings(MODEL_RELOAD_POLL_SECONDS=0, SEASON_UPDATES_DIR=None)
+    def test_background_reload_swaps_atomically(self):
+        from dataclasses import replace
+        from unittest import mock
+
+        from statvalue_backend.caching import dataset_version
+        from .registry import ModelRegistry
+
+        first = self.bundle(self.df)
+        second = replace(first, artifact_version='next')
+        started, release = threading.Event(), threading.Event()
+        loads = []
+
+        def load_bundle(paths, version):
+            loads.append(version)
+            if len(loads) == 1:
+                return first
+            started.set()
+            release.wait(5)
+            return second
+
+        registry = ModelRegistry()
+        with mock.patch('pred.registry.load_bundle', load_bundle):
+            self.assertIs(registry.current(), first)
+            self.assertEqual(dataset_version('prediction')['version'], 'test')
+
+            registry.reload()
+            self.assertTrue(started.wait(5))
+            registry.reload()
+            # The old bundle keeps serving until the new one is fully loaded
+            self.assertIs(registry.current(), first)
+            release.set()
+            for _ in range(500):
+                if registry._reloading is None:
+                    break
+                time.sleep(0.01)
+        self.assertEqual(len(loads), 2)
+        self.assertIs(registry.current(), second)
+        self.assertEqual(dataset_version('prediction')['version'], 'next')
+
+    @override_settings(MODEL_RELOAD_POLL_SECONDS=0, SEASON_UPDATES_DIR=None)
+    def test_failed_reload_keeps_the_serving_bundle(self):
+        from unittest import mock
+
+        from .registry import ModelRegistry
+
+        registry = ModelRegistry()
+        bundle = self.bundle(self.df)
+        with mock.patch('pred.registry.load_bundle', return_value=bundle):
+            registry.current()
+        with mock.patch('pred.registry.load_bundle', side_effect=OSError('truncated model file')):
+            registry.reload(background=False)
+        self.assertIs(registry.current(), bundle)
+
+
+class IntervalTests(SyntheticBundleTestCase):
+    """Residual-based intervals for models without dropout"""
+
+    def setUp(self):
+        cache.clear()
+
+    def intervals(self, bundle, year, level):
+        from .intervals import predict_intervals
+
+        return {row['playerName']: row for row in predict_intervals(bundle, self.names, year, level=level)
+                if 'error' not in row}
+
+    def test_models_without_dropout_fall_back_to_residuals(self):
+        from .intervals import has_dropout, precompute_residuals
+
+        class Dropout:
+            pass
+
+        bundle = self.bundle(self.df)
+        self.assertFalse(has_dropout(bundle.model))
+        self.assertTrue(has_dropout(type('Model', (), {'layers': [Dropout()]})()))
+        precompute_residuals(bundle)
+        self.assertIn('residuals', bundle.derived_cache)
+
+        rows = self.intervals(bundle, 2025, 0.9)
+        self.assertTrue(rows)
+        self.assertEqual({row['method'] for row in rows.values()}, {'residual'})
+        self.assertTrue(all(row['modelVersion'] == 'test' and row['level'] == 0.9 for row in rows.values()))
+
+    def test_known_seasons_are_exact(self):
+        rows = self.intervals(self.bundle(self.df), 2020, 0.9)
+        for row in rows.values():
+            self.assertEqual(row['method'], 'actual')
+            self.assertEqual(row['lower'], row['upper'])
+            self.assertEqual(row['lower'], row['predictedValue'])
+
+    def test_bounds_are_ordered_and_nest_by_level(self):
+        bundle = self.bundle(self.df)
+        narrow, wide = self.intervals(bundle, 2025, 0.5), self.intervals(bundle, 2025, 0.95)
+        positive = [name for name, row in wide.items() if row['predictedValue'] > 0]
+        self.assertTrue(positive)
+        for name in positive:
+            with self.subTest(player=name):
+                self.assertLessEqual(wide[name]['lower'], narrow[name]['lower'] + 0.01)
+                self.assertLessEqual(narrow[name]['lower'], narrow[name]['upper'])
+                self.assertLessEqual(narrow[name]['upper'], wide[name]['upper'] + 0.01)
+
+    def test_intervals_widen_with_the_horizon(self):
+        from .intervals import residual_quantiles
+
+        bundle = self.bundle(self.df)
+        q_low, q_high = residual_quantiles(bundle, 0.9)
+        near, far = self.intervals(bundle, 2024, 0.9), self.intervals(bundle, 2027, 0.9)
+        compared = [name for name in near.keys() & far.keys() if far[name]['predictedValue'] > 5]
+        self.assertTrue(compared)
+        for name in compared:
+            row = far[name]
+            with self.subTest(player=name):
+                self.assertGreater(row['yearsForward'], near[name]['yearsForward'])
+                self.assertAlmostEqual(row['upper'] / row['predictedValue'],
+                                       1 + q_high * np.sqrt(row['yearsForward']), delta=0.01)
+
+
+class ScenarioTests(SyntheticBundleTestCase):
+    """Scenario parsing, the forecast limit and batched evaluation"""
+
+    def test_grid_limit_is_checked_before_expansion(self):
+        from unittest import mock
+
+        from .scenarios import ScenarioError, parse_scenarios
+
+        grid = {'Min': list(range(1000)), 'Age': list(range(1000))}
+        with mock.patch('pred.scenarios.itertools.product') as product, \
+                self.assertRaisesMessage(ScenarioError, '1000001 forecasts (at most 20000)'):
+            parse_scenarios({'grid': grid})
+        product.assert_not_called()
+
+    @override_settings(PREDICTION_SCENARIOS={'MAX_ROWS': 100})
+    def test_limit_counts_every_player_and_year(self):
+        from .scenarios import ScenarioError, parse_scenarios
+
+        data = {'grid': {'Min': [900, 1800, 2700]}, 'scenarios': [{'name': 'rested', 'overrides': {'Min': 0}}]}
+        self.assertEqual(len(parse_scenarios(data, forecasts_per_scenario=20)), 5)
+        with self.assertRaises(ScenarioError):
+            parse_scenarios(data, forecasts_per_scenario=21)
+
+    def test_grid_expands_to_named_scenarios_after_the_baseline(self):
+        from .scenarios import BASELINE, ScenarioError, parse_scenarios
+
+        scenarios = parse_scenarios({'grid': {'club': ['Inter', 'Roma'], 'Min': [900, 1800]}})
+        self.assertEqual([s['name'] for s in scenarios],
+                         [BASELINE, 'club=Inter, Min=900', 'club=Inter, Min=1800', 'club=Roma, Min=900',
+                          'club=Roma, Min=1800'])
+        self.assertEqual(scenarios[-1], {'name': 'club=Roma, Min=1800', 'club': 'Roma', 'overrides': {'Min': 1800.0}})
+        for data in ({'grid': {'Min': []}}, {'grid': ['Min']}, {'scenarios': {}},
+                     {'scenarios': [{'overrides': {'Min': 'many'}}]}):
+            with self.subTest(data=data), self.assertRaises(ScenarioError):
+                parse_scenarios(data)
+
+    def test_evaluation_reports_deltas_against_the_baseline(self):
+        from .scenarios import ScenarioError, evaluate_scenarios, parse_scenarios
+
+        bundle = self.bundle(self.df)
+        club = self.df['Club'].iloc[0]
+        scenarios = parse_scenarios({'scenarios': [{'name': 'moved', 'club': club},
+                                                   {'name': 'typo', 'overrides': {'Minutes': 3000}}]})
+        names = self.names[:3]
+        rows, errors, ignored = evaluate_scenarios(bundle, names + ['Nobody'], [2024, 2025], scenarios)
+        self.assertEqual(len(rows), len(names) * 2 * len(scenarios))
+        self.assertEqual([error['playerName'] for error in errors], ['Nobody'])
+        self.assertEqual(ignored, ['Minutes'])
+        for row in rows:
+            if row['scenario'] in ('baseline', 'typo'):
+                self.assertEqual(row['deltaVsBaseline'], 0.0)
+
+        with self.assertRaises(ScenarioError):
+            evaluate_scenarios(bundle, names, [2024], parse_scenarios({'scenarios': [{'club': 'Nowhere FC'}]}))
+        with override_settings(PREDICTION_SCENARIOS={'MAX_ROWS': 5}), self.assertRaises(ScenarioError):
+            evaluate_scenarios(bundle, names, [2024, 2025], scenarios)
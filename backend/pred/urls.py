@@ -4,6 +4,10 @@ from . import views
 urlpatterns = [  
     path('players/', views.search_players, name='search_players'),  
     path('predict/', views.generate_prediction, name='generate_prediction'),
+    path('predict/intervals/', views.prediction_intervals, name='prediction_intervals'),
+    path('predict/scenarios/', views.prediction_scenarios, name='prediction_scenarios'),
+    path('predict/squad/', views.squad_valuation, name='squad_valuation'),
+    path('predict/export/', views.export_dataset, name='export_dataset'),
     path('player-history/<str:player_name>/', views.player_history, name='player_history'),
 
     # path('api/players/', views.get_players, name='player-list'),
@@ -1,143 +1,47 @@
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from rest_framework.decorators import api_view,permission_classes, authentication_classes
-from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.decorators import api_view,permission_classes
+from authentication.authentication import jwt_required
 import json
+import time
+from functools import partial
 import numpy as np
-import pandas as pd
-import os
-import tensorflow as tf
-from sklearn.preprocessing import RobustScaler
+from statvalue_backend import inference, mongo
+from statvalue_backend.caching import dataset_cached
+from statvalue_backend.metrics import stage_timer
+from statvalue_backend.throttling import SingleFlight, rate_limited
+from .aggregation import aggregation_setting, resolve, squad_index
+from .export import FORMATS, ExportError, available_formats, export_setting, iter_export, select_frame
+from .forecast import ForecastError, age_factor, confidence_text, player_base, predict_values, project_window
+from .intervals import interval_setting
+from .registry import registry
+from .scenarios import ScenarioError, parse_scenarios, scenario_setting
+from .shadow import shadow
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Load model and necessary data
-MODEL_PATH = r'C:\Users\LOQ\Desktop\statvalue-ai\models\market_value_lstm_model.h5'
-DATASET_PATH = r'C:\Users\LOQ\Desktop\statvalue-ai\models\finaldataset.xlsx'
-FEATURE_SCALER_PATH = r'C:\Users\LOQ\Desktop\statvalue-ai\models\feature_scaler.npy'
-TARGET_SCALER_PATH = r'C:\Users\LOQ\Desktop\statvalue-ai\models\target_scaler.npy'
-IMPORTANT_FEATURES_PATH = r'C:\Users\LOQ\Desktop\statvalue-ai\models\important_features.npy'
-
-# Initialize globals
-model = None
-df = None
-feature_scaler = None
-target_scaler = None    
-important_features = None
-lookback = 4  
+# Concurrent identical forecasts (a trending player) share one inference
+predictions = SingleFlight('predict')
 
 def load_models_and_data():
     """Load the model, data, and scalers if not loaded"""
-    global model, df, feature_scaler, target_scaler, important_features
-    
-    try:
-        if model is None:
-            logger.info("Loading prediction model and data...")
-            
-            if not os.path.exists(MODEL_PATH):
-                logger.error(f"Model file not found at {MODEL_PATH}")
-                return False
-            model = tf.keras.models.load_model(MODEL_PATH)
-            logger.info("Model loaded successfully")
-            
-            if not os.path.exists(FEATURE_SCALER_PATH):
-                logger.error(f"Feature scaler not found at {FEATURE_SCALER_PATH}")
-                return False
-            feature_scaler = np.load(FEATURE_SCALER_PATH, allow_pickle=True)[0]
-            logger.info("Feature scaler loaded successfully")
-            
-            if not os.path.exists(TARGET_SCALER_PATH):
-                logger.error(f"Target scaler not found at {TARGET_SCALER_PATH}")
-                return False
-            target_scaler = np.load(TARGET_SCALER_PATH, allow_pickle=True)[0]
-            logger.info("Target scaler loaded successfully")
-            
-            if not os.path.exists(IMPORTANT_FEATURES_PATH):
-                logger.error(f"Important features not found at {IMPORTANT_FEATURES_PATH}")
-                return False
-            important_features = np.load(IMPORTANT_FEATURES_PATH, allow_pickle=True)
-            logger.info(f"Loaded {len(important_features)} important features")
-            
-            # Load dataset
-            if not os.path.exists(DATASET_PATH):
-                logger.error(f"Dataset not found at {DATASET_PATH}")
-                return False
-                
-            df = pd.read_excel(DATASET_PATH)
-            logger.info(f"Dataset loaded with {len(df)} records")
-            
-            logger.info("Creating derived features...")
-            
-            df['player_name'] = df['name'].copy()
-            
-            # Enhanced Club Reputation - use both preset tiers and market values
-            top_clubs_1 = ['PSG', 'Manchester Utd', 'Liverpool', 'Real Madrid', 'Barcelona',
-                          'Bayern Munich', 'Arsenal', 'Atlético Madrid', 'Inter', 'Chelsea', 'Manchester City']
-            top_clubs_2 = ['Juventus', 'Tottenham', 'Napoli', 'Dortmund', 'Atalanta', 'Milan', 'Athletic Club',
-                          'RB Leipzig','Monaco', 'Brighton', 'Valencia', 'Sevilla']
-            df['CR_base'] = df['Club'].apply(lambda x: 1 if x in top_clubs_1 else 2 if x in top_clubs_2 else 3)
-
-            # Calculate average market value by club and use that to improve CR
-            club_avg_mv = df.groupby('Club')['MV'].mean().reset_index()
-            club_avg_mv['CR_value'] = pd.qcut(club_avg_mv['MV'], q=5, labels=[1, 2, 3, 4, 5]).astype(int)
-            df = df.merge(club_avg_mv[['Club', 'CR_value']], on='Club', how='left')
-
-            # Combined club reputation (weighting preset tiers and market value data)
-            df['CR'] = (df['CR_base'] * 0.6 + df['CR_value'] * 0.4).round().astype(int)
-            
-            # Combined reputation metric
-            if 'CR' in df.columns and 'NR' in df.columns and 'PR' in df.columns:
-                df['ReputationIndex'] = (df['CR'] + df['NR'] + df['PR']) / 3
-            elif 'CR' in df.columns:
-                # Fallback if we only have CR
-                df['ReputationIndex'] = df['CR']
-                
-            df = df.sort_values(['player_name', 'Year'])
-            df['PrevYearMV'] = df.groupby('player_name')['MV'].shift(1)
-            df['MV_Trend'] = df['MV'] - df['PrevYearMV']  # Year-to-year change
-
-            # Market value growth rate
-            df['MV_GrowthRate'] = (df['MV'] / df['PrevYearMV'].replace(0, 0.1)) - 1
-
-            # Handling NaN values for first year entries
-            df['PrevYearMV'].fillna(df['MV'], inplace=True)
-            df['MV_Trend'].fillna(0, inplace=True)
-            df['MV_GrowthRate'].fillna(0, inplace=True)
-            
-            # Check if all important features are now available
-            missing_features = set(important_features) - set(df.columns)
-            if missing_features:
-                logger.warning(f"Still missing features after derivation: {missing_features}")
-                
-                for feature in missing_features:
-                    logger.info(f"Creating placeholder for missing feature: {feature}")
-                    df[feature] = 0.0
-            
-            logger.info("Successfully prepared all required features")
-            return True
-        else:
-            return True  
-            
-    except Exception as e:
-        logger.error(f"Error loading models and data: {str(e)}")
-        return False
+    return registry.current() is not None
 
 @csrf_exempt
+@jwt_required
 @require_http_methods(["GET"])
-@authentication_classes([JWTAuthentication])
-@permission_classes([IsAuthenticated])
 def player_list(request):
     try:
-        if not load_models_and_data():
+        bundle = registry.current()
+        if bundle is None:
             return JsonResponse({"error": "Failed to load model and data"}, status=500)
         
         # Get unique players with their IDs
-        players = df[['name']].drop_duplicates().copy()
+        players = bundle.df[['name']].drop_duplicates().copy()
         players['id'] = range(1, len(players) + 1)  # Create synthetic IDs
         
         # Convert to list of dictionaries
@@ -152,28 +56,19 @@ def player_list(request):
 def predict_market_value(player_name, target_year):
     """Function to predict market value for a player in a specific year"""
     try:
-        # Load data if not already loaded
-        if not load_models_and_data():
+        # Load data if not already loaded; the bundle is used for the whole prediction
+        bundle = registry.current()
+        if bundle is None:
             return {"error": "Failed to load model and data"}
         
-        # Get player data
-        player_df = df[df['name'] == player_name].sort_values('Year')
+        # Get player data and their cached scaled lookback window
+        with stage_timer('predict_market_value', 'data_lookup'):
+            base = player_base(bundle, player_name)
         
-        if len(player_df) == 0:
-            return {"error": f"Player '{player_name}' not found in the dataset"}
-            
-        if len(player_df) < lookback:
-            return {"error": f"Not enough historical data for player '{player_name}'. Need at least {lookback} years of data."}
-        
-        # Get the latest available data for this player
-        latest_data = player_df.tail(lookback)
-        last_known_year = int(latest_data['Year'].iloc[-1])  
-        last_known_mv = float(latest_data['MV'].iloc[-1])    
-        last_known_age = int(latest_data['Age'].iloc[-1]) if 'Age' in latest_data.columns else None        
         # Check if we have data that's before the target year
-        if last_known_year >= target_year:
+        if base.last_known_year >= target_year:
             # We already have data for this year, return the actual value
-            year_data = player_df[player_df['Year'] == target_year]
+            year_data = base.rows[base.rows['Year'] == target_year]
             if not year_data.empty:
                 actual_mv = float(year_data['MV'].iloc[0])  
                 actual_age = int(year_data['Age'].iloc[0]) if 'Age' in year_data.columns else None
@@ -182,111 +77,55 @@ def predict_market_value(player_name, target_year):
                     "playerName": player_name,
                     "year": int(target_year),
                     "predictedValue": actual_mv,
-                    "currentValue": last_known_mv,
+                    "currentValue": base.last_known_mv,
                     "confidenceLevel": "High (Actual Data)",
                     "lastKnownAge": actual_age,
-                    "projectedAge": actual_age
+                    "projectedAge": actual_age,
+                    "modelVersion": bundle.version
                 }
             else:
                 return {"error": f"No data available for {player_name} in {target_year}, but we have more recent data"}
         
-        # Project features for target year - this is critical for year-dependent predictions
-        years_forward = target_year - last_known_year
-        logger.info(f"Projecting {years_forward} years forward from {last_known_year} to {target_year}")
-        
-        projected_data = latest_data.iloc[-1:].copy()
-        projected_data['Year'] = target_year
-        if last_known_age is not None:
-            projected_age = last_known_age + years_forward
-            projected_data['Age'] = projected_age
-            logger.info(f"Projecting age from {last_known_age} to {projected_age}")            
-            if 'Age_squared' in projected_data.columns:
-                projected_data['Age_squared'] = projected_age ** 2
-            if 'Years_from_peak' in projected_data.columns:
-                projected_data['Years_from_peak'] = abs(projected_age - 27)
-            if 'PeakAgeFactor' in projected_data.columns:
-                projected_data['PeakAgeFactor'] = 1 - abs(projected_age - 27) / 15
-            if 'CareerPhase' in projected_data.columns:
-                if projected_age <= 21:
-                    projected_data['CareerPhase'] = 'Rising'
-                    if 'CareerPhaseValue' in projected_data.columns:
-                        projected_data['CareerPhaseValue'] = 1
-                elif projected_age <= 25:
-                    projected_data['CareerPhase'] = 'Development'
-                    if 'CareerPhaseValue' in projected_data.columns:
-                        projected_data['CareerPhaseValue'] = 2
-                elif projected_age <= 29:
-                    projected_data['CareerPhase'] = 'Peak'
-                    if 'CareerPhaseValue' in projected_data.columns:
-                        projected_data['CareerPhaseValue'] = 3
-                elif projected_age <= 33:
-                    projected_data['CareerPhase'] = 'Experienced'
-                    if 'CareerPhaseValue' in projected_data.columns:
-                        projected_data['CareerPhaseValue'] = 2
-                else:
-                    projected_data['CareerPhase'] = 'Veteran'
-                    if 'CareerPhaseValue' in projected_data.columns:
-                        projected_data['CareerPhaseValue'] = 1
-                X_input = latest_data[important_features].values
-        for feature in important_features:
-            if feature in projected_data.columns:
-                X_input[-1, list(important_features).index(feature)] = projected_data[feature].iloc[0]
-        # scaling
-        X_scaled = np.zeros((1, lookback, len(important_features)))
-        for i in range(lookback):
-            X_scaled[0, i, :] = feature_scaler.transform(X_input[i].reshape(1, -1))
+        # Project features for target year - only the last timestep changes
+        logger.info(f"Projecting {target_year - base.last_known_year} years forward from {base.last_known_year} to {target_year}")
+        window = project_window(bundle, base, target_year)
+        X_scaled = window.X_scaled[np.newaxis]
         # predicting
-        pred_scaled = model.predict(X_scaled)
-        predicted_value = float(target_scaler.inverse_transform(pred_scaled)[0][0])        
-        if last_known_age is not None:
-            projected_age = last_known_age + years_forward            
-            if projected_age > 30:
-                age_factor = max(0.5, 1.0 - 0.05 * (projected_age - 30))
-                original_prediction = predicted_value
-                predicted_value = predicted_value * age_factor
-                logger.info(f"Applied age adjustment factor of {age_factor} for age {projected_age} "
-                           f"(original: {original_prediction:.2f}, adjusted: {predicted_value:.2f})")        
-        years_forward = target_year - last_known_year
-        base_confidence = 0.9
-        confidence_penalty = min(0.4, 0.05 * years_forward)  
-        confidence_level = base_confidence - confidence_penalty
-        if confidence_level > 0.8:
-            confidence_desc = "High"
-        elif confidence_level > 0.6:
-            confidence_desc = "Medium"
-        else:
-            confidence_desc = "Low"
-
-        confidence_text = f"{confidence_desc} ({int(confidence_level * 100)}%)"
-        projected_age = None
-        if last_known_age is not None:
-            projected_age = last_known_age + years_forward
+        predict_start = time.perf_counter()
+        predicted_value = float(predict_values(bundle, X_scaled)[0])
+        predict_seconds = time.perf_counter() - predict_start
+        shadow.maybe_submit(bundle, X_scaled, predicted_value, predict_seconds, player_name, target_year)        
+        factor = age_factor(window.projected_age)
+        if factor != 1.0:
+            original_prediction = predicted_value
+            predicted_value = predicted_value * factor
+            logger.info(f"Applied age adjustment factor of {factor} for age {window.projected_age} "
+                       f"(original: {original_prediction:.2f}, adjusted: {predicted_value:.2f})")        
         return {
             "playerName": player_name,
             "year": int(target_year),
             "predictedValue": round(predicted_value, 2),
-            "currentValue": round(last_known_mv, 2),
-            "confidenceLevel": confidence_text,
-            "yearsForward": int(years_forward),  
-            "lastKnownYear": last_known_year,
-            "lastKnownAge": last_known_age,
-            "projectedAge": projected_age
+            "currentValue": round(base.last_known_mv, 2),
+            "confidenceLevel": confidence_text(window.years_forward),
+            "yearsForward": int(window.years_forward),  
+            "lastKnownYear": base.last_known_year,
+            "lastKnownAge": base.last_known_age,
+            "projectedAge": window.projected_age,
+            "modelVersion": bundle.version
         }
+    except ForecastError as e:
+        return {"error": str(e)}
     except Exception as e:
         logger.error(f"Error in predict_market_value: {str(e)}")
         return {"error": f"Prediction failed: {str(e)}"}
 
 @csrf_exempt
+@jwt_required
+@rate_limited('predict')
 @require_http_methods(["POST"])
-@authentication_classes([JWTAuthentication])
-@permission_classes([IsAuthenticated])
 def generate_prediction(request):
     """API endpoint to generate player value prediction"""
     try:
-        if not load_models_and_data():
-            return JsonResponse({"error": "Models and data are still loading. Please try again in a moment."}, status=503)
-        if model is None or df is None or feature_scaler is None or target_scaler is None or important_features is None:
-            return JsonResponse({"error": "Some model components are not yet loaded. Please try again in a moment."}, status=503)
         data = json.loads(request.body)
         required_fields = ['playerName', 'year']
         for field in required_fields:
@@ -297,9 +136,20 @@ def generate_prediction(request):
         current_year = 2025  
         if target_year < 2000 or target_year > current_year + 5:
             return JsonResponse({"error": f"Year must be between 2000 and {current_year + 5}"}, status=400)
-        prediction = predict_market_value(player_name, target_year)# Generate prediction
+        # Runs on the inference service when INFERENCE['URL'] is set
+        # Copied: every coalesced caller gets the same dict and updates it below
+        prediction = dict(predictions.do(
+            ('predict', player_name, target_year),
+            partial(inference.call, 'predict', player_name=player_name, target_year=target_year)))
         if "error" in prediction:
             return JsonResponse({"error": prediction["error"]}, status=400)
+        if data.get('includeInterval'):
+            interval = predictions.do(
+                ('intervals', player_name, target_year),
+                partial(inference.call, 'intervals', player_names=[player_name], target_year=target_year))[0]
+            if "error" not in interval:
+                prediction.update({"lower": interval["lower"], "upper": interval["upper"],
+                                   "intervalLevel": interval["level"], "intervalMethod": interval["method"]})
         for key, value in prediction.items():
             if isinstance(value, np.int64):
                 prediction[key] = int(value)
@@ -308,19 +158,211 @@ def generate_prediction(request):
         return JsonResponse(prediction)
     except json.JSONDecodeError:
         return JsonResponse({"error": "Invalid JSON in request body"}, status=400)
+    except inference.InferenceError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
     except Exception as e:
         logger.error(f"Error in generate_prediction: {str(e)}")
         return JsonResponse({"error": f"Failed to generate prediction: {str(e)}"}, status=500)
     
+@csrf_exempt
+@jwt_required
+@rate_limited('batch')
+@require_http_methods(["POST"])
+def prediction_intervals(request):
+    """API endpoint for point forecasts with uncertainty intervals for many players at once"""
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            return JsonResponse({"error": "Request body must be a JSON object"}, status=400)
+        players = data.get('players') or ([data['playerName']] if 'playerName' in data else None)
+        if not players or 'year' not in data:
+            return JsonResponse({"error": "Missing required fields: players, year"}, status=400)
+        if not isinstance(players, list) or not all(isinstance(p, str) for p in players):
+            return JsonResponse({"error": "players must be a list of player names"}, status=400)
+        max_players = interval_setting('MAX_PLAYERS', 500)
+        if len(players) > max_players:
+            return JsonResponse({"error": f"At most {max_players} players per request"}, status=400)
+        target_year = int(data['year'])
+        current_year = 2025
+        if target_year < 2000 or target_year > current_year + 5:
+            return JsonResponse({"error": f"Year must be between 2000 and {current_year + 5}"}, status=400)
+        level = float(data.get('level') or interval_setting('LEVEL', 0.9))
+        if not 0 < level < 1:
+            return JsonResponse({"error": "level must be between 0 and 1"}, status=400)
+        samples = int(data.get('samples') or interval_setting('SAMPLES', 50))
+        if not 2 <= samples <= interval_setting('MAX_SAMPLES', 200):
+            return JsonResponse({"error": f"samples must be between 2 and {interval_setting('MAX_SAMPLES', 200)}"}, status=400)
+
+        results = inference.call('intervals', player_names=players, target_year=target_year,
+                                 samples=samples, level=level)
+        return JsonResponse({"year": target_year, "level": level, "results": results})
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON in request body"}, status=400)
+    except inference.InferenceError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+    except (TypeError, ValueError) as e:
+        return JsonResponse({"error": f"Invalid request: {str(e)}"}, status=400)
+    except Exception as e:
+        logger.error(f"Error in prediction_intervals: {str(e)}")
+        return JsonResponse({"error": f"Failed to compute prediction intervals: {str(e)}"}, status=500)
+
+@csrf_exempt
+@jwt_required
+@rate_limited('batch')
+@require_http_methods(["POST"])
+def prediction_scenarios(request):
+    """API endpoint for what-if forecasts under feature overrides (club moves, workload, ...)"""
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            return JsonResponse({"error": "Request body must be a JSON object"}, status=400)
+        players = data.get('players') or ([data['playerName']] if 'playerName' in data else None)
+        years = data.get('years') or ([data['year']] if 'year' in data else None)
+        if not players or not years:
+            return JsonResponse({"error": "Missing required fields: players, years"}, status=400)
+        if not isinstance(players, list) or not all(isinstance(p, str) for p in players):
+            return JsonResponse({"error": "players must be a list of player names"}, status=400)
+        max_players = scenario_setting('MAX_PLAYERS', 100)
+        if len(players) > max_players:
+            return JsonResponse({"error": f"At most {max_players} players per request"}, status=400)
+        years = sorted({int(year) for year in years})
+        current_year = 2025
+        if years[0] < 2000 or years[-1] > current_year + 5:
+            return JsonResponse({"error": f"Year must be between 2000 and {current_year + 5}"}, status=400)
+
+        scenarios = parse_scenarios(data, forecasts_per_scenario=len(set(players)) * len(years))
+        # Runs on the inference service when INFERENCE['URL'] is set
+        result = inference.call('scenarios', player_names=players, years=years, scenarios=scenarios)
+        return JsonResponse({
+            "modelVersion": result["modelVersion"],
+            "scenarios": [{"name": s['name'], "club": s['club'], "overrides": s['overrides']} for s in scenarios],
+            "ignoredOverrides": result["ignoredOverrides"],
+            "results": result["results"],
+            "errors": result["errors"],
+        })
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON in request body"}, status=400)
+    except inference.InferenceError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+    except (ScenarioError, TypeError, ValueError) as e:
+        return JsonResponse({"error": f"Invalid scenario request: {str(e)}"}, status=400)
+    except Exception as e:
+        logger.error(f"Error in prediction_scenarios: {str(e)}")
+        return JsonResponse({"error": f"Failed to evaluate scenarios: {str(e)}"}, status=500)
+
+@csrf_exempt
+@jwt_required
+@dataset_cached(private=True)
+@rate_limited('batch')
+@require_http_methods(["GET"])
+def squad_valuation(request):
+    """API endpoint valuing a whole squad (?club=) or league (?league=) over future years"""
+    try:
+        bundle = registry.current()
+        if bundle is None:
+            return JsonResponse({"error": "Failed to load model and data"}, status=500)
+        club = request.GET.get('club')
+        league = request.GET.get('league')
+        if bool(club) == bool(league):
+            return JsonResponse({"error": "Provide exactly one of club or league"}, status=400)
+        try:
+            years = sorted({int(year) for year in request.GET.get('years', '').split(',') if year.strip()})
+        except ValueError:
+            return JsonResponse({"error": "years must be a comma-separated list of integers"}, status=400)
+        try:
+            top = int(request.GET.get('top', 5))
+        except ValueError:
+            return JsonResponse({"error": "top must be an integer"}, status=400)
+        if not years:
+            return JsonResponse({"error": "Missing required parameter: years"}, status=400)
+        current_year = 2025
+        if years[0] < 2000 or years[-1] > current_year + 5:
+            return JsonResponse({"error": f"Year must be between 2000 and {current_year + 5}"}, status=400)
+        if len(years) > aggregation_setting('MAX_YEARS', 10):
+            return JsonResponse({"error": f"At most {aggregation_setting('MAX_YEARS', 10)} years per request"}, status=400)
+
+        index = squad_index(bundle)
+        if club:
+            selected = resolve(index, 'club', club)
+            if selected is None:
+                return JsonResponse({"error": f"Club '{club}' not found in the dataset"}, status=404)
+            clubs = [selected]
+        else:
+            selected = resolve(index, 'league', league)
+            if selected is None:
+                return JsonResponse({"error": f"League '{league}' not found in the dataset"}, status=404)
+            clubs = index['league'][selected]
+
+        # Runs on the inference service when INFERENCE['URL'] is set
+        result = inference.call('squad_valuation', clubs=clubs, years=years, top=max(0, top))
+        return JsonResponse({
+            "club" if club else "league": selected,
+            "modelVersion": result["modelVersion"],
+            "years": result["years"],
+        })
+    except inference.InferenceError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+    except Exception as e:
+        logger.error(f"Error in squad_valuation: {str(e)}")
+        return JsonResponse({"error": f"Failed to value squad: {str(e)}"}, status=500)
+
+def _csv_param(request, name):
+    return [value.strip() for value in request.GET.get(name, '').split(',') if value.strip()]
+
+@csrf_exempt
+@jwt_required
+@rate_limited('batch')
+@require_http_methods(["GET"])
+def export_dataset(request):
+    """
+    API endpoint streaming the derived dataset (and optionally forecasts) in one response:
+    ?format=csv|arrow|parquet&columns=name,Year,MV,CR&years=2021,2022&leagues=Premier League&forecastYears=2026
+    """
+    try:
+        bundle = registry.current()
+        if bundle is None:
+            return JsonResponse({"error": "Failed to load model and data"}, status=500)
+        fmt = request.GET.get('format', 'csv').lower()
+        if fmt not in available_formats():
+            return JsonResponse({"error": f"Unsupported export format: {fmt}. Use {', '.join(available_formats())}"},
+                                status=406)
+        try:
+            years = [int(year) for year in _csv_param(request, 'years')]
+            forecast_years = sorted({int(year) for year in _csv_param(request, 'forecastYears')})
+        except ValueError:
+            return JsonResponse({"error": "years and forecastYears must be comma-separated integers"}, status=400)
+        current_year = 2025
+        if forecast_years and (forecast_years[0] < 2000 or forecast_years[-1] > current_year + 5):
+            return JsonResponse({"error": f"Year must be between 2000 and {current_year + 5}"}, status=400)
+        if len(forecast_years) > export_setting('MAX_FORECAST_YEARS', 5):
+            return JsonResponse({"error": f"At most {export_setting('MAX_FORECAST_YEARS', 5)} forecast years per export"},
+                                status=400)
+
+        frame = select_frame(bundle, columns=_csv_param(request, 'columns'), years=years,
+                             leagues=_csv_param(request, 'leagues'), forecast_years=forecast_years)
+        content_type, extension = FORMATS[fmt]
+        response = StreamingHttpResponse(iter_export(frame, fmt), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="statvalue-{bundle.version}.{extension}"'
+        response['X-Row-Count'] = str(len(frame))
+        response['X-Model-Version'] = bundle.version
+        return response
+    except ExportError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except inference.InferenceError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+    except Exception as e:
+        logger.error(f"Error in export_dataset: {str(e)}")
+        return JsonResponse({"error": f"Failed to export dataset: {str(e)}"}, status=500)
+
 from .models import PlayerStats
 
 from rest_framework.permissions import AllowAny
+@dataset_cached(scope='collections')
 @api_view(['GET'])
 @permission_classes([AllowAny]) 
 def search_players(request):
-    players = PlayerStats.objects.all()
     try:
-        data = [{'name': p.name} for p in players]
+        data = [{'name': name} for (name,) in mongo.values_list(PlayerStats, 'name')]
         if not data:
             data = []
     except Exception as e:
@@ -329,17 +371,19 @@ def search_players(request):
 
 
 @csrf_exempt
+@jwt_required
+@dataset_cached(private=True)
 @require_http_methods(["GET"])
-@authentication_classes([JWTAuthentication])
-@permission_classes([IsAuthenticated])
 def player_history(request, player_name):
     """API endpoint to get player market value history"""
     try:
         # Load data if not already loaded
-        if not load_models_and_data():
+        bundle = registry.current()
+        if bundle is None:
             return JsonResponse({"error": "Failed to load model and data"}, status=500)
         
-        player_df = df[(df['name'] == player_name) & (df['Year'] >= 2018)].sort_values('Year')
+        player_df = bundle.player_rows(player_name)
+        player_df = player_df[player_df['Year'] >= 2018]
         
         if len(player_df) == 0:
             return JsonResponse({"error": f"No historical data found for player '{player_name}'"}, status=404)
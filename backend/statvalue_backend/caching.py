@@ -0,0 +1,144 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timezone
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+VERSION_CACHE_KEY = 'statvalue:dataset_version'
+RESPONSE_CACHE_PREFIX = 'statvalue:response:'
+
+
+def _http_cache_setting(name, default=None):
+    return getattr(settings, 'HTTP_CACHE', {}).get(name, default)
+
+
+def files_version(paths):
+    """
+    (version, last_modified) from the size and mtime of each file: a short hash,
+    and the newest mtime (None if no file exists). Every worker reading the same
+    files computes the same pair.
+    """
+    digest = hashlib.sha256()
+    newest = None
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            digest.update(f"{os.path.basename(path)}:missing".encode())
+            continue
+        digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        newest = stat.st_mtime if newest is None else max(newest, stat.st_mtime)
+    return digest.hexdigest()[:12], newest
+
+
+# scope -> (source, timeout); source() returns (version, last_modified)
+_sources = {}
+
+
+def register_version_source(scope, source, timeout=None):
+    """
+    Declare where a scope's version comes from. The source is consulted when the
+    scope has no recorded version, and again every `timeout` seconds if given
+    (for data that changes without anyone calling bump_dataset_version).
+    """
+    _sources[scope] = (source, timeout)
+
+
+def _versioned(version):
+    # A pinned DATASET_VERSION salts every scope, e.g. to invalidate clients on a deploy
+    pinned = _http_cache_setting('DATASET_VERSION')
+    return f"{pinned}-{version}" if pinned else str(version)
+
+
+def _cache_key(scope):
+    return f"{VERSION_CACHE_KEY}:{scope}"
+
+
+def dataset_version(scope='prediction'):
+    """Return the current version of `scope` ('prediction' or 'collections') and its last-modified timestamp"""
+    key = _cache_key(scope)
+    state = cache.get(key)
+    if state is None:
+        source, timeout = _sources.get(scope, (None, None))
+        version, last_modified = source() if source is not None else ('0', None)
+        state = {'version': _versioned(version), 'last_modified': last_modified}
+        cache.add(key, state, timeout)
+        state = cache.get(key) or state
+    return state
+
+
+def bump_dataset_version(version=None, last_modified=None, scope='prediction'):
+    """Record a new version of `scope`; every ETag and cached response keyed on the old one goes stale"""
+    if version is None:
+        source, _ = _sources.get(scope, (None, None))
+        if source is None:
+            version, last_modified = hashlib.sha256(str(time.time_ns()).encode()).hexdigest()[:12], time.time()
+        else:
+            version, last_modified = source()
+    state = {'version': _versioned(version), 'last_modified': last_modified}
+    cache.set(_cache_key(scope), state, _sources.get(scope, (None, None))[1])
+    return state
+
+
+def _response_etag(scope, request, *args, **kwargs):
+    state = dataset_version(scope)
+    # Responses are content-negotiated (see renderers.py), so the Accept header is part of the tag
+    variant = request.META.get('HTTP_ACCEPT', '')
+    raw = f"{state['version']}|{request.get_full_path()}|{variant}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:40]
+
+
+def _response_last_modified(scope, request, *args, **kwargs):
+    last_modified = dataset_version(scope)['last_modified']
+    return None if last_modified is None else datetime.fromtimestamp(last_modified, tz=timezone.utc)
+
+
+def dataset_cached(max_age=None, private=False, scope='prediction'):
+    """
+    Serve a read-only view with a strong ETag derived from the version of `scope`
+    ('prediction' for the model bundle, 'collections' for the MongoDB
+    collections), answering matching conditional requests with 304 and
+    optionally caching the full response body server-side until that version changes.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def cached_view(request, *args, **kwargs):
+            use_store = _http_cache_setting('RESPONSE_CACHE', False) and request.method == 'GET'
+            key = None
+            if use_store:
+                key = RESPONSE_CACHE_PREFIX + _response_etag(scope, request, *args, **kwargs)
+                hit = cache.get(key)
+                if hit is not None:
+                    content, content_type = hit
+                    return HttpResponse(content, content_type=content_type)
+
+            response = view_func(request, *args, **kwargs)
+            if use_store and response.status_code == 200 and not response.streaming:
+                cache.set(key, (response.content, response['Content-Type']),
+                          _http_cache_setting('RESPONSE_CACHE_TIMEOUT', 3600))
+            return response
+
+        conditional_view = condition(etag_func=partial(_response_etag, scope),
+                                     last_modified_func=partial(_response_last_modified, scope))(cached_view)
+
+        @wraps(view_func)
+        def wrapped_view(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                age = max_age if max_age is not None else _http_cache_setting('MAX_AGE', 300)
+                if private:
+                    patch_cache_control(response, private=True, max_age=age)
+                    patch_vary_headers(response, ('Authorization',))
+                else:
+                    patch_cache_control(response, public=True, max_age=age)
+                patch_vary_headers(response, ('Accept',))
+            return response
+
+        return wrapped_view
+    return decorator
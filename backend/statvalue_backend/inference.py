@@ -0,0 +1,246 @@
+"""
+Inference (LSTM forecasts and the similarity index) as a separately deployable service.
+
+Views run inference through `call(operation, **kwargs)`. With INFERENCE['URL']
+unset (the development default) the operation runs in the calling process. With
+a URL set, the call goes over a pooled keep-alive HTTP session to
+`manage.py run_inference_service`, which runs every operation in a process pool
+of its lane ('predict' or 'similarity'). TensorFlow, the model and the
+similarity indexes then only live on inference nodes: web nodes load a
+dataset-only bundle for lists and history (see `serves_models`), a slow
+forecast batch never holds up auth or list requests, and the two tiers scale
+independently.
+
+Operations take and return JSON-compatible values. Failures are raised as
+InferenceError with the HTTP status the view should answer with, in both modes.
+"""
+import json
+import logging
+import threading
+
+from django.conf import settings
+
+from .metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+# name -> (lane, function)
+OPERATIONS = {}
+
+
+class InferenceError(Exception):
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
+
+    def __reduce__(self):
+        # Keep the status when raised inside a service worker process
+        return type(self), (str(self), self.status)
+
+
+def inference_setting(name, default=None):
+    return getattr(settings, 'INFERENCE', {}).get(name, default)
+
+
+def is_remote():
+    return bool(inference_setting('URL'))
+
+
+# Set in processes that must hold the model even when INFERENCE['URL'] is set
+_local_models = False
+
+
+def use_local_models():
+    """Make this process load the model itself (inference workers, offline commands)"""
+    global _local_models
+    _local_models = True
+
+
+def serves_models():
+    """Whether this process loads the LSTM; web nodes of a split deployment keep only the dataset"""
+    return _local_models or not is_remote()
+
+
+def operation(lane):
+    def register(func):
+        OPERATIONS[func.__name__] = (lane, func)
+        return func
+    return register
+
+
+def run_operation(name, kwargs):
+    """Run one registered operation in this process"""
+    try:
+        _, func = OPERATIONS[name]
+    except KeyError:
+        raise InferenceError(f"Unknown inference operation: {name}", 404)
+    return func(**kwargs)
+
+
+def json_default(value):
+    """numpy scalars and arrays in operation results"""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+@operation('predict')
+def predict(player_name, target_year):
+    from pred.registry import registry
+    from pred.views import predict_market_value
+
+    if registry.current() is None:
+        raise InferenceError("Models and data are still loading. Please try again in a moment.", 503)
+    return predict_market_value(player_name, target_year)
+
+
+def _serving_bundle():
+    from pred.registry import registry
+
+    bundle = registry.current()
+    if bundle is None:
+        raise InferenceError("Models and data are still loading. Please try again in a moment.", 503)
+    return bundle
+
+
+@operation('predict')
+def intervals(player_names, target_year, samples=None, level=None):
+    from pred.intervals import predict_intervals
+
+    return predict_intervals(_serving_bundle(), player_names, target_year, samples=samples, level=level)
+
+
+@operation('predict')
+def scenarios(player_names, years, scenarios):
+    from pred.scenarios import ScenarioError, evaluate_scenarios
+
+    bundle = _serving_bundle()
+    try:
+        rows, errors, ignored = evaluate_scenarios(bundle, player_names, years, scenarios)
+    except ScenarioError as e:
+        raise InferenceError(f"Invalid scenario request: {str(e)}", 400)
+    return {"modelVersion": bundle.version, "ignoredOverrides": ignored, "results": rows, "errors": errors}
+
+
+@operation('predict')
+def squad_valuation(clubs, years, top):
+    from pred.aggregation import club_partials, summarize
+
+    bundle = _serving_bundle()
+    partials = club_partials(bundle, clubs, years)
+    return {"modelVersion": bundle.version, "years": summarize(partials, clubs, years, top=top)}
+
+
+@operation('predict')
+def export_forecasts(year):
+    from pred.export import forecast_frame
+
+    return list(forecast_frame(_serving_bundle(), year).itertuples(index=False, name=None))
+
+
+@operation('similarity')
+def similar_players(player_name, **search):
+    from comparison.embedding import get_embedding
+
+    embedding = get_embedding()
+    if embedding is None:
+        raise InferenceError('Player embedding is not available; run manage.py build_player_embedding', 503)
+    index = embedding.index_of(player_name)
+    if index is None:
+        raise InferenceError(f"Player {player_name} not found in the player embedding", 404)
+    with stage_timer('get_similar_players_unified', 'index_query'):
+        neighbours = embedding.search(index, **search)
+    return {
+        'player': embedding.describe(index),
+        'similar_players': [embedding.describe(row, distance) for row, distance in neighbours],
+    }
+
+
+@operation('similarity')
+def position_similar_players(position, player_name, filters):
+    from comparison.views import position_neighbours
+
+    return position_neighbours(position, player_name, filters)
+
+
+def init_worker(settings_module, lane, warm):
+    """Process pool initializer for run_inference_service workers"""
+    import os
+
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    use_local_models()
+    django.setup()
+    if warm:
+        warm_up(lane)
+
+
+def warm_up(lane):
+    """Load what a lane serves so the first request does not pay for it"""
+    if lane == 'predict':
+        from pred.registry import registry
+        registry.current()
+    elif lane == 'similarity':
+        from comparison.artifacts import artifact_setting, artifacts
+        from comparison.embedding import get_embedding
+        get_embedding()
+        if artifact_setting('PRELOAD'):
+            artifacts.preload()
+
+
+class InferenceClient:
+    """Pooled keep-alive HTTP client for run_inference_service"""
+
+    def __init__(self, url, pool_size=20, timeout=30.0):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def call(self, name, kwargs):
+        import requests
+
+        try:
+            response = self.session.post(f"{self.url}/{name}", timeout=self.timeout,
+                                         data=json.dumps(kwargs, default=json_default),
+                                         headers={'Content-Type': 'application/json'})
+        except requests.RequestException as e:
+            logger.error(f"Inference service call {name} failed: {str(e)}")
+            raise InferenceError("Inference service is unavailable", 503)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict) or (response.status_code == 200 and 'result' not in body):
+            raise InferenceError(f"Inference service returned an invalid response ({response.status_code})", 502)
+        if response.status_code != 200:
+            raise InferenceError(body.get('error', 'Inference failed'), response.status_code)
+        return body['result']
+
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = InferenceClient(inference_setting('URL'), pool_size=inference_setting('POOL_SIZE', 20),
+                                          timeout=inference_setting('TIMEOUT', 30.0))
+    return _client
+
+
+def call(name, **kwargs):
+    """Run an inference operation, in-process or on the inference service"""
+    if is_remote():
+        with stage_timer(name, 'inference_rpc'):
+            return get_client().call(name, kwargs)
+    return run_operation(name, kwargs)
@@ -0,0 +1,147 @@
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    rendered = []
+    for key, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        rendered.append(f'{key}="{value}"')
+    return '{' + ','.join(rendered) + '}'
+
+
+class Counter:
+    """Monotonic per-label-set counter"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, '')) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus exposition layout"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, '')) for n in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total)) for key, (counts, total) in self._values.items()]
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield self.name + '_bucket', _format_labels(self.labelnames, key, [('le', le)]), cumulative
+            yield self.name + '_sum', _format_labels(self.labelnames, key), total
+            yield self.name + '_count', _format_labels(self.labelnames, key), cumulative
+
+
+REQUESTS_TOTAL = Counter(
+    'statvalue_http_requests_total', 'HTTP requests by endpoint, method and status',
+    ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = Histogram(
+    'statvalue_http_request_duration_seconds', 'End-to-end request latency by endpoint',
+    ('endpoint', 'method'))
+STAGE_SECONDS = Histogram(
+    'statvalue_stage_duration_seconds', 'Latency of internal stages of hot code paths',
+    ('operation', 'stage'))
+
+SHADOW_DELTA = Histogram(
+    'statvalue_shadow_abs_delta', 'Absolute difference between shadow candidate and primary predictions',
+    ('candidate',), buckets=(0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0))
+SHADOW_ERRORS = Counter(
+    'statvalue_shadow_errors_total', 'Shadow candidate failures', ('candidate',))
+SHADOW_DROPPED = Counter(
+    'statvalue_shadow_dropped_total', 'Shadow runs skipped because the shadow pool was saturated')
+
+COALESCED_TOTAL = Counter(
+    'statvalue_coalesced_total', 'Calls that waited on an identical in-flight computation', ('operation',))
+RATE_LIMITED_TOTAL = Counter(
+    'statvalue_rate_limited_total', 'Requests rejected by a token-bucket rate limit', ('scope',))
+
+REGISTRY = [REQUESTS_TOTAL, REQUEST_SECONDS, STAGE_SECONDS, SHADOW_DELTA, SHADOW_ERRORS, SHADOW_DROPPED,
+            COALESCED_TOTAL, RATE_LIMITED_TOTAL]
+
+
+@contextmanager
+def stage_timer(operation, stage):
+    """Record how long the wrapped block of `operation` spends in `stage`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, operation=operation, stage=stage)
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_setting(name, default=None):
+    return getattr(settings, 'METRICS', {}).get(name, default)
+
+
+def scrape_allowed(request):
+    """A scraper presenting METRICS['TOKEN'] as a bearer token, or a staff user"""
+    token = metrics_setting('TOKEN')
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and header.startswith('Bearer '):
+        if hmac.compare_digest(header[7:].strip().encode(), token.encode()):
+            return True
+    from .profiling import admin_user
+
+    return admin_user(request) is not None
+
+
+def metrics_view(request):
+    """Prometheus text exposition of request and stage timings for this worker"""
+    if not scrape_allowed(request):
+        return JsonResponse({"error": "Metrics access requires a staff user or the metrics token"}, status=403)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,102 @@
+import time
+from functools import lru_cache
+
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.regex_helper import _lazy_re_compile
+
+from . import profiling
+from .metrics import REQUEST_SECONDS, REQUESTS_TOTAL
+
+
+@lru_cache(maxsize=None)
+def _brotli():
+    # Imported on the first response rather than at startup
+    try:
+        import brotli
+    except ImportError:  # optional dependency, GZipMiddleware still applies
+        return None
+    return brotli
+
+re_accepts_brotli = _lazy_re_compile(r'\bbr\b')
+
+
+class BrotliMiddleware(MiddlewareMixin):
+    """
+    Compress responses with brotli when the client accepts it. Sits below
+    GZipMiddleware so gzip only handles clients (or installs) without brotli.
+    """
+    min_length = 200
+    quality = 5
+
+    def process_response(self, request, response):
+        brotli = _brotli()
+        if brotli is None or response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < self.min_length:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not re_accepts_brotli.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            return response
+
+        compressed = brotli.compress(response.content, quality=self.quality)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        # Same treatment as GZipMiddleware: the encoded body is no longer byte-identical
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = 'br'
+        return response
+
+
+class MetricsMiddleware:
+    """Count requests and record end-to-end latency per resolved URL name"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        endpoint = (match.url_name or match.view_name) if match else 'unmatched'
+        REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method)
+        REQUESTS_TOTAL.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile sampled requests, or admin requests carrying X-Profile, and store the
+    capture for download (see statvalue_backend.profiling). Does nothing unless
+    PROFILING['ENABLED'] is set.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = profiling.requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        response, report = profiling.capture(mode, lambda: self.get_response(request))
+        elapsed = time.perf_counter() - start
+        if report is None:
+            return response
+
+        match = getattr(request, 'resolver_match', None)
+        endpoint = (match.url_name or match.view_name) if match else 'unmatched'
+        try:
+            response['X-Profile-Id'] = profiling.store(report, mode, endpoint, elapsed)
+        except OSError as e:
+            profiling.logger.error(f"Could not store {mode} profile for {endpoint}: {str(e)}")
+        return response
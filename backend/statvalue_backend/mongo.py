@@ -0,0 +1,120 @@
+"""
+Raw pymongo reads for hot, simple queries on the djongo-backed collections.
+
+djongo parses every ORM query into SQL and then translates it into a Mongo
+operation; for full-collection reads that costs more than the query. ModelRepository reads the model's collection directly, projecting only
+the requested db_columns and converting values with the model fields, so results
+match QuerySet.values_list. One MongoClient (and so one connection pool) per
+database alias is built from settings.DATABASES[alias]['CLIENT'].
+
+Databases that are not djongo (e.g. the SQLite benchmark settings) fall back
+to the ORM through `values_list`.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.db import connections
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def uses_mongo(alias='default'):
+    return connections[alias].settings_dict.get('ENGINE') == 'djongo'
+
+
+def fast_reads_enabled(alias='default'):
+    return getattr(settings, 'MONGO_FAST_READS', True) and uses_mongo(alias)
+
+
+def get_client(alias='default'):
+    """The process-wide MongoClient for `alias`; pymongo pools connections inside it"""
+    client = _clients.get(alias)
+    if client is None:
+        with _lock:
+            client = _clients.get(alias)
+            if client is None:
+                from pymongo import MongoClient
+
+                options = dict(connections[alias].settings_dict.get('CLIENT') or {})
+                client = MongoClient(**options)
+                _clients[alias] = client
+    return client
+
+
+def get_database(alias='default'):
+    # settings_dict rather than settings.DATABASES: the test runner swaps in the test database name
+    return get_client(alias)[connections[alias].settings_dict['NAME']]
+
+
+class ModelRepository:
+    """Read-only pymongo access to one model's collection, in model field names"""
+
+    def __init__(self, Model, alias='default', database=None):
+        self.Model = Model
+        self.alias = alias
+        self._database = database
+        self._fields = {f.name: f for f in Model._meta.concrete_fields}
+
+    @property
+    def collection(self):
+        database = self._database if self._database is not None else get_database(self.alias)
+        return database[self.Model._meta.db_table]
+
+    def _columns(self, fields):
+        try:
+            return [self._fields[name].column for name in fields]
+        except KeyError as e:
+            raise ValueError(f"{self.Model.__name__} has no field {e.args[0]!r}")
+
+    def _rows(self, fields, query):
+        columns = self._columns(fields)
+        converters = [self._fields[name].to_python for name in fields]
+        projection = {column: 1 for column in columns}
+        if '_id' not in columns:
+            projection['_id'] = 0
+        rows = []
+        for document in self.collection.find(query, projection):
+            rows.append(tuple(None if document.get(column) is None else convert(document[column])
+                              for column, convert in zip(columns, converters)))
+        return rows
+
+    def values_list(self, *fields):
+        """Every document as a tuple of `fields`, like Model.objects.values_list(*fields)"""
+        return self._rows(fields, {})
+
+
+def collections_version(models, alias='default'):
+    """
+    (version, last_modified) of the models' collections from their document
+    counts and newest _id, so inserts and deletes give a new version. Cheap:
+    the count comes from collection metadata and the newest _id from the index.
+    """
+    digest = hashlib.sha256()
+    newest = None
+    for Model in models:
+        if fast_reads_enabled(alias):
+            collection = ModelRepository(Model, alias).collection
+            count = collection.estimated_document_count()
+            latest = next(iter(collection.find({}, {'_id': 1}).sort('_id', -1).limit(1)), None)
+            marker = latest['_id'] if latest else None
+            # ObjectIds carry their creation time
+            if hasattr(marker, 'generation_time'):
+                created = marker.generation_time.timestamp()
+                newest = created if newest is None else max(newest, created)
+        else:
+            from django.db.models import Max
+
+            queryset = Model.objects.using(alias)
+            count = queryset.count()
+            marker = queryset.aggregate(latest=Max('pk'))['latest']
+        digest.update(f"{Model._meta.db_table}:{count}:{marker}".encode())
+    return digest.hexdigest()[:12], newest
+
+
+def values_list(Model, *fields, alias='default'):
+    """Rows of `fields` for the whole collection, through pymongo when the model lives in MongoDB"""
+    if fast_reads_enabled(alias):
+        return ModelRepository(Model, alias).values_list(*fields)
+    return list(Model.objects.using(alias).values_list(*fields))
@@ -0,0 +1,208 @@
+"""
+Opt-in request profiling: cProfile or tracemalloc captures of sampled requests.
+
+A request is profiled when PROFILING is enabled and either a random draw falls
+under the sample rate, or an admin user sends the X-Profile header
+("cprofile" or "tracemalloc"). The sample rate can be changed at runtime
+through the admin settings endpoint; it is kept in the shared cache so every
+worker picks it up. Captures are written to PROFILING['DIR'] and rotated by
+count and total size, and admins list and download them over HTTP. Captures
+expose code paths and allocation sites, so every endpoint here is staff-only
+and marked no-store.
+"""
+import cProfile
+import json
+import logging
+import marshal
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, Http404, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.csrf import csrf_exempt
+
+logger = logging.getLogger(__name__)
+
+MODES = ('cprofile', 'tracemalloc')
+SAMPLE_RATE_CACHE_KEY = 'statvalue:profiling:sample_rate'
+PROFILE_ID = re.compile(r'^[\w.-]+\.(prof|txt)$')
+
+# cProfile and tracemalloc are process-wide; one capture at a time per process
+_capture_lock = threading.Lock()
+
+
+def profiling_setting(name, default=None):
+    return getattr(settings, 'PROFILING', {}).get(name, default)
+
+
+def profile_dir():
+    return str(profiling_setting('DIR') or os.path.join(tempfile.gettempdir(), 'statvalue-profiles'))
+
+
+def sample_rate():
+    rate = cache.get(SAMPLE_RATE_CACHE_KEY)
+    return profiling_setting('SAMPLE_RATE', 0.0) if rate is None else rate
+
+
+def admin_user(request):
+    """The requesting user if they are staff, via the session or a JWT bearer token"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user if user.is_staff else None
+    from authentication.authentication import CachedJWTAuthentication
+
+    try:
+        result = CachedJWTAuthentication().authenticate(request)
+    except Exception:
+        return None
+    if result and result[0].is_staff:
+        return result[0]
+    return None
+
+
+def requested_mode(request):
+    """The capture mode for this request, or None if it is not profiled"""
+    if not profiling_setting('ENABLED', False):
+        return None
+    header = request.META.get('HTTP_X_PROFILE', '').strip().lower()
+    if header:
+        mode = header if header in MODES else profiling_setting('MODE', 'cprofile')
+        return mode if admin_user(request) is not None else None
+    if random.random() < sample_rate():
+        return profiling_setting('MODE', 'cprofile')
+    return None
+
+
+def capture(mode, func):
+    """Run func() under the profiler; returns (result, report bytes) or (result, None) when busy"""
+    if not _capture_lock.acquire(blocking=False):
+        return func(), None
+    try:
+        if mode == 'tracemalloc':
+            return _capture_tracemalloc(func)
+        return _capture_cprofile(func)
+    finally:
+        _capture_lock.release()
+
+
+def _capture_cprofile(func):
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        result = func()
+    finally:
+        profile.disable()
+    # Same bytes as Profile.dump_stats, readable by pstats and snakeviz
+    profile.create_stats()
+    return result, marshal.dumps(profile.stats)
+
+
+def _capture_tracemalloc(func):
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(profiling_setting('TRACEMALLOC_FRAMES', 10))
+    try:
+        before = tracemalloc.take_snapshot()
+        result = func()
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started:
+            tracemalloc.stop()
+    lines = [f"traced current={current} peak={peak}", "top allocations by line since request start:"]
+    for stat in after.compare_to(before, 'lineno')[:profiling_setting('TRACEMALLOC_TOP', 50)]:
+        lines.append(str(stat))
+    return result, '\n'.join(lines).encode()
+
+
+def store(report, mode, endpoint, seconds):
+    """Write a capture, rotate old ones, and return its id"""
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    extension = 'prof' if mode == 'cprofile' else 'txt'
+    safe_endpoint = re.sub(r'[^\w-]', '_', endpoint or 'unmatched')
+    profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{safe_endpoint}-{int(seconds * 1000)}ms-{uuid.uuid4().hex[:8]}.{extension}"
+    with open(os.path.join(directory, profile_id), 'wb') as fh:
+        fh.write(report)
+    rotate(directory)
+    return profile_id
+
+
+def _entries(directory):
+    try:
+        entries = [e for e in os.scandir(directory) if e.is_file() and PROFILE_ID.match(e.name)]
+    except OSError:
+        return []
+    return sorted(entries, key=lambda e: e.stat().st_mtime, reverse=True)
+
+
+def rotate(directory):
+    """Keep the newest MAX_FILES captures within MAX_BYTES"""
+    max_files = profiling_setting('MAX_FILES', 50)
+    max_bytes = profiling_setting('MAX_BYTES', 50 * 1024 * 1024)
+    total = 0
+    for i, entry in enumerate(_entries(directory)):
+        total += entry.stat().st_size
+        if i >= max_files or total > max_bytes:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def _forbidden():
+    return JsonResponse({"error": "Admin access required"}, status=403)
+
+
+def _no_store(response):
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+def profile_list(request):
+    """Captured profiles, newest first"""
+    if admin_user(request) is None:
+        return _forbidden()
+    return _no_store(JsonResponse({
+        "enabled": profiling_setting('ENABLED', False),
+        "sampleRate": sample_rate(),
+        "profiles": [{"id": e.name, "bytes": e.stat().st_size,
+                      "created": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(e.stat().st_mtime))}
+                     for e in _entries(profile_dir())],
+    }))
+
+
+def profile_download(request, profile_id):
+    if admin_user(request) is None:
+        return _forbidden()
+    if not PROFILE_ID.match(profile_id):
+        raise Http404("Unknown profile")
+    path = os.path.join(profile_dir(), profile_id)
+    if not os.path.isfile(path):
+        raise Http404("Unknown profile")
+    return _no_store(FileResponse(open(path, 'rb'), as_attachment=True, filename=profile_id))
+
+
+@csrf_exempt
+def profile_settings(request):
+    """GET the runtime sample rate, or POST {"sampleRate": 0.01} to change it for every worker"""
+    if admin_user(request) is None:
+        return _forbidden()
+    if request.method == 'POST':
+        try:
+            rate = float(json.loads(request.body)['sampleRate'])
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({"error": "Body must be {\"sampleRate\": <0..1>}"}, status=400)
+        if not 0 <= rate <= 1:
+            return JsonResponse({"error": "sampleRate must be between 0 and 1"}, status=400)
+        cache.set(SAMPLE_RATE_CACHE_KEY, rate, None)
+        logger.info(f"Profiling sample rate set to {rate}")
+    return _no_store(JsonResponse({"enabled": profiling_setting('ENABLED', False), "sampleRate": sample_rate()}))
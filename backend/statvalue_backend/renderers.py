@@ -0,0 +1,93 @@
+import json
+from functools import lru_cache
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+
+
+# Optional encoders are imported when a client first asks for their format, not at startup
+
+@lru_cache(maxsize=None)
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:  # optional dependency
+        return None
+    return msgpack
+
+
+@lru_cache(maxsize=None)
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:  # optional dependency
+        return None
+    return pyarrow
+
+COLUMNAR_JSON = 'application/vnd.statvalue.columnar+json'
+MSGPACK = 'application/x-msgpack'
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+
+FORMAT_ALIASES = {
+    'rows': 'rows',
+    'json': 'rows',
+    'columns': 'columns',
+    'columnar': 'columns',
+    'msgpack': 'msgpack',
+    'arrow': 'arrow',
+}
+MEDIA_TYPE_FORMATS = (
+    (COLUMNAR_JSON, 'columns'),
+    (MSGPACK, 'msgpack'),
+    (ARROW_STREAM, 'arrow'),
+)
+
+
+def negotiate_format(request):
+    """Pick the tabular format from ?format= or the Accept header, defaulting to row JSON"""
+    requested = request.GET.get('format')
+    if requested:
+        return FORMAT_ALIASES.get(requested.lower())
+    accept = request.META.get('HTTP_ACCEPT', '')
+    for media_type, fmt in MEDIA_TYPE_FORMATS:
+        if media_type in accept:
+            return fmt
+    return 'rows'
+
+
+def _columns(keys, rows):
+    columns = {key: [] for key in keys}
+    for row in rows:
+        for key, value in zip(keys, row):
+            columns[key].append(value)
+    return columns
+
+
+def tabular_response(request, keys, rows):
+    """
+    Render a table as row-oriented JSON (the historical shape), a columnar JSON
+    object of arrays, MessagePack or an Arrow IPC stream.
+    """
+    fmt = negotiate_format(request)
+    if fmt == 'rows':
+        response = JsonResponse([dict(zip(keys, row)) for row in rows], safe=False)
+    elif fmt == 'columns':
+        body = {'count': len(rows), 'columns': _columns(keys, rows)}
+        response = HttpResponse(json.dumps(body, cls=DjangoJSONEncoder, separators=(',', ':')),
+                                content_type=COLUMNAR_JSON)
+    elif fmt == 'msgpack' and _msgpack() is not None:
+        body = {'count': len(rows), 'columns': _columns(keys, rows)}
+        response = HttpResponse(_msgpack().packb(body, use_bin_type=True), content_type=MSGPACK)
+    elif fmt == 'arrow' and _pyarrow() is not None:
+        pa = _pyarrow()
+        table = pa.table(_columns(keys, rows))
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        response = HttpResponse(sink.getvalue().to_pybytes(), content_type=ARROW_STREAM)
+    else:
+        response = JsonResponse({'error': f"Unsupported response format: {request.GET.get('format') or fmt}"},
+                                status=406)
+    patch_vary_headers(response, ('Accept',))
+    return response
@@ -29,12 +29,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'statvalue_backend.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'django.middleware.gzip.GZipMiddleware',
+    'statvalue_backend.middleware.BrotliMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'statvalue_backend.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -78,10 +82,153 @@ DATABASES = {
         'NAME': 'statvalue_db',
         'CLIENT': {
             'host': 'mongodb://localhost:27017',
+            # Shared by djongo and the pymongo fast path (statvalue_backend.mongo)
+            'maxPoolSize': int(os.environ.get('STATVALUE_MONGO_MAX_POOL_SIZE', 50)),
         }
     }
 }
 
+# Serve hot full-collection reads and name lookups through pymongo instead of djongo
+MONGO_FAST_READS = os.environ.get('STATVALUE_MONGO_FAST_READS', '1') == '1'
+
+
+# Prediction artifacts (LSTM model, scalers, feature list and dataset)
+PREDICTION_MODELS_DIR = Path(os.environ.get('STATVALUE_MODELS_DIR', BASE_DIR.parent / 'models'))
+PREDICTION_MODEL_PATH = PREDICTION_MODELS_DIR / 'market_value_lstm_model.h5'
+PREDICTION_DATASET_PATH = Path(os.environ.get('STATVALUE_DATASET_PATH', PREDICTION_MODELS_DIR / 'finaldataset.xlsx'))
+PREDICTION_FEATURE_SCALER_PATH = PREDICTION_MODELS_DIR / 'feature_scaler.npy'
+PREDICTION_TARGET_SCALER_PATH = PREDICTION_MODELS_DIR / 'target_scaler.npy'
+PREDICTION_IMPORTANT_FEATURES_PATH = PREDICTION_MODELS_DIR / 'important_features.npy'
+
+# Cross-position similarity index, built by `manage.py build_player_embedding`
+PLAYER_EMBEDDING_PATH = Path(os.environ.get('STATVALUE_PLAYER_EMBEDDING_PATH', PREDICTION_MODELS_DIR / 'player_embedding.joblib'))
+
+# Per-position KNN models and scalers (comparison.artifacts), checked against MANIFEST
+# (`manage.py build_knn_manifest`), memory-mapped, and loaded on first use. With PRELOAD
+# set, serving processes load all positions in the background at startup; it stays off
+# by default so manage.py commands, tests and auth-only workers never import the ML stack
+KNN_ARTIFACTS = {
+    'DIR': Path(os.environ.get('STATVALUE_KNN_ARTIFACTS_DIR', BASE_DIR.parent)),
+    'MANIFEST': None,
+    'REQUIRE_MANIFEST': os.environ.get('STATVALUE_REQUIRE_KNN_MANIFEST', '0') == '1',
+    'MMAP_MODE': 'r',
+    'PRELOAD': os.environ.get('STATVALUE_PRELOAD_KNN_ARTIFACTS', '0') == '1',
+    'WORKERS': 4,
+    'RECHECK_SECONDS': 300,
+}
+
+# /metrics/ (statvalue_backend.metrics) answers staff users and scrapers that send
+# `Authorization: Bearer <TOKEN>`; with TOKEN unset only staff can read it
+METRICS = {
+    'TOKEN': os.environ.get('STATVALUE_METRICS_TOKEN'),
+}
+
+# Opt-in request profiling (statvalue_backend.profiling): a SAMPLE_RATE fraction of
+# requests, or staff requests with an X-Profile header, are captured with cProfile or
+# tracemalloc into DIR, keeping the newest MAX_FILES within MAX_BYTES
+PROFILING = {
+    'ENABLED': os.environ.get('STATVALUE_PROFILING', '0') == '1',
+    'SAMPLE_RATE': float(os.environ.get('STATVALUE_PROFILING_SAMPLE_RATE', 0.0)),
+    'MODE': 'cprofile',
+    'DIR': os.environ.get('STATVALUE_PROFILING_DIR'),
+    'MAX_FILES': 50,
+    'MAX_BYTES': 50 * 1024 * 1024,
+    'TRACEMALLOC_FRAMES': 10,
+    'TRACEMALLOC_TOP': 50,
+}
+
+# Inference service (statvalue_backend.inference): with URL unset forecasts and similarity
+# search run inside the web process; with it set, views call `manage.py run_inference_service`
+# over a pooled HTTP session, and the service runs WORKERS processes per lane
+INFERENCE = {
+    'URL': os.environ.get('STATVALUE_INFERENCE_URL'),
+    'POOL_SIZE': 20,
+    'TIMEOUT': float(os.environ.get('STATVALUE_INFERENCE_TIMEOUT', 30)),
+    'WORKERS': {
+        'predict': int(os.environ.get('STATVALUE_INFERENCE_PREDICT_WORKERS', 2)),
+        'similarity': int(os.environ.get('STATVALUE_INFERENCE_SIMILARITY_WORKERS', 1)),
+    },
+}
+
+# Per-client token buckets (statvalue_backend.throttling): RATE requests per second with
+# bursts of up to BURST, per worker; 'batch' covers intervals, scenarios, squads and exports
+RATE_LIMITS = {
+    'predict': {'RATE': float(os.environ.get('STATVALUE_PREDICT_RATE', 2.0)), 'BURST': 20},
+    'batch': {'RATE': 0.2, 'BURST': 5},
+}
+# Only behind a proxy that sets X-Forwarded-For; otherwise clients could pick their own bucket
+RATE_LIMIT_TRUST_X_FORWARDED_FOR = os.environ.get('STATVALUE_TRUST_X_FORWARDED_FOR', '0') == '1'
+# How long a coalesced request waits for the identical one in flight before computing itself
+SINGLE_FLIGHT_WAIT_SECONDS = 30
+
+# Columnar snapshots of the position collections (comparison.store) are rebuilt on a
+# dataset version change or after this many seconds
+COMPARISON_STORE_TTL = int(os.environ.get('STATVALUE_COMPARISON_STORE_TTL', 300))
+
+# How often workers check the artifacts for changes; 0 disables hot reload
+MODEL_RELOAD_POLL_SECONDS = int(os.environ.get('STATVALUE_MODEL_RELOAD_POLL_SECONDS', 30))
+
+# Players whose history slice and lookback window each bundle keeps (least recently used evicted)
+PREDICTION_PLAYER_CACHE_SIZE = int(os.environ.get('STATVALUE_PLAYER_CACHE_SIZE', 4096))
+
+# Shadow evaluation: candidate models (joblib files exposing predict() over the flattened
+# scaled lookback window, see `manage.py train_shadow_candidates`) replayed on a sampled
+# fraction of predictions in a separate pool
+PREDICTION_SHADOW = {
+    'SAMPLE_RATE': float(os.environ.get('STATVALUE_SHADOW_SAMPLE_RATE', 0.0)),
+    'WORKERS': 1,
+    'MAX_PENDING': 32,
+    'CANDIDATES': {
+        # 'gbt': PREDICTION_MODELS_DIR / 'shadow_gbt.joblib',
+        # 'knn': PREDICTION_MODELS_DIR / 'shadow_knn.joblib',
+    },
+}
+
+# Prediction intervals (pred.intervals): MC-dropout draws per player when the model has
+# dropout, otherwise residual quantiles; BATCH_ROWS bounds each forward pass
+PREDICTION_INTERVALS = {
+    'SAMPLES': int(os.environ.get('STATVALUE_INTERVAL_SAMPLES', 50)),
+    'MAX_SAMPLES': 200,
+    'LEVEL': 0.9,
+    'BATCH_ROWS': 8192,
+    'MAX_PLAYERS': 500,
+    'CACHE_TIMEOUT': 3600,
+    # Compute the residuals when a bundle loads rather than in the first interval request
+    'PRECOMPUTE_RESIDUALS': os.environ.get('STATVALUE_PRECOMPUTE_RESIDUALS', '1') == '1',
+}
+
+# What-if scenarios (pred.scenarios): every player x year x scenario forecast of a request
+# runs in one batched forward pass of at most MAX_ROWS windows
+PREDICTION_SCENARIOS = {
+    'MAX_PLAYERS': 100,
+    'MAX_ROWS': 20000,
+    'BATCH_SIZE': 1024,
+}
+
+# Squad/league valuations (pred.aggregation): partial aggregates are cached per club and year
+PREDICTION_AGGREGATION = {
+    'MAX_YEARS': 10,
+    'BATCH_SIZE': 1024,
+    'CACHE_TIMEOUT': 3600,
+}
+
+# Bulk export (pred.export): rows per CSV chunk / Arrow batch / Parquet row group; forecasts
+# for a target year are computed once per bundle in BATCH_SIZE forward passes
+PREDICTION_EXPORT = {
+    'CHUNK_ROWS': 50000,
+    'MAX_FORECAST_YEARS': 5,
+    'BATCH_SIZE': 1024,
+}
+
+# Compact the loaded dataset: categoricals for repeated strings, exact numeric downcasts
+# (pred.features.optimize_dtypes)
+PREDICTION_OPTIMIZE_DTYPES = os.environ.get('STATVALUE_OPTIMIZE_DTYPES', '1') == '1'
+
+# Mid-season updates: new season files dropped here are folded into each worker's
+# loaded dataset incrementally (see pred.registry)
+SEASON_UPDATES_DIR = os.environ.get('STATVALUE_SEASON_UPDATES_DIR')
+SEASON_UPDATES_POLL_SECONDS = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -100,7 +247,38 @@ AUTH_PASSWORD_VALIDATORS = [
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
 ]
+
+# Signup/login cost is dominated by PBKDF2; tune with `manage.py benchmark_hasher`
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('STATVALUE_PASSWORD_HASH_ITERATIONS', 260000))
+PASSWORD_HASHERS = [
+    'authentication.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
 SESSION_ENGINE = "django.contrib.sessions.backends.file"
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'statvalue',
+    }
+}
+
+# HTTP caching for read-only dataset endpoints (see statvalue_backend/caching.py)
+HTTP_CACHE = {
+    'MAX_AGE': 300,
+    # Versions come from the prediction artifacts (pred.registry) and the MongoDB collections
+    # (statvalue_backend.mongo.collections_version); a value here salts both, e.g. per deploy
+    'DATASET_VERSION': os.environ.get('STATVALUE_DATASET_VERSION'),
+    # How often workers re-read the collections' version
+    'COLLECTIONS_VERSION_TIMEOUT': 60,
+    # Keep full response bodies in CACHES until the dataset version changes
+    'RESPONSE_CACHE': os.environ.get('STATVALUE_RESPONSE_CACHE', '0') == '1',
+    'RESPONSE_CACHE_TIMEOUT': 3600,
+}
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 
@@ -132,10 +310,10 @@ CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 
 # REST Framework settings
+# A single JWT authenticator so requests never fall through Session/Token lookups
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'authentication.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -153,3 +331,6 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': True,
 }
+
+# Seconds a JWT-resolved user is served from CACHES before hitting the database again
+AUTH_USER_CACHE_TIMEOUT = 60
@@ -0,0 +1,18 @@
+"""Settings profile for the benchmark suite: SQLite instead of MongoDB, no external services."""
+import os
+
+from .settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('STATVALUE_BENCH_DB', ':memory:'),
+    }
+}
+
+# The in-process load test sends anonymous requests from one address, so every virtual
+# user would share a single bucket and measure throttling instead of the endpoints
+RATE_LIMITS = {}
+
@@ -0,0 +1,134 @@
+"""
+Guards that bound the work a burst of identical or repeated requests can cause.
+
+SingleFlight lets concurrent identical calls in a process share one computation:
+the first caller runs it and the others wait for its result (or its exception),
+for at most SINGLE_FLIGHT_WAIT_SECONDS before computing it themselves.
+
+`rate_limited(scope)` is a per-client token bucket: RATE_LIMITS[scope] refills RATE
+tokens per second up to BURST, and each request takes one or gets a 429 with
+Retry-After. A RATE of 0 blocks the scope outright. Clients are the JWT user id when a valid bearer token is sent,
+otherwise the remote address. Buckets are kept in the local cache (the
+per-process LocMemCache by default), so each worker enforces its own limit.
+"""
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+from .metrics import COALESCED_TOTAL, RATE_LIMITED_TOTAL
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution"""
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            COALESCED_TOTAL.inc(operation=self.name)
+            if not call.done.wait(getattr(settings, 'SINGLE_FLIGHT_WAIT_SECONDS', 30)):
+                # A stuck leader must not hold every identical request hostage
+                return func()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+def rate_limit_setting(scope):
+    return getattr(settings, 'RATE_LIMITS', {}).get(scope)
+
+
+def client_id(request):
+    """The JWT user id if the request carries a valid token, else the client address"""
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+    from rest_framework_simplejwt.settings import api_settings
+
+    from authentication.authentication import CachedJWTAuthentication
+
+    auth = CachedJWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else None
+    if raw_token is not None:
+        try:
+            return f"user:{auth.get_validated_token(raw_token)[api_settings.USER_ID_CLAIM]}"
+        except (InvalidToken, TokenError, KeyError):
+            pass
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded and getattr(settings, 'RATE_LIMIT_TRUST_X_FORWARDED_FOR', False):
+        return f"ip:{forwarded.split(',')[0].strip()}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+_bucket_lock = threading.Lock()
+# Retry-After for a scope configured with RATE 0, which never refills
+BLOCKED_RETRY_AFTER = 3600
+
+
+def take_token(scope, client):
+    """(allowed, seconds until the next token) for one request of `client` in `scope`"""
+    config = rate_limit_setting(scope)
+    rate = float(config['RATE'])
+    burst = float(config.get('BURST', 1))
+    if rate <= 0:
+        return False, float(BLOCKED_RETRY_AFTER)
+    key = f"statvalue:ratelimit:{scope}:{client}"
+    with _bucket_lock:
+        now = time.time()
+        tokens, updated = cache.get(key) or (burst, now)
+        tokens = min(burst, tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        # An idle bucket is full again after burst / rate seconds, so it can expire then
+        cache.set(key, (tokens, now), math.ceil(burst / rate) + 1)
+    return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+
+def rate_limited(scope):
+    """Answer 429 once the caller's token bucket for `scope` is empty"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if rate_limit_setting(scope):
+                allowed, retry_after = take_token(scope, client_id(request))
+                if not allowed:
+                    RATE_LIMITED_TOTAL.inc(scope=scope)
+                    response = JsonResponse({"error": "Too many requests. Please try again shortly."}, status=429)
+                    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
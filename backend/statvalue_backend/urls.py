@@ -1,13 +1,16 @@
 from django.urls import path, include
 from django.contrib import admin
 from authentication.views import home 
-from comparison.views import get_midfielders, get_forwards, get_defenders, get_goalkeepers, get_similar_players
-from pred.views import search_players, generate_prediction, player_history
-from django.views.decorators.csrf import csrf_exempt
+from statvalue_backend.metrics import metrics_view
+from statvalue_backend.profiling import profile_download, profile_list, profile_settings
 urlpatterns = [
     path("admin/", admin.site.urls),
     path('api/auth/', include('authentication.urls')),
     path("", home, name="home"),  
     path('api/', include('comparison.urls')),
     path('api/', include('pred.urls')),
+    path('metrics/', metrics_view, name='metrics'),
+    path('profiles/', profile_list, name='profile_list'),
+    path('profiles/settings/', profile_settings, name='profile_settings'),
+    path('profiles/<str:profile_id>/', profile_download, name='profile_download'),
 ]